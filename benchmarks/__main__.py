@@ -0,0 +1,178 @@
+"""Gateway overhead benchmarks.
+
+    python -m benchmarks run --output results.json
+    python -m benchmarks compare baseline.json results.json
+
+``run`` exits with 1 when a scenario misses its limit (``"passed": false``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import time
+from importlib import metadata
+
+from benchmarks.harness import ROOT, Server
+from benchmarks.scenarios import SCENARIOS
+
+# Result keys where a larger value is an improvement; every other timing,
+# size or memory figure is better smaller
+_HIGHER_IS_BETTER = ("rps", "throughput_ratio")
+_COMPARED_SUFFIXES = ("_ms", "_us", "_mb", "_kb", "rps", "throughput_ratio")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run the benchmarks and print JSON results")
+    run.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help="comma-separated subset of: " + ", ".join(SCENARIOS),
+    )
+    run.add_argument("--requests", type=int, default=500)
+    run.add_argument("--concurrency", type=int, default=16)
+    run.add_argument("--warmup", type=int, default=50)
+    run.add_argument("--request-bytes", type=int, default=1024)
+    run.add_argument("--tokens", type=int, default=256, help="completion tokens")
+    run.add_argument(
+        "--token-rate", type=float, default=0.0, help="tokens/s, 0 for unpaced"
+    )
+    run.add_argument("--chunk-tokens", type=int, default=1, help="tokens per SSE event")
+    run.add_argument("--response-bytes", type=int, default=0, help="JSON padding")
+    run.add_argument("--store-sessions", type=int, default=1000)
+    run.add_argument("--session-bytes", type=int, default=64 * 1024)
+    run.add_argument("--ui-repeat", type=int, default=20)
+    run.add_argument("--ui-sessions", type=int, default=40)
+    run.add_argument("--ui-body-bytes", type=int, default=2 * 1024 * 1024)
+    run.add_argument(
+        "--jitter-token-rate", type=float, default=100.0, help="tokens/s of ui_jitter"
+    )
+    run.add_argument(
+        "--max-added-gap-ms",
+        type=float,
+        help="fail ui_jitter when the UI load adds more to the p99 chunk gap",
+    )
+    run.add_argument(
+        "--gateway-config", type=json.loads, default={}, help="extra AppConfig JSON"
+    )
+    run.add_argument("--output", help="also write the results to this file")
+
+    compare = sub.add_parser("compare", help="compare two result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument(
+        "--threshold", type=float, default=0.10, help="relative change flagged"
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        results = asyncio.run(_run(args))
+        text = json.dumps(results, indent=2)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(text + "\n")
+        print(text)
+        failed = [
+            name
+            for name, result in results["scenarios"].items()
+            if result.get("passed") is False
+        ]
+        if failed:
+            print(f"Failed: {', '.join(failed)}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        sys.exit(_compare(args.baseline, args.current, args.threshold))
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results: dict = {"meta": _meta(args), "scenarios": {}}
+    with Server.mock(
+        tokens=args.tokens,
+        token_rate=args.token_rate,
+        chunk_tokens=args.chunk_tokens,
+        response_bytes=args.response_bytes,
+    ) as mock:
+        config = {**args.gateway_config, "backends": [{"base_url": mock.url}]}
+        with Server.gateway(config) as gateway:
+            for name in names:
+                print(f"Running {name}...", file=sys.stderr)
+                results["scenarios"][name] = await SCENARIOS[name](mock, gateway, args)
+    return results
+
+
+def _meta(args: argparse.Namespace) -> dict:
+    try:
+        version = metadata.version("gateway-ia")
+    except metadata.PackageNotFoundError:
+        version = None
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    params = {k: v for k, v in vars(args).items() if k not in ("command", "output")}
+    return {
+        "version": version,
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "params": params,
+    }
+
+
+def _compare(baseline_path: str, current_path: str, threshold: float) -> int:
+    """Print the relative change of every figure; return 1 on regressions."""
+    with open(baseline_path) as f:
+        baseline = _flatten(json.load(f)["scenarios"])
+    with open(current_path) as f:
+        current = _flatten(json.load(f)["scenarios"])
+
+    regressions = 0
+    for key in sorted(baseline.keys() & current.keys()):
+        if not key.endswith(_COMPARED_SUFFIXES):
+            continue
+        old, new = baseline[key], current[key]
+        if not old:
+            continue
+        change = (new - old) / abs(old)
+        worse = -change if key.endswith(_HIGHER_IS_BETTER) else change
+        flag = ""
+        # Direct runs measure the mock backend and the machine, not the gateway
+        if worse > threshold and ".direct." not in key:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key:<60} {old:>12.3f} {new:>12.3f} {change:>+8.1%}{flag}")
+    return 1 if regressions else 0
+
+
+def _flatten(tree: dict, prefix: str = "") -> dict[str, float]:
+    flat: dict[str, float] = {}
+    for key, value in tree.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = float(value)
+    return flat
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Process management, load generation and statistics for the benchmarks."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class Server:
+    """A benchmark server (mock backend or gateway) in a child process."""
+
+    def __init__(self, args: list[str], ready_path: str) -> None:
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._args = args
+        self._ready_path = ready_path
+        self._process: subprocess.Popen | None = None
+
+    @classmethod
+    def mock(cls, **options) -> Server:
+        args = ["mock"]
+        for name, value in options.items():
+            args += [f"--{name.replace('_', '-')}", str(value)]
+        return cls(args, "/health")
+
+    @classmethod
+    def gateway(cls, config: dict) -> Server:
+        ui_prefix = config.get("ui", {}).get("prefix", "/_ui")
+        return cls(["gateway", "--config", json.dumps(config)], ui_prefix + "/api/sessions?limit=1")
+
+    @property
+    def pid(self) -> int:
+        return self._process.pid
+
+    def __enter__(self) -> Server:
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.serve", *self._args, "--port", str(self.port)],
+            cwd=ROOT,
+            env={**os.environ, "PYTHONPATH": str(ROOT)},
+        )
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"Benchmark server exited: {self._args[0]}")
+            try:
+                httpx.get(self.url + self._ready_path, timeout=1).raise_for_status()
+                return self
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        self.__exit__()
+        raise RuntimeError(f"Benchmark server did not start: {self._args[0]}")
+
+    def __exit__(self, *exc) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_bytes(pid: int) -> int | None:
+    """Resident set size of a process, or None where /proc is not available."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+@dataclass(slots=True)
+class Sample:
+    """Client-side timings of one request, in seconds."""
+
+    latency: float
+    first_byte: float
+    events: int = 0
+    gaps: list[float] = field(default_factory=list)
+
+
+async def run_load(
+    url: str,
+    payload: dict,
+    requests: int,
+    concurrency: int,
+    stream: bool = False,
+) -> tuple[list[Sample], float]:
+    """Send ``requests`` identical POSTs from ``concurrency`` workers.
+
+    Returns the samples and the wall-clock time of the whole run.
+    """
+    body = json.dumps(payload).encode()
+    headers = {"content-type": "application/json"}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    samples: list[Sample] = []
+    remaining = requests
+
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+
+        async def worker() -> None:
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                samples.append(await _send(client, url, body, headers, stream))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return samples, elapsed
+
+
+async def _send(
+    client: httpx.AsyncClient, url: str, body: bytes, headers: dict, stream: bool
+) -> Sample:
+    start = time.perf_counter()
+    async with client.stream("POST", url, content=body, headers=headers) as response:
+        response.raise_for_status()
+        first_byte = time.perf_counter() - start
+        sample = Sample(0.0, first_byte)
+        if stream:
+            last = None
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                now = time.perf_counter()
+                if last is not None:
+                    sample.gaps.append(now - last)
+                last = now
+                sample.events += 1
+        else:
+            await response.aread()
+    sample.latency = time.perf_counter() - start
+    return sample
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def summarize(samples: list[Sample], elapsed: float) -> dict:
+    """Latency percentiles (ms) and throughput of a load run."""
+    latencies = [s.latency for s in samples]
+    result = {
+        "requests": len(samples),
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "first_byte_p50_ms": percentile([s.first_byte for s in samples], 0.5) * 1000,
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+    }
+    gaps = [gap for s in samples for gap in s.gaps]
+    if gaps:
+        result["events_per_request"] = sum(s.events for s in samples) / len(samples)
+        result["gap_p50_us"] = percentile(gaps, 0.5) * 1e6
+        result["gap_p99_us"] = percentile(gaps, 0.99) * 1e6
+    return result
+
+
+async def time_get(client: httpx.AsyncClient, url: str, repeat: int) -> dict:
+    """Latency percentiles (ms) and response size of sequential GETs."""
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(url)
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+        size = len(response.content)
+    return {
+        "p50_ms": percentile(timings, 0.5) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+        "bytes": size,
+    }
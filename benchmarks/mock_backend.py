@@ -0,0 +1,137 @@
+"""Local OpenAI-compatible backend with a predictable cost.
+
+Completions are generated, never computed: ``tokens`` tokens of a fixed
+word, grouped ``chunk_tokens`` per SSE event and paced at ``token_rate``
+tokens per second (0 streams as fast as possible). Requests carrying
+``tools`` get a tool call streamed as argument fragments instead of text.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from starlette.responses import JSONResponse, StreamingResponse
+
+_TOKEN = "lorem "
+
+
+@dataclass(slots=True)
+class MockOptions:
+    tokens: int = 256
+    token_rate: float = 0.0
+    chunk_tokens: int = 1
+    # Padding added to non-streaming responses
+    response_bytes: int = 0
+    prompt_tokens: int = 32
+
+
+def create_mock_app(options: MockOptions) -> FastAPI:
+    app = FastAPI(docs_url=None, redoc_url=None)
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "mock")
+        tools = bool(body.get("tools"))
+        if body.get("stream"):
+            return StreamingResponse(
+                _stream(options, model, tools), media_type="text/event-stream"
+            )
+        return JSONResponse(_completion(options, model, tools))
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        await request.body()
+        return {
+            "object": "list",
+            "data": [{"object": "embedding", "index": 0, "embedding": [0.0] * 256}],
+            "usage": {"prompt_tokens": options.prompt_tokens, "total_tokens": 0},
+        }
+
+    return app
+
+
+def _usage(options: MockOptions) -> dict:
+    return {
+        "prompt_tokens": options.prompt_tokens,
+        "completion_tokens": options.tokens,
+        "total_tokens": options.prompt_tokens + options.tokens,
+    }
+
+
+def _completion(options: MockOptions, model: str, tools: bool) -> dict:
+    message: dict = {"role": "assistant", "content": _TOKEN * options.tokens}
+    if tools:
+        message["content"] = None
+        message["tool_calls"] = [_tool_call(_arguments(options.tokens))]
+    result = {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+        "usage": _usage(options),
+    }
+    if options.response_bytes:
+        result["padding"] = "x" * options.response_bytes
+    return result
+
+
+async def _stream(options: MockOptions, model: str, tools: bool):
+    start = time.monotonic()
+    yield _event(model, {"role": "assistant", "content": ""})
+    fragments = _arguments(options.tokens) if tools else None
+    sent = 0
+    while sent < options.tokens:
+        count = min(options.chunk_tokens, options.tokens - sent)
+        if fragments is not None:
+            end = sent + count if sent + count < options.tokens else None
+            piece = fragments[sent:end]
+            delta = {"tool_calls": [_tool_call(piece, first=sent == 0)]}
+        else:
+            delta = {"content": _TOKEN * count}
+        sent += count
+        if options.token_rate:
+            # Pace against the schedule, so sleep granularity does not add up
+            delay = start + sent / options.token_rate - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        yield _event(model, delta)
+    yield _event(model, {}, "tool_calls" if tools else "stop", _usage(options))
+    yield b"data: [DONE]\n\n"
+
+
+def _event(
+    model: str, delta: dict, finish: str | None = None, usage: dict | None = None
+) -> bytes:
+    chunk = {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion.chunk",
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+    }
+    if usage is not None:
+        chunk["usage"] = usage
+    return f"data: {json.dumps(chunk)}\n\n".encode()
+
+
+def _tool_call(arguments: str, first: bool = True) -> dict:
+    call: dict = {"index": 0, "function": {"arguments": arguments}}
+    if first:
+        call.update(id="call_mock", type="function")
+        call["function"]["name"] = "lookup"
+    return call
+
+
+def _arguments(tokens: int) -> str:
+    # About one character per token, a valid JSON object once complete
+    prefix = '{"q": "'
+    return prefix + "a" * max(tokens - len(prefix) - 2, 0) + '"}'
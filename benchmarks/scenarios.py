@@ -0,0 +1,246 @@
+"""Benchmark scenarios. Each returns a JSON-serializable dict of results."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+
+import httpx
+
+from benchmarks.harness import (
+    Sample,
+    Server,
+    percentile,
+    rss_bytes,
+    run_load,
+    summarize,
+    time_get,
+)
+
+COMPLETIONS = "/v1/chat/completions"
+_MB = 1024 * 1024
+
+
+def completion_payload(request_bytes: int, stream: bool, tools: bool = False) -> dict:
+    payload = {
+        "model": "mock",
+        "messages": [{"role": "user", "content": "x" * request_bytes}],
+        "stream": stream,
+    }
+    if tools:
+        payload["tools"] = [{"type": "function", "function": {"name": "lookup"}}]
+    return payload
+
+
+async def compare_load(
+    mock: Server, gateway: Server, args: argparse.Namespace, payload: dict, stream: bool
+) -> dict:
+    """Run the same load directly against the mock and through the gateway."""
+    runs = {}
+    for name, server in (("direct", mock), ("gateway", gateway)):
+        url = server.url + COMPLETIONS
+        await run_load(url, payload, args.warmup, args.concurrency, stream)
+        runs[name] = summarize(
+            *await run_load(url, payload, args.requests, args.concurrency, stream)
+        )
+    direct, via = runs["direct"], runs["gateway"]
+    runs["added_p50_ms"] = via["p50_ms"] - direct["p50_ms"]
+    runs["added_p99_ms"] = via["p99_ms"] - direct["p99_ms"]
+    runs["throughput_ratio"] = via["rps"] / direct["rps"] if direct["rps"] else 0.0
+    return runs
+
+
+async def regular(mock: Server, gateway: Server, args: argparse.Namespace) -> dict:
+    payload = completion_payload(args.request_bytes, stream=False)
+    return await compare_load(mock, gateway, args, payload, stream=False)
+
+
+async def stream(mock: Server, gateway: Server, args: argparse.Namespace) -> dict:
+    payload = completion_payload(args.request_bytes, stream=True)
+    return _per_chunk(await compare_load(mock, gateway, args, payload, stream=True))
+
+
+async def tool_stream(mock: Server, gateway: Server, args: argparse.Namespace) -> dict:
+    payload = completion_payload(args.request_bytes, stream=True, tools=True)
+    return _per_chunk(await compare_load(mock, gateway, args, payload, stream=True))
+
+
+def _per_chunk(result: dict) -> dict:
+    # Latency added to a whole stream, spread over its SSE events
+    events = result["direct"].get("events_per_request") or 1
+    result["per_chunk_overhead_us"] = result["added_p50_ms"] * 1000 / events
+    return result
+
+
+async def store(mock: Server, gateway: Server, args: argparse.Namespace) -> dict:
+    """Fill a dedicated gateway's store, churn it once, then time the UI."""
+    config = {
+        **args.gateway_config,
+        "backends": [{"base_url": mock.url}],
+        "store": {
+            **args.gateway_config.get("store", {}),
+            "max_sessions": args.store_sessions,
+        },
+    }
+    payload = completion_payload(args.session_bytes, stream=False)
+    with Server.gateway(config) as full:
+        url = full.url + COMPLETIONS
+        await run_load(url, payload, args.warmup, args.concurrency)
+        rss_start = rss_bytes(full.pid)
+        await run_load(url, payload, args.store_sessions, args.concurrency)
+        rss_full = rss_bytes(full.pid)
+        # Once full, every new session evicts one: memory should stay flat
+        await run_load(url, payload, args.store_sessions, args.concurrency)
+        rss_churn = rss_bytes(full.pid)
+        ui = await _ui_costs(full, config, args.ui_repeat)
+
+    result: dict = {
+        "sessions": args.store_sessions,
+        "session_bytes": args.session_bytes,
+        "ui": ui,
+    }
+    if rss_start is not None:
+        result.update(
+            rss_start_mb=rss_start / _MB,
+            rss_full_mb=rss_full / _MB,
+            rss_after_churn_mb=rss_churn / _MB,
+            rss_per_session_kb=(rss_full - rss_start) / args.store_sessions / 1024,
+            rss_churn_growth_mb=(rss_churn - rss_full) / _MB,
+        )
+    return result
+
+
+async def _ui_costs(gateway: Server, config: dict, repeat: int) -> dict:
+    prefix = config.get("ui", {}).get("prefix", "/_ui")
+    base = gateway.url + prefix
+    async with httpx.AsyncClient(timeout=120) as client:
+        listing = (await client.get(base + "/api/sessions?limit=1")).json()
+        session_id = listing["sessions"][0]["id"]
+        endpoints = {
+            "html_list": "/",
+            "api_sessions": "/api/sessions",
+            "api_sessions_page": "/api/sessions?limit=100",
+            "api_session_detail": f"/api/sessions/{session_id}",
+            "html_session_detail": f"/sessions/{session_id}",
+            "api_tool_calls_summary": "/api/tool-calls-summary",
+        }
+        return {
+            name: await time_get(client, base + path, repeat)
+            for name, path in endpoints.items()
+        }
+
+
+async def ui_jitter(mock: Server, gateway: Server, args: argparse.Namespace) -> dict:
+    """Chunk gaps of paced streams, with an idle UI then under heavy UI load.
+
+    A dedicated gateway is filled with ``--ui-sessions`` sessions of
+    ``--ui-body-bytes``, more than the rendered body cache holds, so every
+    UI request renders again. The UI is hammered from another process, so
+    the client reading the streams does not compete with it. With
+    ``--max-added-gap-ms``, the scenario fails when the UI load adds more
+    than that to the p99 chunk gap.
+    """
+    with Server.mock(
+        tokens=args.tokens, token_rate=args.jitter_token_rate, chunk_tokens=1
+    ) as paced:
+        config = {
+            **args.gateway_config,
+            "backends": [{"base_url": paced.url}],
+            "store": {
+                **args.gateway_config.get("store", {}),
+                "max_sessions": args.ui_sessions + 2 * args.concurrency,
+            },
+        }
+        with Server.gateway(config) as full:
+            url = full.url + COMPLETIONS
+            big = completion_payload(args.ui_body_bytes, stream=False)
+            await run_load(url, big, args.ui_sessions, min(4, args.concurrency))
+            payload = completion_payload(args.request_bytes, stream=True)
+            streams = (url, payload, args.concurrency, args.concurrency, True)
+            idle = _gaps(*await run_load(*streams))
+
+            prefix = config.get("ui", {}).get("prefix", "/_ui")
+            context = multiprocessing.get_context("spawn")
+            stop = context.Event()
+            done = context.Value("i", 0)
+            hammer = context.Process(
+                target=_hammer_ui, args=(full.url + prefix, stop, done), daemon=True
+            )
+            hammer.start()
+            try:
+                while not done.value and hammer.is_alive():
+                    await asyncio.sleep(0.05)
+                loaded = _gaps(*await run_load(*streams))
+            finally:
+                stop.set()
+                hammer.join(30)
+                if hammer.is_alive():
+                    hammer.kill()
+            loaded["ui_requests"] = done.value
+
+    result = {
+        "token_rate": args.jitter_token_rate,
+        "sessions": args.ui_sessions,
+        "session_bytes": args.ui_body_bytes,
+        "idle": idle,
+        "ui_load": loaded,
+        "added_gap_p99_ms": loaded["gap_p99_ms"] - idle["gap_p99_ms"],
+        "added_gap_max_ms": loaded["gap_max_ms"] - idle["gap_max_ms"],
+    }
+    if args.max_added_gap_ms is not None:
+        result["max_added_gap_ms"] = args.max_added_gap_ms
+        result["passed"] = result["added_gap_p99_ms"] <= args.max_added_gap_ms
+    return result
+
+
+def _gaps(samples: list[Sample], elapsed: float) -> dict:
+    gaps = [gap for s in samples for gap in s.gaps]
+    return {
+        "streams": len(samples),
+        "gap_p50_ms": percentile(gaps, 0.5) * 1000,
+        "gap_p99_ms": percentile(gaps, 0.99) * 1000,
+        "gap_max_ms": max(gaps, default=0.0) * 1000,
+    }
+
+
+def _hammer_ui(base: str, stop, done, workers: int = 4) -> None:
+    """Request detail pages, pretty bodies and list pages until ``stop`` is set."""
+
+    async def hammer() -> None:
+        async with httpx.AsyncClient(timeout=120) as client:
+            listing = (await client.get(base + "/api/sessions")).json()["sessions"]
+            ids = [s["id"] for s in listing]
+            paths = [
+                path
+                for session_id in ids
+                for path in (
+                    f"/api/sessions/{session_id}/bodies/request/pretty",
+                    f"/sessions/{session_id}",
+                    f"/api/sessions/{session_id}",
+                    "/api/sessions?limit=100",
+                )
+            ]
+            position = 0
+
+            async def worker() -> None:
+                nonlocal position
+                while not stop.is_set():
+                    path = paths[position % len(paths)]
+                    position += 1
+                    (await client.get(base + path)).raise_for_status()
+                    with done.get_lock():
+                        done.value += 1
+
+            await asyncio.gather(*(worker() for _ in range(workers)))
+
+    asyncio.run(hammer())
+
+
+SCENARIOS = {
+    "regular": regular,
+    "stream": stream,
+    "tool_stream": tool_stream,
+    "store": store,
+    "ui_jitter": ui_jitter,
+}
@@ -0,0 +1,57 @@
+"""Run the mock backend or the gateway in its own process for the benchmarks.
+
+    python -m benchmarks.serve mock --port 9101 --tokens 256
+    python -m benchmarks.serve gateway --port 9100 --config '{"backends": [...]}'
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+import uvicorn
+from loguru import logger
+
+from benchmarks.mock_backend import MockOptions, create_mock_app
+from gateway_ia.app import create_app
+from gateway_ia.config import AppConfig
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.serve")
+    sub = parser.add_subparsers(dest="server", required=True)
+
+    mock = sub.add_parser("mock")
+    mock.add_argument("--port", type=int, required=True)
+    mock.add_argument("--tokens", type=int, default=256)
+    mock.add_argument("--token-rate", type=float, default=0.0)
+    mock.add_argument("--chunk-tokens", type=int, default=1)
+    mock.add_argument("--response-bytes", type=int, default=0)
+
+    gateway = sub.add_parser("gateway")
+    gateway.add_argument("--port", type=int, required=True)
+    gateway.add_argument("--config", default="{}", help="AppConfig as JSON")
+
+    args = parser.parse_args(argv)
+    if args.server == "mock":
+        app = create_mock_app(
+            MockOptions(
+                tokens=args.tokens,
+                token_rate=args.token_rate,
+                chunk_tokens=args.chunk_tokens,
+                response_bytes=args.response_bytes,
+            )
+        )
+    else:
+        # Per-request debug logging would dominate what we measure
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+        app = create_app(AppConfig(**json.loads(args.config)))
+    uvicorn.run(
+        app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False
+    )
+
+
+if __name__ == "__main__":
+    main()
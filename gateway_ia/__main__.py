@@ -1,13 +1,40 @@
+"""Run the gateway, or export and import captured sessions.
+
+python -m gateway_ia
+python -m gateway_ia export --format har --start 2024-05-01 -o day.har.gz
+python -m gateway_ia import day.har.gz
+python -m gateway_ia replay http://new-backend:8000 --file day.har.gz --pace recorded
+"""
+
 from __future__ import annotations
 
+import argparse
+import asyncio
+import gzip
+import itertools
+import json
 import logging
 import sys
+from collections.abc import Iterator
+from datetime import UTC, datetime
+from typing import BinaryIO
 
+import httpx
 import uvicorn
+from fastapi import FastAPI
 from loguru import logger
 
 from gateway_ia.app import create_app
-from gateway_ia.config import load_config
+from gateway_ia.config import AppConfig, load_config
+from gateway_ia.export import (
+    export_sessions,
+    import_sessions,
+    read_sessions,
+    session_to_json,
+)
+from gateway_ia.models import SessionQuery, SessionRecord, SessionStatus
+from gateway_ia.replay import Replayer, ReplayReport
+from gateway_ia.store import create_store
 
 
 class _InterceptHandler(logging.Handler):
@@ -31,7 +58,9 @@ class _InterceptHandler(logging.Handler):
 def _make_log_filter(log_level: str, ui_prefix: str, quiet: bool):
     """Build a loguru filter that enforces per-module levels and hides UI access logs."""
     level_no = logger.level(log_level).no
-    httpx_no = logger.level("DEBUG").no if log_level == "DEBUG" else logger.level("WARNING").no
+    httpx_no = (
+        logger.level("DEBUG").no if log_level == "DEBUG" else logger.level("WARNING").no
+    )
 
     def _filter(record):
         name = record["name"] or ""
@@ -49,8 +78,323 @@ def _make_log_filter(log_level: str, ui_prefix: str, quiet: bool):
     return _filter
 
 
-def main() -> None:
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m gateway_ia")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("serve", help="run the gateway (default)")
+
+    export = sub.add_parser(
+        "export", help="write finished sessions as JSON Lines or HAR, oldest first"
+    )
+    export.add_argument("--format", choices=("jsonl", "har"), default="jsonl")
+    export.add_argument(
+        "-o",
+        "--output",
+        help="file to write (gzipped when ending in .gz), default stdout",
+    )
+    export.add_argument(
+        "--url",
+        help="export from a running gateway (e.g. http://localhost:8080) "
+        "instead of opening the configured store",
+    )
+    export.add_argument(
+        "--keep-credentials",
+        action="store_true",
+        help="keep API keys and cookies instead of redacting them",
+    )
+    _add_filters(export)
+
+    load = sub.add_parser(
+        "import", help="load exported sessions into the configured store"
+    )
+    load.add_argument(
+        "files", nargs="+", help="JSON Lines or HAR files, optionally .gz"
+    )
+
+    replay = sub.add_parser(
+        "replay", help="re-send captured sessions to a backend and compare timings"
+    )
+    replay.add_argument("target", help="base URL, or the name of a configured backend")
+    replay.add_argument(
+        "--file",
+        action="append",
+        help="export file to replay (repeatable); default: the configured store, "
+        "selected by the filters below",
+    )
+    replay.add_argument(
+        "--pace", choices=("concurrency", "rate", "recorded"), default="concurrency"
+    )
+    replay.add_argument(
+        "--concurrency",
+        type=int,
+        help="requests in flight (default 8); a cap for the other pacings",
+    )
+    replay.add_argument(
+        "--rate", type=_positive, default=1.0, help="requests/s with --pace rate"
+    )
+    replay.add_argument(
+        "--speed",
+        type=_positive,
+        default=1.0,
+        help="time compression with --pace recorded",
+    )
+    replay.add_argument("--limit", type=int, help="replay at most this many sessions")
+    replay.add_argument("--run-id", help="default: random")
+    replay.add_argument(
+        "-H",
+        "--header",
+        action="append",
+        default=[],
+        help="'Name: value' set on every request (e.g. a different API key)",
+    )
+    replay.add_argument(
+        "--save", help="write the replayed sessions to this JSON Lines file (.gz ok)"
+    )
+    replay.add_argument("-o", "--output", help="write the JSON report to this file")
+    _add_filters(replay)
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        _export(args)
+    elif args.command == "import":
+        _import(args)
+    elif args.command == "replay":
+        _replay(args)
+    else:
+        _serve()
+
+
+def _add_filters(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--path", help="path prefix")
+    parser.add_argument("--status", choices=[s.value for s in SessionStatus])
+    parser.add_argument("--status-code", type=int)
+    parser.add_argument("--model")
+    parser.add_argument("--tool")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="ISO date or time")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="ISO date or time")
+    parser.add_argument("--replay", help="sessions sent by this replay run")
+
+
+def _filters(args: argparse.Namespace) -> SessionQuery:
+    return SessionQuery(
+        path=args.path,
+        status=SessionStatus(args.status) if args.status else None,
+        status_code=args.status_code,
+        model=args.model,
+        tool=args.tool,
+        created_after=_as_utc(args.start),
+        created_before=_as_utc(args.end),
+        replay_run=args.replay,
+    )
+
+
+def _serve() -> None:
     config = load_config()
+    _configure_logging(config)
+    log_level = config.logging.level.upper()
+    options = {
+        "host": config.listen.host,
+        "port": config.listen.port,
+        "log_level": log_level.lower(),
+        "log_config": None,
+        "access_log": not config.logging.quiet,
+    }
+
+    if config.listen.workers > 1:
+        # Each worker process loads the configuration and builds its own app
+        uvicorn.run(
+            "gateway_ia.__main__:worker_app",
+            factory=True,
+            workers=config.listen.workers,
+            **options,
+        )
+        return
+
+    app = create_app(config)
+    uvicorn.run(app, **options)
+
+
+def worker_app() -> FastAPI:
+    """App factory for worker processes, which start with a fresh interpreter."""
+    config = load_config()
+    _configure_logging(config)
+    return create_app(config)
+
+
+def _export(args: argparse.Namespace) -> None:
+    config = load_config()
+    output = _open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        if args.url:
+            _export_remote(args, config, output)
+            return
+        if config.store.backend == "memory":
+            sys.exit(
+                "The memory store does not outlive the gateway: "
+                "pass --url to export from a running one"
+            )
+        store = create_store(config.store)
+        try:
+            chunks = export_sessions(
+                store, _filters(args), args.format, args.keep_credentials
+            )
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            store.close()
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+
+
+def _export_remote(
+    args: argparse.Namespace, config: AppConfig, output: BinaryIO
+) -> None:
+    params = {
+        "format": args.format,
+        "path": args.path,
+        "status": args.status,
+        "status_code": args.status_code,
+        "model": args.model,
+        "tool": args.tool,
+        "start": args.start.isoformat() if args.start else None,
+        "end": args.end.isoformat() if args.end else None,
+        "replay": args.replay,
+        "credentials": "true" if args.keep_credentials else None,
+    }
+    url = args.url.rstrip("/") + config.ui.prefix + "/api/export"
+    with httpx.stream(
+        "GET",
+        url,
+        params={k: v for k, v in params.items() if v is not None},
+        timeout=httpx.Timeout(30, read=None),
+    ) as response:
+        response.raise_for_status()
+        for chunk in response.iter_bytes():
+            output.write(chunk)
+
+
+def _import(args: argparse.Namespace) -> None:
+    config = load_config()
+    if config.store.backend == "memory":
+        sys.exit(
+            "Importing needs a persistent store: set store.backend to segment or sqlite"
+        )
+    store = create_store(config.store)
+    try:
+        for path in args.files:
+            with _open(path, "rb") as f:
+                count, evicted = import_sessions(store, read_sessions(f))
+            print(f"{path}: {count} sessions imported", file=sys.stderr)
+            if evicted:
+                print(
+                    f"Warning: {evicted} sessions evicted by the store limits "
+                    "(max_sessions, max_bytes, max_age_s)",
+                    file=sys.stderr,
+                )
+    finally:
+        store.close()
+    print(f"{store.count} sessions in {config.store.path}", file=sys.stderr)
+
+
+def _replay(args: argparse.Namespace) -> None:
+    config = load_config()
+    named = {backend.name: backend.base_url for backend in config.backends}
+    headers = {}
+    for header in args.header:
+        name, _, value = header.partition(":")
+        headers[name.strip()] = value.strip()
+    replayer = Replayer(
+        named.get(args.target, args.target),
+        pacing=args.pace,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        speed=args.speed,
+        run_id=args.run_id,
+        headers=headers,
+    )
+
+    store = None
+    if args.file:
+        sessions = _read_files(args.file)
+    elif config.store.backend == "memory":
+        sys.exit("The memory store does not outlive the gateway: pass --file")
+    else:
+        store = create_store(config.store)
+        ids = store.select(_filters(args))
+        sessions = (s for s in map(store.get, ids) if s is not None)
+    if args.limit is not None:
+        sessions = itertools.islice(sessions, args.limit)
+
+    save = _open(args.save, "wb") if args.save else None
+
+    def on_replayed(session: SessionRecord) -> None:
+        if save is not None:
+            save.write((json.dumps(session_to_json(session)) + "\n").encode("utf-8"))
+
+    print(f"Replay run {replayer.run_id} to {replayer.target}", file=sys.stderr)
+    try:
+        report = asyncio.run(replayer.run(sessions, on_replayed))
+    finally:
+        if save is not None:
+            save.close()
+        if store is not None:
+            store.close()
+
+    summary = report.summary()
+    _print_comparison(report, summary)
+    text = json.dumps(summary, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def _read_files(paths: list[str]) -> Iterator[SessionRecord]:
+    for path in paths:
+        with _open(path, "rb") as f:
+            yield from read_sessions(f)
+
+
+def _print_comparison(report: ReplayReport, summary: dict) -> None:
+    print(
+        f"{summary['sent']} sent, {summary['errors']} errors, "
+        f"{summary['status_mismatches']} status changes, "
+        f"{summary['rps']:.1f} req/s",
+        file=sys.stderr,
+    )
+    for name, metric in summary["metrics"].items():
+        before, after = metric["original"], metric["replayed"]
+        change = metric["change_p50"]
+        print(
+            f"{name:<14} p50 {before['p50']:>10.1f} -> {after['p50']:>10.1f}"
+            f"  p99 {before['p99']:>10.1f} -> {after['p99']:>10.1f}"
+            + (f"  {change:+.1%}" if change is not None else ""),
+            file=sys.stderr,
+        )
+
+
+def _open(path: str, mode: str) -> BinaryIO:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _positive(value: str) -> float:
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0: {value}")
+    return number
+
+
+def _as_utc(value: datetime | None) -> datetime | None:
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=UTC)
+
+
+def _configure_logging(config: AppConfig) -> None:
     log_level = config.logging.level.upper()
 
     # Configure loguru
@@ -70,16 +414,6 @@ def main() -> None:
     # Intercept all stdlib logging → loguru
     logging.basicConfig(handlers=[_InterceptHandler()], level=0, force=True)
 
-    app = create_app(config)
-    uvicorn.run(
-        app,
-        host=config.listen.host,
-        port=config.listen.port,
-        log_level=log_level.lower(),
-        log_config=None,
-        access_log=not config.logging.quiet,
-    )
-
 
 if __name__ == "__main__":
     main()
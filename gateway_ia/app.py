@@ -2,28 +2,48 @@ from __future__ import annotations
 
 from contextlib import asynccontextmanager
 
-import httpx
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
 
-from gateway_ia.config import AppConfig
-from gateway_ia.routers import proxy, ui
-from gateway_ia.store import SessionStore
+from gateway_ia.config import AppConfig, load_config
+from gateway_ia.routers import metrics, proxy, ui
+from gateway_ia.services.cache import create_cache
+from gateway_ia.services.capture import CapturePolicy
+from gateway_ia.services.coalesce import create_coalescer
+from gateway_ia.services.metrics import create_metrics
+from gateway_ia.services.pipeline import CapturePipeline
+from gateway_ia.services.rendering import create_render_pool
+from gateway_ia.services.routing import BackendRouter
+from gateway_ia.store import create_store
 
 
-def create_app(config: AppConfig) -> FastAPI:
+def create_app(config: AppConfig | None = None) -> FastAPI:
+    if config is None:
+        config = load_config()
 
     @asynccontextmanager
     async def lifespan(app: FastAPI):
         app.state.config = config
-        app.state.store = SessionStore()
-        app.state.http_client = httpx.AsyncClient(
-            base_url=config.backend.base_url,
-            timeout=httpx.Timeout(config.backend.timeout, connect=10),
-            verify=config.backend.verify_ssl,
+        app.state.capture_policy = CapturePolicy(config.capture)
+        app.state.store = create_store(config.store)
+        await app.state.store.start()
+        app.state.cache = create_cache(config.cache)
+        app.state.coalescer = create_coalescer(config.coalesce)
+        app.state.metrics = create_metrics(config.metrics)
+        app.state.pipeline = CapturePipeline(
+            app.state.store, config.capture, app.state.metrics
         )
+        await app.state.pipeline.start()
+        app.state.render_pool = create_render_pool(config.ui)
+        app.state.backends = BackendRouter(config)
+        await app.state.backends.start()
         yield
-        await app.state.http_client.aclose()
+        await app.state.backends.stop()
+        await app.state.pipeline.stop()
+        if app.state.cache is not None:
+            await app.state.cache.stop()
+        app.state.render_pool.shutdown()
+        await app.state.store.stop()
 
     app = FastAPI(
         title="gateway-ia",
@@ -37,6 +57,8 @@ def create_app(config: AppConfig) -> FastAPI:
         return RedirectResponse(url=config.ui.prefix + "/")
 
     app.include_router(ui.router, prefix=config.ui.prefix)
+    if config.metrics.enabled:
+        app.include_router(metrics.router, prefix=config.metrics.path)
     app.include_router(proxy.router)
 
     return app
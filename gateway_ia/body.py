@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import mmap
+import os
+import tempfile
+from collections.abc import Callable, Iterable, Iterator
+from threading import Lock
+from typing import TYPE_CHECKING, BinaryIO
+
+if TYPE_CHECKING:
+    from gateway_ia.compression import BodyCodec
+
+_READ_BLOCK = 64 * 1024
+# Bodies smaller than this are not worth compressing
+_MIN_COMPRESS = 256
+# Guards where a body lives (chunks, file, compressed form), which readers
+# in other threads snapshot; held only for reference swaps
+_state_lock = Lock()
+
+
+class BodyBuffer:
+    """Captured HTTP body held as a list of immutable chunks.
+
+    Chunks are kept as the ``bytes`` objects received from the network, so
+    capturing never copies them. A body loaded from a store may instead be
+    a single ``memoryview`` (of a memory-mapped file), copied only when
+    ``getvalue`` or ``text`` is called. Once the body grows past ``spill_threshold``
+    bytes it is moved to an anonymous temporary file and further chunks are
+    appended there. Bytes past ``limit`` are dropped. The decoded text is
+    cached for the UI readers.
+
+    A finished body can be ``compress``-ed in place; every read then
+    decompresses it on demand and the decoded text is no longer cached.
+    Reads may run in other threads while the body spills or is compressed:
+    the new form is built first, then published under a lock.
+    """
+
+    __slots__ = (
+        "_chunks",
+        "_file",
+        "_limit",
+        "_packed",
+        "_size",
+        "_spill_threshold",
+        "_text",
+    )
+
+    def __init__(
+        self,
+        chunks: Iterable[bytes] = (),
+        spill_threshold: int | None = None,
+        limit: int | None = None,
+    ) -> None:
+        self._chunks: list[bytes] = []
+        self._size = 0
+        self._file: BinaryIO | None = None
+        self._spill_threshold = spill_threshold
+        self._text: str | None = None
+        self._limit = limit
+        # Compressed bytes and the function restoring them
+        self._packed: tuple[bytes, Callable[[bytes], bytes]] | None = None
+        for chunk in chunks:
+            self.append(chunk)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __iter__(self) -> Iterator[bytes]:
+        """Iterate over the body in chunks without materializing it."""
+        with _state_lock:
+            packed, chunks, file = self._packed, self._chunks, self._file
+        if packed is not None:
+            yield packed[1](packed[0])
+            return
+        if file is None:
+            yield from list(chunks)
+            return
+        file.flush()
+        fd = file.fileno()
+        offset = 0
+        while offset < self._size:
+            block = os.pread(fd, min(_READ_BLOCK, self._size - offset), offset)
+            if not block:
+                break
+            offset += len(block)
+            yield block
+
+    def __repr__(self) -> str:
+        if self._packed is not None:
+            where = f"{len(self._packed[0])} compressed bytes"
+        elif self._file is not None:
+            where = "file"
+        else:
+            where = f"{len(self._chunks)} chunks"
+        return f"<BodyBuffer {self._size} bytes in {where}>"
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    @property
+    def stored_size(self) -> int:
+        """Bytes held for the body, once compressed."""
+        packed = self._packed
+        return self._size if packed is None else len(packed[0])
+
+    def append(self, chunk: bytes) -> int:
+        """Append ``chunk`` and return how many of its bytes were kept."""
+        if not chunk:
+            return 0
+        if self._limit is not None and self._size + len(chunk) > self._limit:
+            chunk = chunk[: self._limit - self._size]
+            if not chunk:
+                return 0
+        self._text = None
+        if self._packed is not None:
+            data, unpack = self._packed
+            restored = [unpack(data)]
+            with _state_lock:
+                self._chunks, self._packed = restored, None
+        self._size += len(chunk)
+        if self._file is not None:
+            self._file.write(chunk)
+            return len(chunk)
+        self._chunks.append(chunk)
+        if self._spill_threshold is not None and self._size > self._spill_threshold:
+            self._spill()
+        return len(chunk)
+
+    def getvalue(self) -> bytes:
+        """Return the whole body as a single ``bytes`` object."""
+        with _state_lock:
+            packed, chunks, file = self._packed, self._chunks, self._file
+        if packed is not None:
+            return packed[1](packed[0])
+        if file is not None:
+            file.flush()
+            return os.pread(file.fileno(), self._size, 0)
+        if len(chunks) > 1:
+            data = b"".join(chunks)
+            # Collapse once so later reads are free, unless the body moved
+            with _state_lock:
+                if self._chunks is chunks:
+                    self._chunks = [data]
+            return data
+        return bytes(chunks[0]) if chunks else b""
+
+    def view(self) -> memoryview:
+        """Return a read-only view of the body (memory-mapped once spilled)."""
+        file = self._file
+        if file is not None and self._size:
+            file.flush()
+            return memoryview(
+                mmap.mmap(file.fileno(), self._size, access=mmap.ACCESS_READ)
+            )
+        with _state_lock:
+            packed, chunks = self._packed, self._chunks
+        if packed is None and len(chunks) == 1:
+            return memoryview(chunks[0])
+        return memoryview(self.getvalue())
+
+    def text(self) -> str:
+        """Decode the body as UTF-8, caching the result.
+
+        Raises ``UnicodeDecodeError`` for binary bodies.
+        """
+        text = self._text
+        if text is not None:
+            return text
+        text = self.getvalue().decode("utf-8")
+        with _state_lock:
+            # Compressed bodies are decoded on every read
+            if self._packed is None:
+                self._text = text
+        return text
+
+    def compress(self, codec: BodyCodec) -> None:
+        """Replace the in-memory chunks by their compressed form, if smaller.
+
+        Spilled bodies already live outside memory and are left alone.
+        """
+        if self._file is not None or self._packed is not None:
+            return
+        if self._size < _MIN_COMPRESS:
+            return
+        packed = codec.compress(self.getvalue())
+        if len(packed[0]) >= self._size:
+            return
+        with _state_lock:
+            self._packed = packed
+            self._chunks = []
+            self._text = None
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+    def _spill(self) -> None:
+        file = tempfile.TemporaryFile(prefix="gateway-ia-body-")  # noqa: SIM115
+        for chunk in self._chunks:
+            file.write(chunk)
+        with _state_lock:
+            self._file = file
+            self._chunks = []
+
+
+def as_body(value: BodyBuffer | bytes | memoryview | None) -> BodyBuffer | None:
+    """Wrap raw bytes (e.g. loaded from a store) into a ``BodyBuffer``.
+
+    A ``memoryview`` is wrapped as is, without copying the bytes it points to.
+    """
+    if value is None or isinstance(value, BodyBuffer):
+        return value
+    if isinstance(value, memoryview):
+        return BodyBuffer([value])
+    return BodyBuffer([bytes(value)])
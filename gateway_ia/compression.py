@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import zlib
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Callable
+from functools import partial
+from threading import Lock
+
+from loguru import logger
+
+from gateway_ia.config import StoreConfig
+
+Decompress = Callable[[bytes], bytes]
+
+# Bytes of each body kept as a dictionary training sample
+_SAMPLE_BYTES = 16 * 1024
+
+
+class BodyCodec(ABC):
+    """Compresses captured bodies.
+
+    ``compress`` returns the compressed bytes together with the function
+    that restores them, so a body never depends on the codec's later state
+    (e.g. a retrained dictionary).
+    """
+
+    @abstractmethod
+    def compress(self, data: bytes) -> tuple[bytes, Decompress]: ...
+
+
+class ZlibCodec(BodyCodec):
+    def __init__(self, level: int | None = None) -> None:
+        self._level = 6 if level is None else level
+
+    def compress(self, data: bytes) -> tuple[bytes, Decompress]:
+        return zlib.compress(data, self._level), zlib.decompress
+
+
+class ZstdCodec(BodyCodec):
+    """Zstandard, optionally with a dictionary trained on recent bodies.
+
+    SSE streams and chat prompts repeat the same scaffolding in every
+    session; a shared dictionary lets even small bodies compress well.
+    Training runs once ``train_samples`` bodies have been seen, then again
+    every ``train_samples`` bodies on the most recent ones.
+    """
+
+    def __init__(
+        self,
+        level: int | None = None,
+        dictionary: bool = False,
+        dictionary_bytes: int = 64 * 1024,
+        train_samples: int = 1000,
+    ) -> None:
+        import zstandard
+
+        self._zstd = zstandard
+        self._level = 3 if level is None else level
+        self._compressor = zstandard.ZstdCompressor(level=self._level)
+        self._decompress: Decompress = partial(_zstd_decompress, zstandard, None)
+        self._dictionary_bytes = dictionary_bytes
+        self._train_samples = train_samples
+        self._samples: deque[bytes] | None = (
+            deque(maxlen=train_samples) if dictionary else None
+        )
+        self._seen = 0
+        self._lock = Lock()
+
+    def compress(self, data: bytes) -> tuple[bytes, Decompress]:
+        with self._lock:
+            if self._samples is not None:
+                self._sample(data)
+            return self._compressor.compress(data), self._decompress
+
+    def _sample(self, data: bytes) -> None:
+        self._samples.append(data[:_SAMPLE_BYTES])
+        self._seen += 1
+        if self._seen % self._train_samples:
+            return
+        try:
+            trained = self._zstd.train_dictionary(
+                self._dictionary_bytes, list(self._samples), level=self._level
+            )
+        except self._zstd.ZstdError as exc:
+            logger.debug("Body dictionary training failed: {}", exc)
+            return
+        self._compressor = self._zstd.ZstdCompressor(
+            level=self._level, dict_data=trained
+        )
+        self._decompress = partial(_zstd_decompress, self._zstd, trained)
+        logger.debug("Trained a {} byte body dictionary", len(trained.as_bytes()))
+
+
+def _zstd_decompress(zstandard, dictionary, data: bytes) -> bytes:
+    # Decompressors are not thread-safe and UI reads may run concurrently
+    return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(data)
+
+
+def create_codec(config: StoreConfig) -> BodyCodec | None:
+    """Build the body codec selected in the configuration, if any."""
+    if config.compression == "zlib":
+        return ZlibCodec(config.compression_level)
+    if config.compression == "zstd":
+        try:
+            return ZstdCodec(config.compression_level, config.compression_dictionary)
+        except ImportError:
+            raise RuntimeError(
+                "store.compression 'zstd' needs the zstandard package "
+                "(pip install 'gateway-ia[zstd]')"
+            ) from None
+    return None
@@ -2,24 +2,90 @@ from __future__ import annotations
 
 import os
 from pathlib import Path
+from typing import Literal
 
 import yaml
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 
 
 class BackendConfig(BaseModel):
+    name: str = "default"
     base_url: str = "http://172.24.208.1:1234"
+    # Default for every phase without its own timeout (seconds)
     timeout: int = 120
+    connect_timeout: float | None = 10.0
+    read_timeout: float | None = None
+    write_timeout: float | None = None
+    # Time to wait for a free pooled connection
+    pool_timeout: float | None = None
     verify_ssl: bool = True
+    # Connection pool (null for no limit)
+    max_connections: int | None = 100
+    max_keepalive_connections: int | None = 20
+    keepalive_expiry: float | None = 5.0
+    # Requires the "h2" package (httpx[http2])
+    http2: bool = False
+    # Admission control: requests in flight at once (null for no limit), and
+    # how many more may wait, for how long (seconds)
+    max_concurrency: int | None = None
+    max_queue: int = 100
+    queue_timeout: float | None = 30.0
+
+
+class AdmissionConfig(BaseModel):
+    # Header naming the priority class of a request
+    priority_header: str = "x-priority"
+    # Priority class -> rank, lower ranks are admitted first
+    classes: dict[str, int] = {"high": 0, "normal": 1, "low": 2}
+    default_class: str = "normal"
+    # API key (Bearer token or x-api-key) -> priority class
+    api_keys: dict[str, str] = {}
+    # Status returned when a backend queue is full (timeouts return 503)
+    reject_status: Literal[429, 503] = 429
+    retry_after_s: int = 1
+
+
+class RouteConfig(BaseModel):
+    # A route matches when every condition set on it matches; a route
+    # without conditions matches every request
+    path_prefix: str | None = None
+    # Glob pattern matched against the "model" field of a JSON request body
+    model: str | None = None
+    # Names of the backends forming the pool serving this route
+    backends: list[str] = Field(min_length=1)
+
+
+class HealthCheckConfig(BaseModel):
+    # Active checks: GET this path on every backend (null disables them)
+    path: str | None = None
+    interval: float = 10.0
+    timeout: float = 2.0
+    # Passive checks: consecutive failures (connection errors, 502/503/504)
+    # after which a backend is ejected, and for how long
+    max_failures: int = 3
+    ejection_s: float = 30.0
+
+
+class RoutingConfig(BaseModel):
+    strategy: Literal["round_robin", "least_outstanding", "ewma"] = "round_robin"
+    # First matching route wins; unmatched requests go to the first backend
+    routes: list[RouteConfig] = []
+    health: HealthCheckConfig = HealthCheckConfig()
 
 
 class ListenConfig(BaseModel):
     host: str = "0.0.0.0"
     port: int = 8080
+    # Worker processes; more than one requires the shared SQLite store
+    workers: int = Field(1, ge=1)
 
 
 class UIConfig(BaseModel):
     prefix: str = "/_ui"
+    # Pool decoding and pretty-printing session bodies off the event loop:
+    # "thread", or "process" to keep that work off the loop's GIL too
+    render_pool: Literal["thread", "process"] = "thread"
+    render_workers: int = Field(2, ge=1)
 
 
 class LoggingConfig(BaseModel):
@@ -27,17 +93,173 @@ class LoggingConfig(BaseModel):
     quiet: bool = False
 
 
+class CaptureRule(BaseModel):
+    # Glob pattern matched against the request path, e.g. "/v1/embeddings*"
+    path: str
+    mode: Literal["full", "metadata"] | None = None
+    max_body_bytes: int | None = None
+    sample_rate: float | None = None
+
+
+class CaptureConfig(BaseModel):
+    # "metadata" records headers and timings only, no bodies
+    mode: Literal["full", "metadata"] = "full"
+    # Bodies are still forwarded in full; only the captured copy is truncated
+    max_body_bytes: int | None = None
+    # Fraction of requests recorded (0.0 - 1.0)
+    sample_rate: float = Field(1.0, ge=0.0, le=1.0)
+    # Glob patterns; an empty include list records every path
+    include_paths: list[str] = []
+    exclude_paths: list[str] = []
+    # Per-path overrides, the first matching rule wins
+    rules: list[CaptureRule] = []
+    # Captured bodies larger than this are moved to a temporary file
+    spill_bytes: int | None = 8 * 1024 * 1024
+    # Forward request bodies to the backend as they arrive instead of
+    # buffering them first, capturing them on the way
+    stream_request_body: bool = False
+    # Sessions are recorded by a background task: events waiting for it,
+    # and what to do with new sessions when that many are waiting
+    queue_size: int = Field(10_000, ge=1)
+    backpressure: Literal["drop", "block"] = "drop"
+
+
+class CacheConfig(BaseModel):
+    enabled: bool = False
+    backend: Literal["memory", "disk"] = "memory"
+    # Disk backend: directory holding the cached responses
+    path: str = "data/cache"
+    max_bytes: int = 256 * 1024 * 1024
+    ttl_s: float | None = 3600
+    # Glob patterns of the cacheable paths (POST with a JSON body only)
+    paths: list[str] = ["/v1/chat/completions", "/v1/completions", "/v1/embeddings"]
+    # Cache completions only when requested with temperature 0
+    deterministic_only: bool = True
+    # Replay cached SSE streams with their original chunk timing
+    replay_timing: bool = False
+
+
+class CoalesceConfig(BaseModel):
+    # Share one upstream call between identical concurrent requests
+    enabled: bool = False
+    paths: list[str] = ["/v1/chat/completions", "/v1/completions", "/v1/embeddings"]
+    # Coalesce completions only when requested with temperature 0
+    deterministic_only: bool = True
+
+
+class MetricsConfig(BaseModel):
+    # Prometheus text exposition endpoint, served by the gateway itself
+    # instead of being proxied
+    enabled: bool = False
+    path: str = "/metrics"
+    # Glob patterns used as the path label, first match wins; other paths
+    # are labelled "other" so unknown paths cannot grow the series count
+    paths: list[str] = [
+        "/v1/chat/completions",
+        "/v1/completions",
+        "/v1/embeddings",
+        "/v1/responses",
+        "/v1/messages",
+        "/v1/models*",
+    ]
+    # Glob patterns used as the model label, first match wins; other models
+    # are labelled "other". Defaults to the model patterns of the routes
+    models: list[str] | None = None
+    # Upper bounds of the latency histogram buckets (seconds)
+    buckets: list[float] = [
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+        30.0,
+        60.0,
+        120.0,
+    ]
+
+
+class StoreConfig(BaseModel):
+    backend: Literal["memory", "segment", "sqlite"] = "memory"
+    max_sessions: int | None = 1000
+    max_bytes: int | None = None
+    max_age_s: float | None = None
+    # Segment and SQLite backends: directory holding the session files
+    path: str = "data/sessions"
+    # Segment backend only
+    segment_bytes: int = 64 * 1024 * 1024
+    # SQLite backend only: seconds between batched writes
+    flush_interval: float = 0.5
+    # SQLite backend only: also index the sessions written by other processes
+    # sharing the database (set automatically with several workers)
+    shared: bool = False
+    # Memory backend only: compress bodies once sessions complete. "zstd"
+    # needs the zstandard package
+    compression: Literal["none", "zlib", "zstd"] = "none"
+    compression_level: int | None = None
+    # zstd only: train a shared dictionary on recent bodies
+    compression_dictionary: bool = False
+
+
 class AppConfig(BaseModel):
-    backend: BackendConfig = BackendConfig()
+    backends: list[BackendConfig] = Field(
+        default_factory=lambda: [BackendConfig()], min_length=1
+    )
+    routing: RoutingConfig = RoutingConfig()
+    admission: AdmissionConfig = AdmissionConfig()
     listen: ListenConfig = ListenConfig()
     ui: UIConfig = UIConfig()
     logging: LoggingConfig = LoggingConfig()
+    capture: CaptureConfig = CaptureConfig()
+    store: StoreConfig = StoreConfig()
+    cache: CacheConfig = CacheConfig()
+    coalesce: CoalesceConfig = CoalesceConfig()
+    metrics: MetricsConfig = MetricsConfig()
+
+    @model_validator(mode="before")
+    @classmethod
+    def _single_backend(cls, data):
+        """Accept the former single ``backend`` section."""
+        if isinstance(data, dict) and "backend" in data and "backends" not in data:
+            data = dict(data)
+            data["backends"] = [data.pop("backend")]
+        return data
+
+    @model_validator(mode="after")
+    def _check_backends(self):
+        names = [backend.name for backend in self.backends]
+        if len(set(names)) != len(names):
+            raise ValueError("Backend names must be unique")
+        for route in self.routing.routes:
+            unknown = set(route.backends) - set(names)
+            if unknown:
+                raise ValueError(f"Route refers to unknown backends: {sorted(unknown)}")
+        return self
+
+    @model_validator(mode="after")
+    def _check_workers(self):
+        if self.listen.workers > 1:
+            if self.store.backend != "sqlite":
+                raise ValueError("Several workers require the sqlite session store")
+            self.store.shared = True
+        return self
+
+    @model_validator(mode="after")
+    def _metrics_models(self):
+        if self.metrics.models is None:
+            self.metrics.models = [
+                route.model for route in self.routing.routes if route.model
+            ]
+        return self
 
 
 def load_config() -> AppConfig:
-    config_path = Path(
-        os.environ.get("GATEWAY_IA_CONFIG", "config.yaml")
-    )
+    config_path = Path(os.environ.get("GATEWAY_IA_CONFIG", "config.yaml"))
     if config_path.exists():
         with open(config_path) as f:
             data = yaml.safe_load(f) or {}
@@ -0,0 +1,353 @@
+"""Session export and import, as JSON Lines or HAR.
+
+Both writers are generators yielding one session at a time, so exporting
+a large store only ever holds one session in memory. JSON Lines keeps
+every recorded field; HAR 1.2 can be opened by browser devtools and HAR
+viewers, and carries the same fields under ``_gateway_ia`` so it imports
+back losslessly. Credential headers are redacted unless asked otherwise.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+from collections.abc import Iterable, Iterator, Mapping
+from datetime import UTC, datetime
+from importlib import metadata
+from typing import BinaryIO, Literal
+from urllib.parse import parse_qsl, urlsplit
+
+from gateway_ia import jsonutil
+from gateway_ia.body import BodyBuffer, as_body
+from gateway_ia.models import Headers, SessionQuery, SessionRecord, SessionStatus
+from gateway_ia.services.aggregation import SSEAggregator, parse_completion_body
+from gateway_ia.store import SessionStore
+
+ExportFormat = Literal["jsonl", "har"]
+
+MEDIA_TYPES = {"jsonl": "application/x-ndjson", "har": "application/json"}
+
+# Sessions imported between two store flushes
+_FLUSH_EVERY = 500
+
+# Headers whose value is replaced by ``REDACTED`` in exports by default
+CREDENTIAL_HEADERS = frozenset(
+    {
+        "authorization",
+        "proxy-authorization",
+        "x-api-key",
+        "api-key",
+        "x-goog-api-key",
+        "cookie",
+        "set-cookie",
+    }
+)
+REDACTED = "[redacted]"
+
+
+def export_sessions(
+    store: SessionStore,
+    filters: SessionQuery,
+    format: ExportFormat = "jsonl",
+    credentials: bool = False,
+) -> Iterator[bytes]:
+    """Yield the matching finished sessions, oldest first, encoded as ``format``.
+
+    Sessions still in flight are skipped, and so are sessions evicted while
+    the export runs. ``CREDENTIAL_HEADERS`` are redacted unless
+    ``credentials`` is set.
+    """
+    sessions = (store.get(session_id) for session_id in store.select(filters))
+    finished = (
+        s for s in sessions if s is not None and s.status is not SessionStatus.PENDING
+    )
+    if format == "jsonl":
+        for session in finished:
+            record = session_to_json(session, credentials)
+            yield (jsonutil.dumps(record) + "\n").encode("utf-8")
+        return
+    # One entry per line, which lets ``read_sessions`` stream our own HAR files
+    yield _har_head()
+    separator = b""
+    for session in finished:
+        entry = har_entry(session, credentials)
+        yield separator + jsonutil.dumps(entry).encode("utf-8")
+        separator = b",\n"
+    yield b"\n]}}\n"
+
+
+def import_sessions(
+    store: SessionStore, sessions: Iterable[SessionRecord]
+) -> tuple[int, int]:
+    """Add finished sessions to ``store``; return how many were added and evicted.
+
+    Sessions already in the store are skipped. The store's limits still
+    apply: past ``max_sessions`` or ``max_bytes`` the oldest sessions,
+    imported or not, are evicted, and so are those older than ``max_age_s``.
+    """
+    before = store.count
+    count = 0
+    for session in sessions:
+        if store.metadata(session.id) is not None:
+            continue
+        store.add(session)
+        store.complete(session)
+        count += 1
+        if count % _FLUSH_EVERY == 0:
+            store.flush()
+    store.flush()
+    return count, before + count - store.count
+
+
+def read_sessions(file: BinaryIO) -> Iterator[SessionRecord]:
+    """Parse a JSON Lines or HAR export, one session at a time.
+
+    HAR files written by other tools are parsed whole; JSON Lines and the
+    HAR files written by ``export_sessions`` are read line by line.
+    """
+    first = file.readline()
+    if first.startswith(b'{"log":') and first.rstrip().endswith(b"["):
+        for line in file:
+            line = line.strip().rstrip(b",")
+            if line.startswith(b"]"):
+                return
+            if line:
+                yield session_from_har(jsonutil.loads(line))
+        return
+    try:
+        record = jsonutil.loads(first) if first.strip() else None
+    except ValueError:
+        record = None
+    if record is None or "log" in record:
+        har = jsonutil.loads(first + file.read())
+        for entry in har["log"]["entries"]:
+            yield session_from_har(entry)
+        return
+    yield session_from_json(record)
+    for line in file:
+        if line.strip():
+            yield session_from_json(jsonutil.loads(line))
+
+
+# -- JSON Lines ---------------------------------------------------------------
+
+
+def session_to_json(session: SessionRecord, credentials: bool = False) -> dict:
+    """Every recorded field of a session, bodies as text or base64."""
+    record = _header(session, credentials)
+    for part in ("request", "response"):
+        body = getattr(session, f"{part}_body")
+        if body is None:
+            continue
+        text, encoding = _body_text(body)
+        record[f"{part}_body"] = text
+        if encoding:
+            record[f"{part}_body_encoding"] = encoding
+    return record
+
+
+def session_from_json(record: dict) -> SessionRecord:
+    bodies = {}
+    for part in ("request", "response"):
+        text = record.pop(f"{part}_body", None)
+        encoding = record.pop(f"{part}_body_encoding", None)
+        bodies[f"{part}_body"] = _body_bytes(text, encoding)
+    return SessionRecord.from_header(record, **bodies)
+
+
+# -- HAR ----------------------------------------------------------------------
+
+
+def har_entry(session: SessionRecord, credentials: bool = False) -> dict:
+    """A HAR 1.2 entry, with the full session header under ``_gateway_ia``."""
+    header = _header(session, credentials)
+    host = session.request_headers.get("host", "localhost")
+    url = f"http://{host}{session.path}"
+    if session.query_string:
+        url += f"?{session.query_string}"
+    request: dict = {
+        "method": session.method,
+        "url": url,
+        "httpVersion": "HTTP/1.1",
+        "cookies": [],
+        "headers": _har_headers(header["request_headers"]),
+        "queryString": [
+            {"name": name, "value": value}
+            for name, value in parse_qsl(session.query_string, keep_blank_values=True)
+        ],
+        "headersSize": -1,
+        "bodySize": session.request_size,
+    }
+    if session.request_body is not None:
+        text, encoding = _body_text(session.request_body)
+        request["postData"] = {
+            "mimeType": session.request_headers.get("content-type", ""),
+            "text": text,
+        }
+        if encoding:
+            # HAR has no encoding for request bodies
+            request["postData"]["_encoding"] = encoding
+
+    content: dict = {
+        "size": session.response_size,
+        "mimeType": session.response_headers.get("content-type", ""),
+    }
+    if session.response_body is not None:
+        content["text"], encoding = _body_text(session.response_body)
+        if encoding:
+            content["encoding"] = encoding
+
+    wait = session.ttfb_ms or 0.0
+    duration = session.duration_ms or 0.0
+    blocked = [t for t in (session.queue_ms, session.pool_wait_ms) if t is not None]
+    return {
+        "startedDateTime": session.created_at.isoformat(),
+        "time": duration,
+        "request": request,
+        "response": {
+            "status": session.status_code or 0,
+            "statusText": "",
+            "httpVersion": "HTTP/1.1",
+            "cookies": [],
+            "headers": _har_headers(header["response_headers"]),
+            "content": content,
+            "redirectURL": "",
+            "headersSize": -1,
+            "bodySize": session.response_size,
+        },
+        "cache": {},
+        "timings": {
+            "blocked": sum(blocked) if blocked else -1,
+            "connect": session.connect_ms if session.connect_ms is not None else -1,
+            "send": 0,
+            "wait": wait,
+            "receive": max(0.0, duration - wait),
+        },
+        "_gateway_ia": header,
+    }
+
+
+def session_from_har(entry: dict) -> SessionRecord:
+    """Rebuild a session from a HAR entry, ours or one recorded by another tool."""
+    request = entry["request"]
+    response = entry.get("response") or {}
+    post = request.get("postData") or {}
+    content = response.get("content") or {}
+    request_body = _body_bytes(post.get("text"), post.get("_encoding"))
+    response_body = _body_bytes(content.get("text"), content.get("encoding"))
+
+    header = entry.get("_gateway_ia")
+    if header is not None:
+        return SessionRecord.from_header(header, request_body, response_body)
+
+    url = urlsplit(request["url"])
+    session = SessionRecord(request["method"], url.path or "/", url.query)
+    started = datetime.fromisoformat(entry["startedDateTime"].replace("Z", "+00:00"))
+    if started.tzinfo is None:
+        started = started.replace(tzinfo=UTC)
+    session.created = started.timestamp()
+    session.request_headers = _headers(request.get("headers"))
+    session.response_headers = _headers(response.get("headers"))
+    session.request_body = as_body(request_body)
+    session.response_body = as_body(response_body)
+    session.request_size = _size(request.get("bodySize"), request_body)
+    session.response_size = _size(response.get("bodySize"), response_body)
+    session.status_code = response.get("status") or None
+    session.status = (
+        SessionStatus.COMPLETED if session.status_code else SessionStatus.ERROR
+    )
+    session.duration_ms = entry.get("time")
+    timings = entry.get("timings") or {}
+    before_response = [
+        timings.get(name) for name in ("blocked", "dns", "connect", "send", "wait")
+    ]
+    session.ttfb_ms = sum(t for t in before_response if t and t > 0) or None
+    session.is_streaming = "text/event-stream" in content.get("mimeType", "")
+    _aggregate(session)
+    return session
+
+
+def _har_head() -> bytes:
+    try:
+        version = metadata.version("gateway-ia")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    creator = {"name": "gateway-ia", "version": version}
+    return (
+        '{"log": {"version": "1.2", "creator": '
+        + jsonutil.dumps(creator)
+        + ', "entries": [\n'
+    ).encode("utf-8")
+
+
+def _header(session: SessionRecord, credentials: bool) -> dict:
+    header = session.header()
+    if not credentials:
+        for part in ("request_headers", "response_headers"):
+            header[part] = _redact(header[part])
+    return header
+
+
+def _redact(headers: Mapping[str, str]) -> dict[str, str]:
+    return {
+        name: REDACTED if name.lower() in CREDENTIAL_HEADERS else value
+        for name, value in headers.items()
+    }
+
+
+def _har_headers(headers: Mapping[str, str]) -> list[dict]:
+    return [{"name": name, "value": value} for name, value in headers.items()]
+
+
+def _headers(entries: list[dict] | None) -> Headers:
+    return Headers(decoded={h["name"].lower(): h["value"] for h in entries or ()})
+
+
+def _aggregate(session: SessionRecord) -> None:
+    """Parse the completion of a session imported from a foreign HAR."""
+    body = session.response_body
+    if not body or not session.status_code or session.status_code >= 400:
+        return
+    if session.is_streaming:
+        aggregator = SSEAggregator()
+        aggregator.feed(body.getvalue())
+        aggregator.finish()
+        session.response_text = aggregator.text if aggregator.has_content else None
+        session.tool_calls = aggregator.tool_calls
+        session.usage = aggregator.usage
+        session.finish_reason = aggregator.finish_reason
+        session.model = aggregator.model
+        return
+    (
+        session.response_text,
+        session.tool_calls,
+        session.usage,
+        session.finish_reason,
+        session.model,
+    ) = parse_completion_body(body)
+
+
+def _body_text(body: BodyBuffer) -> tuple[str, str | None]:
+    """Body as UTF-8 text, or base64 with its encoding name for binary data."""
+    data = body.getvalue()
+    try:
+        return data.decode("utf-8"), None
+    except UnicodeDecodeError:
+        return base64.b64encode(data).decode("ascii"), "base64"
+
+
+def _body_bytes(text: str | None, encoding: str | None) -> bytes | None:
+    if text is None:
+        return None
+    if encoding == "base64":
+        try:
+            return base64.b64decode(text)
+        except binascii.Error:
+            pass
+    return text.encode("utf-8")
+
+
+def _size(declared: int | None, body: bytes | None) -> int:
+    if declared is not None and declared >= 0:
+        return declared
+    return len(body) if body is not None else 0
@@ -0,0 +1,47 @@
+"""JSON helpers backed by orjson when it is installed, the json module otherwise.
+
+orjson parses and pretty-prints several times faster, which shortens the
+time UI and capture work holds the GIL. Documents it rejects (NaN,
+integers above 64 bits) fall back to the json module.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data: bytes | bytearray | memoryview | str) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def dumps(value: Any) -> str:
+    """Compact JSON."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value).decode("utf-8")
+        except (orjson.JSONEncodeError, TypeError):
+            pass
+    return json.dumps(value, ensure_ascii=False)
+
+
+def dumps_pretty(value: Any) -> str:
+    """Two-space indented JSON keeping non-ASCII characters as is."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_INDENT_2).decode("utf-8")
+        except (orjson.JSONEncodeError, TypeError):
+            pass
+    return json.dumps(value, indent=2, ensure_ascii=False)
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
-from datetime import datetime, timezone
+import secrets
+import time
+from collections.abc import Iterator, Mapping, Sequence
+from dataclasses import dataclass, field, fields
+from datetime import UTC, datetime
 from enum import Enum
-from uuid import uuid4
+from itertools import count
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+from gateway_ia.body import BodyBuffer, as_body
 
 
 class SessionStatus(str, Enum):
@@ -13,28 +19,295 @@ class SessionStatus(str, Enum):
     ERROR = "error"
 
 
+# Session ids: process start time and a random salt, then a counter, so ids
+# are unique across restarts and workers and increase within a process
+_ID_PREFIX = f"{int(time.time()):08x}{secrets.token_hex(2)}"
+_ID_COUNTER = count(1)
+
+
+def new_session_id() -> str:
+    return f"{_ID_PREFIX}{next(_ID_COUNTER):06x}"
+
+
+# Request headers tagging the sessions sent by a replay run
+REPLAY_RUN_HEADER = "x-gateway-ia-replay-run"
+REPLAY_OF_HEADER = "x-gateway-ia-replay-of"
+
+
+class Headers(Mapping[str, str]):
+    """HTTP headers kept as the raw ``(name, value)`` byte pairs, decoded on first read.
+
+    Capture never copies or decodes headers; only the UI and the store do.
+    """
+
+    __slots__ = ("_decoded", "_raw")
+
+    def __init__(
+        self,
+        raw: Sequence[tuple[bytes, bytes]] = (),
+        decoded: dict[str, str] | None = None,
+    ) -> None:
+        self._raw = raw
+        self._decoded = decoded
+
+    @property
+    def decoded(self) -> dict[str, str]:
+        if self._decoded is None:
+            self._decoded = {
+                name.decode("latin-1").lower(): value.decode("latin-1")
+                for name, value in self._raw
+            }
+            self._raw = ()
+        return self._decoded
+
+    def __getitem__(self, name: str) -> str:
+        return self.decoded[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.decoded)
+
+    def __len__(self) -> int:
+        if self._decoded is None:
+            return len(self._raw)
+        return len(self._decoded)
+
+    def __repr__(self) -> str:
+        return f"Headers({self.decoded!r})"
+
+
 class Session(BaseModel):
-    id: str = Field(default_factory=lambda: uuid4().hex[:12])
-    created_at: datetime = Field(
-        default_factory=lambda: datetime.now(timezone.utc)
-    )
+    """Validated view of a session, built for the UI, the API and persistence."""
+
+    id: str = Field(default_factory=new_session_id)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
 
     # Request
     method: str
     path: str
     query_string: str = ""
     request_headers: dict[str, str] = {}
-    request_body: bytes | None = None
+    request_body: BodyBuffer | None = None
+    # Bytes forwarded, which may exceed the captured body
+    request_size: int = 0
 
     # Response
+    backend: str | None = None
+    cache_hit: bool = False
+    # Session whose upstream call this one shared (request coalescing)
+    coalesced_with: str | None = None
+    # Replay run that sent this request, and the session it replays
+    replay_run: str | None = None
+    replay_of: str | None = None
     status_code: int | None = None
     response_headers: dict[str, str] = {}
-    response_body: bytes | None = None
+    response_body: BodyBuffer | None = None
+    response_size: int = 0
     is_streaming: bool = False
 
+    # Aggregated completion (filled once the response has been parsed)
+    response_text: str | None = None
+    tool_calls: list[dict] | None = None
+    usage: dict | None = None
+    finish_reason: str | None = None
+    model: str | None = None
+
     # Metadata
     status: SessionStatus = SessionStatus.PENDING
     duration_ms: float | None = None
+    # Time queued by the admission controller
+    queue_ms: float | None = None
+    # Time waiting for a pooled upstream connection, and opening a new one
+    pool_wait_ms: float | None = None
+    connect_ms: float | None = None
+    # Latency breakdown, in milliseconds since the request arrived: response
+    # headers, then first generated token (streaming only)
+    ttfb_ms: float | None = None
+    ttft_ms: float | None = None
+    tokens_per_s: float | None = None
+    # Distribution of the gaps between streamed chunks (count, p50, p90, p99, max)
+    chunk_gaps_ms: dict[str, float] | None = None
     error_message: str | None = None
 
     model_config = {"arbitrary_types_allowed": True}
+
+    @field_validator("request_body", "response_body", mode="before")
+    @classmethod
+    def _wrap_body(cls, value):
+        return as_body(value)
+
+
+@dataclass(slots=True, eq=False)
+class SessionRecord:
+    """Session as captured on the proxy path.
+
+    A plain slotted record: building and mutating it skips validation, the
+    creation time is a float and headers stay undecoded. ``to_model`` builds
+    the validated ``Session`` where one is needed.
+    """
+
+    method: str
+    path: str
+    query_string: str = ""
+    id: str = field(default_factory=new_session_id)
+    created: float = field(default_factory=time.time)
+
+    # Request
+    request_headers: Headers = field(default_factory=Headers)
+    request_body: BodyBuffer | None = None
+    request_size: int = 0
+
+    # Response
+    backend: str | None = None
+    cache_hit: bool = False
+    coalesced_with: str | None = None
+    replay_run: str | None = None
+    replay_of: str | None = None
+    status_code: int | None = None
+    response_headers: Headers = field(default_factory=Headers)
+    response_body: BodyBuffer | None = None
+    response_size: int = 0
+    is_streaming: bool = False
+
+    # Aggregated completion
+    response_text: str | None = None
+    tool_calls: list[dict] | None = None
+    usage: dict | None = None
+    finish_reason: str | None = None
+    model: str | None = None
+
+    # Metadata
+    status: SessionStatus = SessionStatus.PENDING
+    duration_ms: float | None = None
+    queue_ms: float | None = None
+    pool_wait_ms: float | None = None
+    connect_ms: float | None = None
+    ttfb_ms: float | None = None
+    ttft_ms: float | None = None
+    tokens_per_s: float | None = None
+    chunk_gaps_ms: dict[str, float] | None = None
+    error_message: str | None = None
+
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp(self.created, UTC)
+
+    @property
+    def generated(self) -> bool:
+        """Whether a backend generated the response for this session.
+
+        Cache hits and coalesced followers only relay another session's
+        response: its usage and decode rate belong to that session.
+        """
+        return not (self.cache_hit or self.coalesced_with)
+
+    def to_model(self) -> Session:
+        values = {name: getattr(self, name) for name in _COPIED_FIELDS}
+        return Session.model_construct(
+            **values,
+            created_at=self.created_at,
+            request_headers=dict(self.request_headers),
+            response_headers=dict(self.response_headers),
+        )
+
+    @classmethod
+    def from_model(cls, session: Session) -> SessionRecord:
+        values = {name: getattr(session, name) for name in _COPIED_FIELDS}
+        return cls(
+            **values,
+            created=session.created_at.timestamp(),
+            request_headers=Headers(decoded=session.request_headers),
+            response_headers=Headers(decoded=session.response_headers),
+        )
+
+    @classmethod
+    def from_header(
+        cls, header: dict, request_body=None, response_body=None
+    ) -> SessionRecord:
+        """Rebuild a record from its persisted JSON header and bodies."""
+        return cls.from_model(
+            Session(**header, request_body=request_body, response_body=response_body)
+        )
+
+    def header(self) -> dict:
+        """JSON-serializable fields, bodies excluded, as persisted by the stores."""
+        return self.to_model().model_dump(
+            mode="json", exclude={"request_body", "response_body"}
+        )
+
+
+_COPIED_FIELDS = tuple(
+    f.name
+    for f in fields(SessionRecord)
+    if f.name not in ("created", "request_headers", "response_headers")
+)
+
+
+class SessionMetadata(BaseModel):
+    """Derived data computed once when a session completes."""
+
+    model: str | None = None
+    usage: dict | None = None
+    tool_call_names: list[str] = []
+    tool_calls: list[dict] = []
+    # False for cache hits and coalesced followers, left out of token totals
+    generated: bool = True
+
+
+@dataclass(slots=True)
+class SessionSummary:
+    """Compact listing record kept in memory for every stored session."""
+
+    id: str
+    created_at: datetime
+    method: str
+    path: str
+    query_string: str
+    status: SessionStatus
+    status_code: int | None
+    duration_ms: float | None
+    ttfb_ms: float | None
+    ttft_ms: float | None
+    tokens_per_s: float | None
+    is_streaming: bool
+    cache_hit: bool
+    replay_run: str | None
+    size: int
+
+    @classmethod
+    def from_session(cls, session: SessionRecord) -> SessionSummary:
+        return cls(
+            id=session.id,
+            created_at=session.created_at,
+            method=session.method,
+            path=session.path,
+            query_string=session.query_string,
+            status=session.status,
+            status_code=session.status_code,
+            duration_ms=session.duration_ms,
+            ttfb_ms=session.ttfb_ms,
+            ttft_ms=session.ttft_ms,
+            tokens_per_s=session.tokens_per_s,
+            is_streaming=session.is_streaming,
+            cache_hit=session.cache_hit,
+            replay_run=session.replay_run,
+            size=_stored_size(session.request_body)
+            + _stored_size(session.response_body),
+        )
+
+
+def _stored_size(body: BodyBuffer | None) -> int:
+    return 0 if body is None else body.stored_size
+
+
+@dataclass(slots=True)
+class SessionQuery:
+    """Filters accepted by ``SessionStore.query``; unset fields match everything."""
+
+    path: str | None = None
+    status: SessionStatus | None = None
+    status_code: int | None = None
+    model: str | None = None
+    tool: str | None = None
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+    replay_run: str | None = None
@@ -0,0 +1,308 @@
+"""Replay captured sessions against a backend and compare their timings."""
+
+from __future__ import annotations
+
+import asyncio
+import secrets
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Literal
+
+import httpx
+from loguru import logger
+
+from gateway_ia.body import BodyBuffer
+from gateway_ia.export import REDACTED
+from gateway_ia.models import (
+    REPLAY_OF_HEADER,
+    REPLAY_RUN_HEADER,
+    Headers,
+    SessionRecord,
+    SessionStatus,
+)
+from gateway_ia.services.pipeline import (
+    StreamTimings,
+    aggregate_regular,
+    aggregate_stream,
+)
+
+Pacing = Literal["concurrency", "rate", "recorded"]
+
+# Metrics compared between the original and the replayed sessions
+COMPARED = ("duration_ms", "ttfb_ms", "ttft_ms", "tokens_per_s")
+
+# Request headers set by the client itself, or not meant to be forwarded
+_SKIPPED_HEADERS = frozenset(
+    {
+        "host",
+        "content-length",
+        "connection",
+        "keep-alive",
+        "proxy-authenticate",
+        "proxy-authorization",
+        "te",
+        "trailers",
+        "transfer-encoding",
+        "upgrade",
+        REPLAY_RUN_HEADER,
+        REPLAY_OF_HEADER,
+    }
+)
+
+
+def replayable(session: SessionRecord) -> bool:
+    """Finished sessions whose request body was captured whole."""
+    if session.status is SessionStatus.PENDING:
+        return False
+    captured = len(session.request_body) if session.request_body is not None else 0
+    return captured >= session.request_size
+
+
+def new_run_id() -> str:
+    return secrets.token_hex(6)
+
+
+@dataclass(slots=True)
+class ReplayReport:
+    """Outcome of a replay run, with the paired metrics of every exchange."""
+
+    run_id: str
+    target: str
+    pacing: str
+    sent: int = 0
+    errors: int = 0
+    # Replayed responses whose status code differs from the original one
+    status_mismatches: int = 0
+    elapsed_s: float = 0.0
+    # metric -> (original values, replayed values), index-aligned
+    pairs: dict[str, tuple[list[float], list[float]]] = field(
+        default_factory=lambda: {name: ([], []) for name in COMPARED}
+    )
+
+    def add(self, original: SessionRecord, replayed: SessionRecord) -> None:
+        self.sent += 1
+        if replayed.status is SessionStatus.ERROR:
+            self.errors += 1
+            return
+        if replayed.status_code != original.status_code:
+            self.status_mismatches += 1
+        for name, (before, after) in self.pairs.items():
+            old, new = getattr(original, name), getattr(replayed, name)
+            if old is not None and new is not None:
+                before.append(old)
+                after.append(new)
+
+    def summary(self) -> dict:
+        """JSON-serializable report: counts, then per-metric distributions."""
+        metrics = {}
+        for name, (before, after) in self.pairs.items():
+            if not before:
+                continue
+            original, replayed = _distribution(before), _distribution(after)
+            metrics[name] = {
+                "pairs": len(before),
+                "original": original,
+                "replayed": replayed,
+                "change_p50": (
+                    replayed["p50"] / original["p50"] - 1 if original["p50"] else None
+                ),
+            }
+        return {
+            "run_id": self.run_id,
+            "target": self.target,
+            "pacing": self.pacing,
+            "sent": self.sent,
+            "errors": self.errors,
+            "status_mismatches": self.status_mismatches,
+            "elapsed_s": self.elapsed_s,
+            "rps": self.sent / self.elapsed_s if self.elapsed_s else 0.0,
+            "metrics": metrics,
+        }
+
+
+class Replayer:
+    """Re-send captured sessions to ``target`` and record what comes back.
+
+    ``concurrency`` pacing keeps that many requests in flight (closed loop).
+    ``rate`` starts ``rate`` requests per second and ``recorded`` starts each
+    request at its original offset from the first one, divided by ``speed``,
+    whatever the responses (open loop); ``concurrency``, when set, then caps
+    the requests in flight. Open-loop timings are measured from the
+    scheduled start, so a saturated target shows up as latency rather than
+    as a slower send rate.
+
+    Every exchange becomes a new ``SessionRecord`` tagged with the run id
+    and the original session id, with the metrics the capture pipeline
+    derives for captured sessions. Requests carry both ids in headers, so a
+    gateway placed in front of the target tags the sessions it captures too.
+    """
+
+    def __init__(
+        self,
+        target: str,
+        pacing: Pacing = "concurrency",
+        concurrency: int | None = None,
+        rate: float = 1.0,
+        speed: float = 1.0,
+        run_id: str | None = None,
+        headers: dict[str, str] | None = None,
+        timeout: float = 300.0,
+    ) -> None:
+        self.target = target.rstrip("/")
+        self.pacing = pacing
+        self.concurrency = concurrency
+        if pacing == "concurrency" and not concurrency:
+            self.concurrency = 8
+        if rate <= 0 or speed <= 0:
+            raise ValueError("rate and speed must be greater than 0")
+        self.rate = rate
+        self.speed = speed
+        self.run_id = run_id or new_run_id()
+        self._headers = {k.lower(): v for k, v in (headers or {}).items()}
+        self._timeout = httpx.Timeout(timeout, connect=30)
+
+    async def run(
+        self,
+        sessions: Iterable[SessionRecord],
+        on_replayed: Callable[[SessionRecord], None] | None = None,
+    ) -> ReplayReport:
+        """Replay ``sessions`` (oldest first for ``recorded`` pacing).
+
+        ``on_replayed`` receives each replayed session once it completes.
+        """
+        report = ReplayReport(self.run_id, self.target, self.pacing)
+        sessions = (s for s in sessions if replayable(s))
+        limits = httpx.Limits(
+            max_connections=self.concurrency, max_keepalive_connections=64
+        )
+
+        async with httpx.AsyncClient(timeout=self._timeout, limits=limits) as client:
+
+            async def one(original: SessionRecord, scheduled: float) -> None:
+                replayed = await self._replay(client, original, scheduled)
+                report.add(original, replayed)
+                if on_replayed is not None:
+                    on_replayed(replayed)
+
+            started = time.monotonic()
+            if self.pacing == "concurrency":
+                await self._closed_loop(sessions, one)
+            else:
+                await self._open_loop(sessions, one, started)
+            report.elapsed_s = time.monotonic() - started
+        return report
+
+    async def _closed_loop(self, sessions, one) -> None:
+        async def worker() -> None:
+            # Workers share the iterator; next() never awaits, so no race
+            for original in sessions:
+                await one(original, time.monotonic())
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+    async def _open_loop(self, sessions, one, started: float) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency) if self.concurrency else None
+        tasks: set[asyncio.Task] = set()
+        first: float | None = None
+
+        async def paced(original: SessionRecord, scheduled: float) -> None:
+            if semaphore is None:
+                await one(original, scheduled)
+                return
+            async with semaphore:
+                await one(original, scheduled)
+
+        for index, original in enumerate(sessions):
+            if self.pacing == "rate":
+                offset = index / self.rate
+            else:
+                if first is None:
+                    first = original.created
+                offset = max(0.0, (original.created - first) / self.speed)
+            scheduled = started + offset
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(paced(original, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def _replay(
+        self, client: httpx.AsyncClient, original: SessionRecord, start: float
+    ) -> SessionRecord:
+        session = SessionRecord(original.method, original.path, original.query_string)
+        # Dated by when the request was due, like the timings below
+        session.created = time.time() - (time.monotonic() - start)
+        session.backend = self.target
+        session.replay_run = self.run_id
+        session.replay_of = original.id
+
+        # Credentials redacted by the export are left to ``headers``
+        headers = {
+            k: v
+            for k, v in original.request_headers.items()
+            if k not in _SKIPPED_HEADERS and v != REDACTED
+        }
+        headers.update(self._headers)
+        headers[REPLAY_RUN_HEADER] = self.run_id
+        headers[REPLAY_OF_HEADER] = original.id
+        session.request_headers = Headers(decoded=headers)
+        body = original.request_body.getvalue() if original.request_body else b""
+        session.request_body = BodyBuffer([body]) if body else None
+        session.request_size = len(body)
+
+        url = self.target + original.path
+        if original.query_string:
+            url += f"?{original.query_string}"
+        response_body = BodyBuffer()
+        timings = StreamTimings(start)
+        try:
+            async with client.stream(
+                original.method, url, content=body, headers=headers
+            ) as response:
+                session.ttfb_ms = (time.monotonic() - start) * 1000
+                session.status_code = response.status_code
+                session.response_headers = Headers(response.headers.raw)
+                content_type = response.headers.get("content-type", "")
+                session.is_streaming = "text/event-stream" in content_type
+                # Raw chunks, dated as they arrive, like the proxy relays them
+                async for chunk in response.aiter_raw():
+                    timings.times.append(time.monotonic())
+                    timings.sizes.append(len(chunk))
+                    response_body.append(chunk)
+        except httpx.HTTPError as exc:
+            session.status = SessionStatus.ERROR
+            session.error_message = str(exc) or type(exc).__name__
+        else:
+            session.status = SessionStatus.COMPLETED
+        session.duration_ms = (time.monotonic() - start) * 1000
+        session.response_body = response_body or None
+        session.response_size = len(response_body)
+        if session.status is SessionStatus.COMPLETED:
+            # Parsing a long stream must not delay the other exchanges' timings
+            try:
+                await asyncio.to_thread(_aggregate, session, timings)
+            except Exception:
+                logger.exception("Failed to parse replayed session {}", session.id)
+        return session
+
+
+def _aggregate(session: SessionRecord, timings: StreamTimings) -> None:
+    if session.is_streaming:
+        aggregate_stream(session, timings)
+    elif session.response_body:
+        aggregate_regular(session, session.response_body.getvalue())
+
+
+def _distribution(values: list[float]) -> dict[str, float]:
+    ordered = sorted(values)
+    n = len(ordered)
+    return {
+        "p50": ordered[n // 2],
+        "p90": ordered[min(n - 1, n * 9 // 10)],
+        "p99": ordered[min(n - 1, n * 99 // 100)],
+        "mean": sum(ordered) / n,
+    }
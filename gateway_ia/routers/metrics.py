@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Request
+from starlette.responses import Response
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("")
+async def metrics(request: Request) -> Response:
+    state = request.app.state
+    return Response(
+        content=state.metrics.render(state.backends, state.store, state.pipeline),
+        media_type=CONTENT_TYPE,
+    )
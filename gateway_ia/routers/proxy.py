@@ -13,6 +13,11 @@ router = APIRouter()
     methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"],
 )
 async def proxy_catch_all(request: Request, path: str) -> Response:
-    client = request.app.state.http_client
-    store = request.app.state.store
-    return await handle_proxy_request(request, client, store)
+    backends = request.app.state.backends
+    pipeline = request.app.state.pipeline
+    policy = request.app.state.capture_policy
+    cache = request.app.state.cache
+    coalescer = request.app.state.coalescer
+    return await handle_proxy_request(
+        request, backends, pipeline, policy, cache, coalescer
+    )
@@ -1,37 +1,51 @@
 from __future__ import annotations
 
-import json
-from datetime import datetime, timezone
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterator
+from datetime import UTC, datetime, timedelta
+from functools import partial
 from pathlib import Path
-
-from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import (
+    HTMLResponse,
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
+
+from gateway_ia import jsonutil
+from gateway_ia.body import BodyBuffer
+from gateway_ia.export import MEDIA_TYPES, ExportFormat, export_sessions
+from gateway_ia.models import SessionQuery, SessionStatus
+from gateway_ia.services.aggregation import SSEAggregator
+from gateway_ia.services.rendering import (
+    decode_body,
+    render_body,
+    render_detail,
+    tojson_pretty,
+)
 
 router = APIRouter()
 
+# Session list push: keepalive interval and change coalescing window (seconds)
+_STREAM_KEEPALIVE = 15.0
+_STREAM_COALESCE = 0.25
+# Session list page size when paginating
+_PAGE_SIZE = 100
+_EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+# Raw body responses are streamed in blocks of this size
+_BODY_BLOCK = 64 * 1024
+
 templates = Jinja2Templates(
     directory=str(Path(__file__).resolve().parent.parent / "templates")
 )
 
 
-def _decode_body(value: bytes | None) -> str:
-    if value is None:
-        return ""
-    try:
-        return value.decode("utf-8")
-    except (UnicodeDecodeError, AttributeError):
-        return f"[Binary data, {len(value)} bytes]"
-
-
-def _tojson_pretty(value: str) -> str:
-    try:
-        parsed = json.loads(value)
-        return json.dumps(parsed, indent=2, ensure_ascii=False)
-    except (json.JSONDecodeError, TypeError):
-        return value
-
-
 def _format_duration(value: float | None) -> str:
     if value is None:
         return "-"
@@ -42,171 +56,287 @@ def _format_duration(value: float | None) -> str:
 
 def _aggregate_sse(value: str) -> tuple[str, list[dict] | None, dict | None]:
     """Parse SSE lines and aggregate delta.content and delta.tool_calls."""
-    parts: list[str] = []
-    tool_calls: dict[int, dict] = {}
-    usage = None
-    for line in value.splitlines():
-        if not line.startswith("data: "):
-            continue
-        payload = line[len("data: "):]
-        if payload == "[DONE]":
-            break
-        try:
-            chunk = json.loads(payload)
-            u = chunk.get("usage")
-            if u:
-                usage = u
-            for choice in chunk.get("choices", []):
-                delta = choice.get("delta", {})
-                content = delta.get("content")
-                if content:
-                    parts.append(content)
-                for tc in delta.get("tool_calls", []):
-                    idx = tc.get("index", 0)
-                    if idx not in tool_calls:
-                        tool_calls[idx] = {
-                            "id": tc.get("id", ""),
-                            "type": tc.get("type", "function"),
-                            "function": {
-                                "name": tc.get("function", {}).get("name", ""),
-                                "arguments": "",
-                            },
-                        }
-                    else:
-                        if tc.get("id"):
-                            tool_calls[idx]["id"] = tc["id"]
-                        if tc.get("function", {}).get("name"):
-                            tool_calls[idx]["function"]["name"] = tc["function"]["name"]
-                    args = tc.get("function", {}).get("arguments")
-                    if args is not None:
-                        tool_calls[idx]["function"]["arguments"] += args
-        except (json.JSONDecodeError, TypeError, KeyError):
-            continue
-    tc_list = [tool_calls[i] for i in sorted(tool_calls)] if tool_calls else None
-    text = "".join(parts) if parts else ("" if tc_list else value)
-    return (text, tc_list, usage)
-
-
-def _extract_tool_call_names(session) -> list[str]:
-    """Extract function names from tool_calls in a session's response."""
-    if not session.response_body:
-        return []
-    try:
-        decoded = _decode_body(session.response_body)
-        if session.is_streaming:
-            names: list[str] = []
-            for line in decoded.splitlines():
-                if not line.startswith("data: "):
-                    continue
-                payload = line[len("data: "):]
-                if payload == "[DONE]":
-                    break
-                try:
-                    chunk = json.loads(payload)
-                    for choice in chunk.get("choices", []):
-                        for tc in choice.get("delta", {}).get("tool_calls", []):
-                            name = tc.get("function", {}).get("name")
-                            if name and name not in names:
-                                names.append(name)
-                except (json.JSONDecodeError, TypeError, KeyError):
-                    continue
-            return names
-        else:
-            parsed = json.loads(decoded)
-            msg = parsed.get("choices", [{}])[0].get("message", {})
-            tc_list = msg.get("tool_calls") or []
-            return [
-                tc.get("function", {}).get("name", "")
-                for tc in tc_list
-                if tc.get("function", {}).get("name")
-            ]
-    except Exception:
-        return []
-
-
-def _extract_tool_calls_detail(session) -> list[dict]:
-    """Extract full tool call objects (name + arguments) from a session's response."""
-    if not session.response_body:
-        return []
-    try:
-        decoded = _decode_body(session.response_body)
-        if session.is_streaming:
-            _, tc_list, _ = _aggregate_sse(decoded)
-            return tc_list or []
-        else:
-            parsed = json.loads(decoded)
-            msg = parsed.get("choices", [{}])[0].get("message", {})
-            return msg.get("tool_calls") or []
-    except Exception:
-        return []
+    aggregator = SSEAggregator()
+    aggregator.feed(value.encode("utf-8"))
+    aggregator.finish()
+    tc_list = aggregator.tool_calls
+    text = aggregator.text if aggregator.has_content else ("" if tc_list else value)
+    return (text, tc_list, aggregator.usage)
+
+
+def _response_text(session) -> str:
+    """Return the aggregated assistant text, falling back to the raw body."""
+    if session.response_text is not None:
+        return session.response_text
+    if session.tool_calls:
+        return ""
+    return decode_body(session.response_body)
 
 
-def _has_tool_calls(session) -> bool:
-    """Check if a session's response contains tool_calls."""
-    return bool(_extract_tool_call_names(session))
+def _as_utc(value: datetime) -> datetime:
+    """Interpret naive datetimes (from the UI) as local time."""
+    return value.astimezone(UTC)
 
 
-def _extract_usage(session) -> dict | None:
-    """Extract usage dict from a session's response body (streaming or not)."""
-    if not session.response_body:
-        return None
+def _localtime(value: datetime) -> datetime:
+    """Convert a UTC datetime to the system local timezone."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return value.astimezone()
+
+
+def _is_listed(session) -> bool:
+    return "favico" not in session.path and "_ui" not in session.path
+
+
+def _session_item(store, s) -> dict:
+    metadata = store.metadata(s.id)
+    usage = metadata.usage if metadata else None
+    tool_call_names = metadata.tool_call_names if metadata else []
+    return {
+        "id": s.id,
+        "status": s.status.value,
+        "created_at": _localtime(s.created_at).strftime("%H:%M:%S"),
+        "method": s.method,
+        "path": s.path,
+        "query_string": s.query_string,
+        "status_code": s.status_code,
+        "duration_ms": s.duration_ms,
+        "ttfb_ms": s.ttfb_ms,
+        "ttft_ms": s.ttft_ms,
+        "tokens_per_s": s.tokens_per_s,
+        "is_streaming": s.is_streaming,
+        "cache_hit": s.cache_hit,
+        "has_tool_calls": bool(tool_call_names),
+        "tool_call_names": tool_call_names,
+        "model": metadata.model if metadata else None,
+        "total_tokens": usage.get("total_tokens") if usage else None,
+    }
+
+
+def _compact_item(store, s) -> dict:
+    """List row with only what the session table shows; empty fields are omitted."""
+    metadata = store.metadata(s.id)
+    names = metadata.tool_call_names if metadata else []
+    usage = metadata.usage if metadata else None
+    item = {
+        "id": s.id,
+        "status": s.status.value,
+        "created_at": _localtime(s.created_at).strftime("%H:%M:%S"),
+        "method": s.method,
+        "path": f"{s.path}?{s.query_string}" if s.query_string else s.path,
+    }
+    optional = {
+        "status_code": s.status_code,
+        "duration_ms": round(s.duration_ms, 1) if s.duration_ms else None,
+        "is_streaming": s.is_streaming,
+        "cache_hit": s.cache_hit,
+        "tool_call_names": names[:3],
+        "tool_call_count": len(names),
+        "total_tokens": usage.get("total_tokens") if usage else None,
+    }
+    item.update((key, value) for key, value in optional.items() if value)
+    return item
+
+
+def _encode_cursor(summary) -> str:
+    # Creation time in microseconds: stays valid once the session is evicted
+    return str((summary.created_at - _EPOCH) // timedelta(microseconds=1))
+
+
+def _decode_cursor(cursor: str) -> datetime:
     try:
-        decoded = _decode_body(session.response_body)
-        if session.is_streaming:
-            for line in reversed(decoded.splitlines()):
-                if not line.startswith("data: "):
-                    continue
-                payload = line[len("data: "):]
-                if payload == "[DONE]":
-                    continue
-                chunk = json.loads(payload)
-                u = chunk.get("usage")
-                if u:
-                    return u
+        return _EPOCH + timedelta(microseconds=int(cursor))
+    except (ValueError, OverflowError):
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
+
+
+def _page(store, filters: SessionQuery, limit: int, offset: int, item) -> dict:
+    """A newest-first page of sessions and the cursor of the next one.
+
+    Sessions the UI does not list are skipped, reading further until the
+    page is full, so pages are only short at the end of the history.
+    """
+    listed = []
+    while len(listed) <= limit:
+        summaries = store.query(filters, limit=limit + 1, offset=offset)
+        listed += [s for s in summaries if _is_listed(s)]
+        if len(summaries) <= limit:
+            break
+        offset += len(summaries)
+    page = listed[:limit]
+    has_more = len(listed) > limit
+    return {
+        "sessions": [item(store, s) for s in page],
+        "has_more": has_more,
+        "next_cursor": _encode_cursor(page[-1]) if has_more else None,
+    }
+
+
+class _RenderCache:
+    """Rendered bodies, cached by total bytes (LRU).
+
+    Concurrent requests for the same body share a single rendering.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self._max = max_bytes
+        self._size = 0
+        self._entries: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+        self._running: dict[tuple[str, str], asyncio.Future[bytes]] = {}
+
+    async def get(
+        self,
+        key: tuple[str, str],
+        render: Callable[[], Awaitable[bytes]],
+        cache: bool,
+    ) -> bytes:
+        text = self._entries.get(key)
+        if text is not None:
+            self._entries.move_to_end(key)
+            return text
+        future = self._running.get(key)
+        if future is None:
+            future = asyncio.ensure_future(render())
+            self._running[key] = future
+            future.add_done_callback(partial(self._done, key, cache))
+        # A client going away must not cancel the rendering others wait for
+        return await asyncio.shield(future)
+
+    def _done(self, key: tuple[str, str], cache: bool, future: asyncio.Future) -> None:
+        del self._running[key]
+        if not cache or future.cancelled() or future.exception() is not None:
+            return
+        text = future.result()
+        if len(text) > self._max:
+            return
+        self._entries[key] = text
+        self._size += len(text)
+        while self._size > self._max:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+
+_rendered = _RenderCache(max_bytes=64 * 1024 * 1024)
+
+
+async def _session_body(request: Request, session_id: str, part: str):
+    session = await run_in_threadpool(request.app.state.store.get, session_id)
+    body = getattr(session, f"{part}_body", None)
+    if not body:
+        raise HTTPException(status_code=404, detail="Body not found")
+    return session, body
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Return the (start, end) of a single byte range, or None if unsatisfiable.
+
+    Raises ``ValueError`` for ranges we do not handle (several ranges, other
+    units); the header is then ignored.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        raise ValueError(header)
+    first, _, last = spec.strip().partition("-")
+    if not first:
+        length = int(last)
+        if length <= 0 or size == 0:
+            return None
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return None
+    return start, end
+
+
+def _range_response(body: BodyBuffer, range_header: str | None, media_type: str):
+    size = len(body)
+    start, end = 0, size - 1
+    status_code = 200
+    headers = {"Accept-Ranges": "bytes"}
+    if range_header:
+        try:
+            selected = _parse_range(range_header, size)
+        except ValueError:
+            selected = (start, end)
         else:
-            parsed = json.loads(decoded)
-            u = parsed.get("usage")
-            if u:
-                return u
-    except Exception:
-        pass
-    return None
+            if selected is None:
+                return Response(
+                    status_code=416, headers={"Content-Range": f"bytes */{size}"}
+                )
+            status_code = 206
+            headers["Content-Range"] = f"bytes {selected[0]}-{selected[1]}/{size}"
+        start, end = selected
+    headers["Content-Length"] = str(end - start + 1)
+    # A sync iterator: Starlette reads it from the thread pool
+    return StreamingResponse(
+        _iter_range(body, start, end + 1),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type,
+    )
 
 
-def _extract_usage_total(session) -> int | None:
-    """Extract total_tokens from a session's response body."""
-    u = _extract_usage(session)
-    return u.get("total_tokens") if u else None
+def _iter_range(body: BodyBuffer, start: int, stop: int) -> Iterator[bytes]:
+    view = body.view()
+    for offset in range(start, stop, _BODY_BLOCK):
+        yield bytes(view[offset : min(offset + _BODY_BLOCK, stop)])
 
 
-def _localtime(value: datetime) -> datetime:
-    """Convert a UTC datetime to the system local timezone."""
-    if value.tzinfo is None:
-        value = value.replace(tzinfo=timezone.utc)
-    return value.astimezone()
+def _timings(session) -> dict:
+    return {
+        "duration_ms": session.duration_ms,
+        "queue_ms": session.queue_ms,
+        "pool_wait_ms": session.pool_wait_ms,
+        "connect_ms": session.connect_ms,
+        "ttfb_ms": session.ttfb_ms,
+        "ttft_ms": session.ttft_ms,
+        "tokens_per_s": session.tokens_per_s,
+        "chunk_gaps_ms": session.chunk_gaps_ms,
+    }
+
+
+def _sessions_delta(store, since: int, compact: bool = False) -> dict:
+    seq, changed, evicted, reset = store.changes_since(since)
+    if reset and compact:
+        # Paged clients start over from the first page, not the whole history
+        delta = _page(store, SessionQuery(), _PAGE_SIZE, 0, _compact_item)
+    else:
+        item = _compact_item if compact else _session_item
+        delta = {"sessions": [item(store, s) for s in changed if _is_listed(s)]}
+    delta.update(
+        seq=seq,
+        reset=reset,
+        evicted=evicted,
+        total=store.count,
+        totals=store.token_totals(),
+    )
+    return delta
 
 
 templates.env.filters["localtime"] = _localtime
-templates.env.filters["decode_body"] = _decode_body
-templates.env.filters["tojson_pretty"] = _tojson_pretty
+templates.env.filters["decode_body"] = decode_body
+templates.env.filters["tojson_pretty"] = tojson_pretty
 templates.env.filters["format_duration"] = _format_duration
 templates.env.filters["aggregate_sse"] = lambda v: _aggregate_sse(v)[0]
-templates.env.filters["usage_total"] = _extract_usage_total
-templates.env.filters["has_tool_calls"] = _has_tool_calls
-templates.env.filters["tool_call_names"] = _extract_tool_call_names
+templates.env.filters["response_text"] = _response_text
 
 
 @router.get("/", response_class=HTMLResponse)
-async def session_list(request: Request):
+async def session_list(request: Request, cursor: str | None = None):
     store = request.app.state.store
     config = request.app.state.config
+    filters = SessionQuery(created_before=_decode_cursor(cursor) if cursor else None)
+    # Database-backed stores answer with SQL queries
+    page = await run_in_threadpool(_page, store, filters, _PAGE_SIZE, 0, _compact_item)
     return templates.TemplateResponse(
         "session_list.html",
         {
             "request": request,
-            "sessions": [
-                s for s in store.list_all() if "favico" not in s.path and "_ui" not in s.path
-            ],
+            "sessions": page["sessions"],
+            "next_cursor": page["next_cursor"],
+            "total": store.count,
             "ui_prefix": config.ui.prefix,
         },
     )
@@ -216,136 +346,242 @@ async def session_list(request: Request):
 async def session_detail(request: Request, session_id: str):
     store = request.app.state.store
     config = request.app.state.config
-    session = store.get(session_id)
+    session = await run_in_threadpool(store.get, session_id)
     if session is None:
         return HTMLResponse(content="Session not found", status_code=404)
-    return templates.TemplateResponse(
+    pool = request.app.state.render_pool
+    texts = await pool.run(
+        render_detail,
+        await pool.job(session, "request"),
+        await pool.job(session, "response"),
+    )
+    # Escaping multi-MB texts is not free either
+    return await run_in_threadpool(
+        templates.TemplateResponse,
         "session_detail.html",
         {
             "request": request,
-            "session": session,
+            "session": session.to_model(),
+            "texts": texts,
             "ui_prefix": config.ui.prefix,
         },
     )
 
 
+def _session_query(
+    path: str | None = None,
+    status: SessionStatus | None = None,
+    status_code: int | None = None,
+    model: str | None = None,
+    tool: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    replay: str | None = None,
+) -> SessionQuery:
+    """Filters shared by the listing and export endpoints."""
+    return SessionQuery(
+        path=path,
+        status=status,
+        status_code=status_code,
+        model=model,
+        tool=tool,
+        created_after=_as_utc(start) if start else None,
+        created_before=_as_utc(end) if end else None,
+        replay_run=replay,
+    )
+
+
+@router.get("/api/sessions")
+async def api_sessions(
+    request: Request,
+    filters: Annotated[SessionQuery, Depends(_session_query)],
+    since: int | None = None,
+    limit: int | None = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    cursor: str | None = None,
+    fields: Literal["full", "compact"] = "full",
+):
+    """List sessions, only those changed after the ``since`` sequence, or a
+    filtered page when any of limit/offset/cursor/filter parameters is given.
+
+    Pages come with a ``next_cursor`` to pass as ``cursor`` for the next
+    (older) page. ``fields=compact`` returns only what the session table
+    shows.
+    """
+    store = request.app.state.store
+    compact = fields == "compact"
+    if since is not None:
+        return await run_in_threadpool(_sessions_delta, store, since, compact)
+    if cursor is not None:
+        before = _decode_cursor(cursor)
+        end = filters.created_before
+        filters.created_before = min(end, before) if end else before
+    item = _compact_item if compact else _session_item
+    result = {"seq": store.seq, "total": store.count}
+    if limit is None and not offset and filters == SessionQuery():
+        result["sessions"] = [
+            item(store, s) for s in store.list_summaries() if _is_listed(s)
+        ]
+    else:
+        limit = limit or _PAGE_SIZE
+        result.update(
+            await run_in_threadpool(_page, store, filters, limit, offset, item)
+        )
+        result["limit"] = limit
+        result["offset"] = offset
+    result["totals"] = store.token_totals()
+    return result
+
+
+@router.get("/api/export")
+async def api_export(
+    request: Request,
+    filters: Annotated[SessionQuery, Depends(_session_query)],
+    format: ExportFormat = "jsonl",
+    credentials: bool = False,
+):
+    """Stream the matching finished sessions, oldest first, as JSON Lines or HAR.
+
+    Sessions are read from the store one at a time while the response is
+    sent, so exporting a large store does not load it into memory. API keys
+    and cookies are redacted unless ``credentials`` is true.
+    """
+    stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%SZ")
+    return StreamingResponse(
+        export_sessions(request.app.state.store, filters, format, credentials),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="sessions-{stamp}.{format}"'
+        },
+    )
+
+
+@router.get("/api/sessions/stream")
+async def api_sessions_stream(
+    request: Request,
+    since: int | None = None,
+    fields: Literal["full", "compact"] = "full",
+):
+    """Push session list deltas as Server-Sent Events."""
+    store = request.app.state.store
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    cursor = store.seq if since is None else since
+
+    async def event_stream():
+        nonlocal cursor
+        while not await request.is_disconnected():
+            seq = await store.wait_for_change(cursor, _STREAM_KEEPALIVE)
+            if seq == cursor:
+                yield ": keepalive\n\n"
+                continue
+            # Coalesce bursts of changes into a single event
+            await asyncio.sleep(_STREAM_COALESCE)
+            delta = await run_in_threadpool(
+                _sessions_delta, store, cursor, fields == "compact"
+            )
+            cursor = delta["seq"]
+            yield f"id: {cursor}\ndata: {jsonutil.dumps(delta)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
 @router.get("/api/sessions/{session_id}")
 async def api_session_detail(request: Request, session_id: str):
+    """Session metadata, with links to its bodies rather than the bodies."""
     store = request.app.state.store
-    session = store.get(session_id)
+    session = await run_in_threadpool(store.get, session_id)
     if session is None:
         return {"error": "not found"}
 
-    request_body = ""
-    if session.request_body:
-        request_body = _tojson_pretty(_decode_body(session.request_body))
-
-    response_body = ""
-    response_body_raw = ""
-    usage = None
-    tool_calls = None
-    if session.response_body:
-        decoded = _decode_body(session.response_body)
-        response_body_raw = decoded
-        if session.is_streaming:
-            text, tool_calls, usage = _aggregate_sse(decoded)
-            # Reconstruct a clean JSON message from the aggregated parts
-            msg: dict = {"role": "assistant"}
-            if text:
-                msg["content"] = text
-            if tool_calls:
-                msg["tool_calls"] = tool_calls
-            reconstructed: dict = {"message": msg}
-            if usage:
-                reconstructed["usage"] = usage
-            response_body = json.dumps(reconstructed, indent=2, ensure_ascii=False)
-        else:
-            response_body = _tojson_pretty(decoded)
-            try:
-                parsed = json.loads(decoded)
-                msg = parsed.get("choices", [{}])[0].get("message", {})
-                tc = msg.get("tool_calls")
-                if tc:
-                    tool_calls = tc
-            except (json.JSONDecodeError, TypeError, KeyError, IndexError):
-                pass
-
+    base = f"{request.app.state.config.ui.prefix}/api/sessions/{session.id}/bodies"
+    bodies = {}
+    for part in ("request", "response"):
+        body = getattr(session, f"{part}_body")
+        bodies[part] = (
+            None
+            if not body
+            else {
+                "captured": len(body),
+                "size": getattr(session, f"{part}_size"),
+                "raw": f"{base}/{part}",
+                "pretty": f"{base}/{part}/pretty",
+            }
+        )
     return {
         "id": session.id,
         "method": session.method,
         "path": session.path,
+        "backend": session.backend,
+        "cache_hit": session.cache_hit,
+        "coalesced_with": session.coalesced_with,
+        "replay_run": session.replay_run,
+        "replay_of": session.replay_of,
         "status_code": session.status_code,
         "is_streaming": session.is_streaming,
-        "request_body": request_body,
-        "response_body": response_body,
-        "response_body_raw": response_body_raw,
-        "tool_calls": tool_calls,
-        "usage": usage,
+        "timings": _timings(session),
+        "request_size": session.request_size,
+        "response_size": session.response_size,
+        "bodies": bodies,
+        "tool_calls": session.tool_calls,
+        "usage": session.usage,
     }
 
 
-@router.get("/api/sessions")
-async def api_sessions(request: Request):
-    store = request.app.state.store
-    sessions = [s for s in store.list_all() if "favico" not in s.path and "_ui" not in s.path]
-    total_prompt = 0
-    total_completion = 0
-    items = []
-    for s in sessions:
-        usage = _extract_usage(s)
-        if usage:
-            total_prompt += usage.get("prompt_tokens", 0)
-            total_completion += usage.get("completion_tokens", 0)
-        items.append({
-            "id": s.id,
-            "status": s.status.value,
-            "created_at": _localtime(s.created_at).strftime("%H:%M:%S"),
-            "method": s.method,
-            "path": s.path,
-            "query_string": s.query_string,
-            "status_code": s.status_code,
-            "duration_ms": s.duration_ms,
-            "is_streaming": s.is_streaming,
-            "has_tool_calls": _has_tool_calls(s),
-            "tool_call_names": _extract_tool_call_names(s),
-            "total_tokens": usage.get("total_tokens") if usage else None,
-        })
-    return {
-        "sessions": items,
-        "totals": {
-            "prompt_tokens": total_prompt,
-            "completion_tokens": total_completion,
-            "total_tokens": total_prompt + total_completion,
-        },
-    }
+@router.get("/api/sessions/{session_id}/bodies/{part}")
+async def api_session_body(
+    request: Request, session_id: str, part: Literal["request", "response"]
+):
+    """Captured body bytes, honouring a single ``Range: bytes=...`` header."""
+    session, body = await _session_body(request, session_id, part)
+    content_type = getattr(session, f"{part}_headers").get("content-type")
+    if not content_type or "event-stream" in content_type:
+        content_type = "text/plain; charset=utf-8"
+    return _range_response(body, request.headers.get("range"), content_type)
+
+
+@router.get("/api/sessions/{session_id}/bodies/{part}/pretty")
+async def api_session_body_pretty(
+    request: Request, session_id: str, part: Literal["request", "response"]
+):
+    """Pretty-printed body; a streamed response is rebuilt as one message."""
+    session, _ = await _session_body(request, session_id, part)
+    pool = request.app.state.render_pool
+
+    async def render() -> bytes:
+        return await pool.run(render_body, await pool.job(session, part))
+
+    content = await _rendered.get(
+        (session.id, part),
+        render,
+        # A session in flight may still grow
+        cache=session.status is not SessionStatus.PENDING,
+    )
+    return Response(content, media_type="text/plain; charset=utf-8")
 
 
 @router.get("/api/tool-calls-summary")
 async def api_tool_calls_summary(request: Request):
     store = request.app.state.store
-    sessions = [s for s in store.list_all() if "favico" not in s.path and "_ui" not in s.path]
-    grouped: dict[str, list[dict]] = {}
-    for s in sessions:
-        session_time = _localtime(s.created_at).strftime("%H:%M:%S")
-        for tc in _extract_tool_calls_detail(s):
-            fn = tc.get("function", {})
-            name = fn.get("name", "")
-            if not name:
-                continue
-            args_raw = fn.get("arguments", "")
-            try:
-                args = json.loads(args_raw) if args_raw else {}
-            except (json.JSONDecodeError, TypeError):
-                args = args_raw
-            grouped.setdefault(name, []).append({
-                "time": session_time,
-                "arguments": args,
-            })
-    summary = sorted(
-        [{"name": name, "count": len(calls), "calls": calls} for name, calls in grouped.items()],
-        key=lambda x: x["count"],
-        reverse=True,
-    )
+    summary = [
+        {
+            "name": name,
+            "count": len(calls),
+            "calls": [
+                {
+                    "time": _localtime(call["created_at"]).strftime("%H:%M:%S"),
+                    "arguments": call["arguments"],
+                }
+                for call in calls
+            ],
+        }
+        for name, calls in store.tool_calls_summary()
+    ]
     total_calls = sum(item["count"] for item in summary)
     return {
         "tools": summary,
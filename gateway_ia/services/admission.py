@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from collections.abc import Mapping
+
+from gateway_ia.config import AdmissionConfig
+
+
+class AdmissionRejected(Exception):
+    """A request was refused by the admission controller."""
+
+    def __init__(self, message: str, status_code: int, retry_after: int) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionQueue:
+    """Cap the requests in flight on a backend, queueing the others by priority.
+
+    Waiting requests are admitted lowest priority rank first, then in arrival
+    order. A full queue rejects immediately, and a request waiting longer
+    than ``timeout`` is rejected with a 503.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int,
+        timeout: float | None,
+        config: AdmissionConfig,
+    ) -> None:
+        self._max = max_concurrency
+        self._max_queue = max_queue
+        self._timeout = timeout
+        self._config = config
+        self._order = itertools.count()
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self.active = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def enter(self, priority: int) -> None:
+        if self.active < self._max and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self._max_queue:
+            raise AdmissionRejected(
+                "Backend queue is full",
+                self._config.reject_status,
+                self._config.retry_after_s,
+            )
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._order), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(future, self._timeout)
+        except (TimeoutError, asyncio.CancelledError) as exc:
+            if future.done() and not future.cancelled():
+                # Admitted just as we gave up: pass the slot on
+                self.leave()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            if isinstance(exc, asyncio.TimeoutError):
+                raise AdmissionRejected(
+                    "Timed out waiting for the backend",
+                    503,
+                    self._config.retry_after_s,
+                ) from None
+            raise
+
+    def leave(self) -> None:
+        self.active -= 1
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+                return
+
+
+def request_priority(headers: Mapping[str, str], config: AdmissionConfig) -> int:
+    """Return the priority rank of a request, from its header or its API key."""
+    name = headers.get(config.priority_header)
+    if name not in config.classes and config.api_keys:
+        name = config.api_keys.get(_api_key(headers))
+    return config.classes.get(name, config.classes.get(config.default_class, 0))
+
+
+def _api_key(headers: Mapping[str, str]) -> str:
+    authorization = headers.get("authorization", "")
+    if authorization[:7].lower() == "bearer ":
+        return authorization[7:].strip()
+    return headers.get("x-api-key", "")
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+from contextlib import suppress
+
+from gateway_ia import jsonutil
+from gateway_ia.body import BodyBuffer
+from gateway_ia.models import SessionMetadata, SessionRecord
+
+
+class SSEAggregator:
+    """Incrementally parse an OpenAI-style SSE stream and aggregate its deltas.
+
+    Chunks are fed as they arrive from the backend; lines split across chunk
+    boundaries are buffered until their terminating newline shows up.
+    """
+
+    def __init__(self) -> None:
+        self._pending: list[bytes] = []
+        self._parts: list[str] = []
+        self._tool_calls: dict[int, dict] = {}
+        self.usage: dict | None = None
+        self.finish_reason: str | None = None
+        self.model: str | None = None
+        self.done = False
+        # Events carrying generated tokens (content, reasoning or tool call deltas)
+        self.deltas = 0
+
+    @property
+    def has_content(self) -> bool:
+        return bool(self._parts)
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    @property
+    def tool_calls(self) -> list[dict] | None:
+        if not self._tool_calls:
+            return None
+        return [self._tool_calls[i] for i in sorted(self._tool_calls)]
+
+    def feed(self, chunk: bytes) -> None:
+        if self.done or not chunk:
+            return
+        end = chunk.find(b"\n")
+        if end == -1:
+            self._pending.append(chunk)
+            return
+        if self._pending:
+            self._pending.append(chunk[:end])
+            line = b"".join(self._pending)
+            self._pending.clear()
+        else:
+            line = chunk[:end]
+        self._handle_line(line)
+        start = end + 1
+        while not self.done:
+            end = chunk.find(b"\n", start)
+            if end == -1:
+                break
+            self._handle_line(chunk[start:end])
+            start = end + 1
+        if not self.done and start < len(chunk):
+            self._pending.append(chunk[start:])
+
+    def finish(self) -> None:
+        """Flush a trailing line that was not newline-terminated."""
+        if self._pending and not self.done:
+            line = b"".join(self._pending)
+            self._pending.clear()
+            self._handle_line(line)
+
+    def _handle_line(self, line: bytes) -> None:
+        if line.endswith(b"\r"):
+            line = line[:-1]
+        if not line.startswith(b"data:"):
+            return
+        payload = line[5:]
+        if payload.startswith(b" "):
+            payload = payload[1:]
+        if payload == b"[DONE]":
+            self.done = True
+            return
+        with suppress(ValueError, TypeError, KeyError, AttributeError):
+            self._apply(jsonutil.loads(payload))
+
+    def _apply(self, chunk: dict) -> None:
+        if self.model is None and chunk.get("model"):
+            self.model = chunk["model"]
+        u = chunk.get("usage")
+        if u:
+            self.usage = u
+        for choice in chunk.get("choices", []):
+            if choice.get("finish_reason"):
+                self.finish_reason = choice["finish_reason"]
+            delta = choice.get("delta", {})
+            content = delta.get("content")
+            if content:
+                self._parts.append(content)
+            if content or delta.get("reasoning_content") or delta.get("tool_calls"):
+                self.deltas += 1
+            for tc in delta.get("tool_calls") or []:
+                idx = tc.get("index", 0)
+                fn = tc.get("function") or {}
+                if idx not in self._tool_calls:
+                    self._tool_calls[idx] = {
+                        "id": tc.get("id", ""),
+                        "type": tc.get("type", "function"),
+                        "function": {
+                            "name": fn.get("name", ""),
+                            "arguments": "",
+                        },
+                    }
+                else:
+                    if tc.get("id"):
+                        self._tool_calls[idx]["id"] = tc["id"]
+                    if fn.get("name"):
+                        self._tool_calls[idx]["function"]["name"] = fn["name"]
+                args = fn.get("arguments")
+                if args is not None:
+                    self._tool_calls[idx]["function"]["arguments"] += args
+
+
+def parse_completion_body(
+    body: BodyBuffer,
+) -> tuple[str | None, list[dict] | None, dict | None, str | None, str | None]:
+    """Extract (content, tool_calls, usage, finish_reason, model) from a JSON completion."""
+    try:
+        parsed = jsonutil.loads(body.getvalue())
+        usage = parsed.get("usage") or None
+        choices = parsed.get("choices") or [{}]
+        msg = choices[0].get("message") or {}
+        return (
+            msg.get("content"),
+            msg.get("tool_calls") or None,
+            usage,
+            choices[0].get("finish_reason"),
+            parsed.get("model"),
+        )
+    except (ValueError, TypeError, KeyError, AttributeError, IndexError):
+        return (None, None, None, None, None)
+
+
+def _request_model(body: BodyBuffer | None) -> str | None:
+    if not body:
+        return None
+    try:
+        model = jsonutil.loads(body.getvalue()).get("model")
+    except (ValueError, TypeError, AttributeError):
+        return None
+    return model if isinstance(model, str) else None
+
+
+def derive_metadata(session: SessionRecord) -> SessionMetadata:
+    """Compute the derived per-session data served by the UI list endpoints."""
+    names: list[str] = []
+    calls: list[dict] = []
+    for tc in session.tool_calls or []:
+        fn = tc.get("function") or {}
+        name = fn.get("name")
+        if not name:
+            continue
+        if name not in names:
+            names.append(name)
+        args_raw = fn.get("arguments", "")
+        try:
+            args = jsonutil.loads(args_raw) if args_raw else {}
+        except (ValueError, TypeError):
+            args = args_raw
+        calls.append({"name": name, "arguments": args})
+    return SessionMetadata(
+        model=session.model or _request_model(session.request_body),
+        usage=session.usage,
+        tool_call_names=names,
+        tool_calls=calls,
+        generated=session.generated,
+    )
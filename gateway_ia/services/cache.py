@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from pathlib import Path
+
+from loguru import logger
+
+from gateway_ia.config import CacheConfig
+
+# Disk entry layout: header length, JSON header, concatenated chunks
+_HEADER = struct.Struct("<I")
+_SUFFIX = ".entry"
+
+# Request headers that select who is asking or what the backend answers:
+# requests differing in any of them never share a response
+KEYED_HEADERS = (
+    "authorization",
+    "x-api-key",
+    "api-key",
+    "x-goog-api-key",
+    "cookie",
+    "openai-organization",
+    "openai-project",
+    "anthropic-version",
+    "anthropic-beta",
+)
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    """A recorded upstream response, replayable chunk by chunk."""
+
+    status_code: int
+    headers: dict[str, str]
+    is_streaming: bool
+    # (seconds since the first chunk, chunk)
+    chunks: list[tuple[float, bytes]] = field(default_factory=list)
+    created: float = field(default_factory=time.time)
+
+    @property
+    def size(self) -> int:
+        return sum(len(chunk) for _, chunk in self.chunks)
+
+
+class CacheRecorder:
+    """Collect the chunks of an upstream response while it is forwarded."""
+
+    __slots__ = ("_cache", "_entry", "_first", "_key")
+
+    def __init__(self, cache: ResponseCache, key: str) -> None:
+        self._cache = cache
+        self._key = key
+        self._entry: CachedResponse | None = None
+        self._first: float | None = None
+
+    def start(
+        self, status_code: int, headers: dict[str, str], is_streaming: bool
+    ) -> None:
+        # Errors are not cached
+        if status_code == 200:
+            self._entry = CachedResponse(status_code, headers, is_streaming)
+
+    def add(self, chunk: bytes) -> None:
+        if self._entry is None:
+            return
+        now = time.monotonic()
+        if self._first is None:
+            self._first = now
+        self._entry.chunks.append((now - self._first, chunk))
+
+    def close(self, ok: bool) -> None:
+        # Only complete responses are worth replaying
+        if ok and self._entry is not None:
+            self._cache.save(self._key, self._entry)
+
+
+class ResponseCache:
+    """LRU response cache bounded by bytes, with a TTL.
+
+    Only POST requests to the configured paths with a JSON body are cached,
+    and completions only when they are deterministic (``temperature: 0``).
+    The key hashes method, path, query, the ``KEYED_HEADERS`` (credentials,
+    organization, API version) and the JSON body with sorted keys, so
+    formatting differences between clients do not matter but a response is
+    only ever served to the same credentials. Where entries live is up to
+    the backend, through ``_read``, ``_write`` and ``_remove``; ``_read``
+    and ``_write`` are coroutines, so a backend can keep its I/O off the
+    event loop, and ``_write`` runs from a background task, off the
+    response path.
+    """
+
+    def __init__(self, config: CacheConfig) -> None:
+        self._config = config
+        self.replay_timing = config.replay_timing
+        # key -> (size, created), least recently used first
+        self._index: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._total_bytes = 0
+        self._writes: set[asyncio.Task] = set()
+
+    def key(
+        self,
+        method: str,
+        path: str,
+        query: str,
+        body: bytes,
+        headers: Mapping[str, str],
+    ) -> str | None:
+        """Return the cache key of a request, or None when it is not cacheable."""
+        config = self._config
+        if not any(fnmatchcase(path, pattern) for pattern in config.paths):
+            return None
+        return request_key(
+            method, path, query, body, config.deterministic_only, headers
+        )
+
+    async def get(self, key: str) -> CachedResponse | None:
+        meta = self._index.get(key)
+        if meta is None:
+            return None
+        if self._expired(meta[1]):
+            self._drop(key)
+            return None
+        entry = await self._read(key)
+        # The entry may have been evicted or replaced while it was read
+        if self._index.get(key) != meta:
+            return entry
+        if entry is None:
+            self._drop(key)
+            return None
+        self._index.move_to_end(key)
+        return entry
+
+    def recorder(self, key: str) -> CacheRecorder:
+        return CacheRecorder(self, key)
+
+    def save(self, key: str, entry: CachedResponse) -> None:
+        """Store ``entry`` from a background task."""
+        task = asyncio.get_running_loop().create_task(self.put(key, entry))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def put(self, key: str, entry: CachedResponse) -> None:
+        size = entry.size
+        if size > self._config.max_bytes:
+            return
+        try:
+            await self._write(key, entry)
+        except OSError:
+            logger.exception("Failed to write cache entry {}", key)
+            return
+        # The new entry replaced the previous one, if any
+        previous = self._index.pop(key, None)
+        if previous is not None:
+            self._total_bytes -= previous[0]
+        self._index[key] = (size, entry.created)
+        self._total_bytes += size
+        while self._total_bytes > self._config.max_bytes:
+            self._drop(next(iter(self._index)))
+
+    async def stop(self) -> None:
+        """Wait for the entries still being written."""
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    # -- backend hooks -----------------------------------------------------
+
+    async def _read(self, key: str) -> CachedResponse | None:
+        raise NotImplementedError
+
+    async def _write(self, key: str, entry: CachedResponse) -> None:
+        raise NotImplementedError
+
+    def _remove(self, key: str) -> None:
+        raise NotImplementedError
+
+    # -- internals ---------------------------------------------------------
+
+    def _expired(self, created: float) -> bool:
+        ttl = self._config.ttl_s
+        return ttl is not None and time.time() - created > ttl
+
+    def _drop(self, key: str) -> None:
+        size, _ = self._index.pop(key)
+        self._total_bytes -= size
+        self._remove(key)
+
+
+class MemoryResponseCache(ResponseCache):
+    """Response cache keeping entries in memory."""
+
+    def __init__(self, config: CacheConfig) -> None:
+        super().__init__(config)
+        self._entries: dict[str, CachedResponse] = {}
+
+    async def _read(self, key: str) -> CachedResponse | None:
+        return self._entries.get(key)
+
+    async def _write(self, key: str, entry: CachedResponse) -> None:
+        self._entries[key] = entry
+
+    def _remove(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+
+class DiskResponseCache(ResponseCache):
+    """Response cache keeping one file per entry, surviving restarts."""
+
+    def __init__(self, config: CacheConfig) -> None:
+        super().__init__(config)
+        self._dir = Path(config.path)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._recover()
+
+    async def _read(self, key: str) -> CachedResponse | None:
+        return await asyncio.to_thread(self._read_file, key)
+
+    def _read_file(self, key: str) -> CachedResponse | None:
+        try:
+            data = self._entry_path(key).read_bytes()
+            (header_len,) = _HEADER.unpack_from(data)
+            pos = _HEADER.size + header_len
+            header = json.loads(data[_HEADER.size : pos])
+        except (OSError, ValueError, struct.error):
+            return None
+        chunks = []
+        for offset, length in header.pop("chunks"):
+            chunks.append((offset, data[pos : pos + length]))
+            pos += length
+        return CachedResponse(**header, chunks=chunks)
+
+    async def _write(self, key: str, entry: CachedResponse) -> None:
+        await asyncio.to_thread(self._write_file, key, entry)
+
+    def _write_file(self, key: str, entry: CachedResponse) -> None:
+        header = json.dumps(
+            {
+                "status_code": entry.status_code,
+                "headers": entry.headers,
+                "is_streaming": entry.is_streaming,
+                "created": entry.created,
+                "chunks": [(offset, len(chunk)) for offset, chunk in entry.chunks],
+            }
+        ).encode("utf-8")
+        # Unique name: the same key may be written twice at once
+        fd, tmp = tempfile.mkstemp(dir=self._dir, prefix=f"{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_HEADER.pack(len(header)))
+                f.write(header)
+                for _, chunk in entry.chunks:
+                    f.write(chunk)
+            os.replace(tmp, self._entry_path(key))
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def _remove(self, key: str) -> None:
+        self._entry_path(key).unlink(missing_ok=True)
+
+    def _entry_path(self, key: str) -> Path:
+        return self._dir / f"{key}{_SUFFIX}"
+
+    def _recover(self) -> None:
+        """Rebuild the index from the entry files, oldest first."""
+        # Writes interrupted by a crash
+        for path in self._dir.glob("*.tmp"):
+            path.unlink(missing_ok=True)
+        found = []
+        for path in self._dir.glob(f"*{_SUFFIX}"):
+            entry = self._read_file(path.stem)
+            if entry is None or self._expired(entry.created):
+                path.unlink(missing_ok=True)
+                continue
+            found.append((entry.created, path.stem, entry.size))
+        for created, key, size in sorted(found):
+            self._index[key] = (size, created)
+            self._total_bytes += size
+        while self._total_bytes > self._config.max_bytes:
+            self._drop(next(iter(self._index)))
+        if found:
+            logger.info("Loaded {} cached responses from {}", len(found), self._dir)
+
+
+def create_cache(config: CacheConfig) -> ResponseCache | None:
+    """Build the configured response cache, or None when caching is off."""
+    if not config.enabled:
+        return None
+    if config.backend == "memory":
+        return MemoryResponseCache(config)
+    if config.backend == "disk":
+        return DiskResponseCache(config)
+    raise ValueError(f"Unknown response cache backend: {config.backend!r}")
+
+
+def request_key(
+    method: str,
+    path: str,
+    query: str,
+    body: bytes,
+    deterministic_only: bool,
+    headers: Mapping[str, str] | None = None,
+) -> str | None:
+    """Hash a POST request with a JSON body, ignoring the JSON formatting.
+
+    The ``KEYED_HEADERS`` of the request are part of the key. Returns None
+    for other requests, and for sampled completions when
+    ``deterministic_only`` is set.
+    """
+    if method != "POST":
+        return None
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    if deterministic_only and not _is_deterministic(payload):
+        return None
+    normalized = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(f"{method} {path}?{query}\n".encode())
+    if headers is not None:
+        for name in KEYED_HEADERS:
+            value = headers.get(name)
+            if value is not None:
+                digest.update(f"{name}: {value}\n".encode())
+    digest.update(b"\n")
+    digest.update(normalized.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _is_deterministic(payload: dict) -> bool:
+    # Requests without sampling (embeddings...) always are
+    if "messages" not in payload and "prompt" not in payload:
+        return True
+    return payload.get("temperature") == 0
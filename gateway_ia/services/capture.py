@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+
+from gateway_ia.body import BodyBuffer
+from gateway_ia.config import CaptureConfig
+
+
+@dataclass(slots=True, frozen=True)
+class CaptureDecision:
+    """How much of a single exchange gets recorded."""
+
+    record: bool
+    bodies: bool
+    max_body_bytes: int | None
+    spill_bytes: int | None
+    stream_request_body: bool
+
+    def new_body(self, chunks: tuple[bytes, ...] = ()) -> BodyBuffer | None:
+        """Return a buffer for a captured body, or None when bodies are skipped."""
+        if not self.bodies:
+            return None
+        return BodyBuffer(chunks, self.spill_bytes, self.max_body_bytes)
+
+
+class CapturePolicy:
+    """Decide per request whether and how an exchange is captured.
+
+    Requests excluded by the path patterns or not picked by sampling are
+    still proxied, they are just not recorded.
+    """
+
+    def __init__(self, config: CaptureConfig) -> None:
+        self._config = config
+        self._skip = CaptureDecision(
+            False, False, None, None, config.stream_request_body
+        )
+
+    @property
+    def skipped(self) -> CaptureDecision:
+        """The decision for a request that is not recorded."""
+        return self._skip
+
+    def decide(self, path: str) -> CaptureDecision:
+        config = self._config
+        if config.include_paths and not _match_any(path, config.include_paths):
+            return self._skip
+        if _match_any(path, config.exclude_paths):
+            return self._skip
+
+        mode = config.mode
+        max_body_bytes = config.max_body_bytes
+        sample_rate = config.sample_rate
+        for rule in config.rules:
+            if fnmatchcase(path, rule.path):
+                if rule.mode is not None:
+                    mode = rule.mode
+                if rule.max_body_bytes is not None:
+                    max_body_bytes = rule.max_body_bytes
+                if rule.sample_rate is not None:
+                    sample_rate = rule.sample_rate
+                break
+
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            return self._skip
+        return CaptureDecision(
+            True,
+            mode == "full",
+            max_body_bytes,
+            config.spill_bytes,
+            config.stream_request_body,
+        )
+
+
+def _match_any(path: str, patterns: list[str]) -> bool:
+    return any(fnmatchcase(path, pattern) for pattern in patterns)
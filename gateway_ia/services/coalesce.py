@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Mapping
+from fnmatch import fnmatchcase
+
+from gateway_ia.config import CoalesceConfig
+from gateway_ia.services.cache import request_key
+
+
+class FlightError(Exception):
+    """The upstream call shared by coalesced requests failed."""
+
+
+class Flight:
+    """One upstream call shared by identical concurrent requests.
+
+    The leader forwards the request as usual and feeds the response into the
+    flight; followers wait for the response headers, then read the chunks.
+    Every chunk is kept until the flight ends, so followers joining late
+    replay the stream from its start. Once followed, the upstream call is
+    read to its end even if the leader's client goes away.
+    """
+
+    def __init__(self, coalescer: Coalescer, key: str, leader_id: str) -> None:
+        self._coalescer = coalescer
+        self._key = key
+        self.leader_id = leader_id
+        # Requests that joined the flight after the leader
+        self.followers = 0
+        self.status_code: int | None = None
+        self.headers: dict[str, str] = {}
+        self.is_streaming = False
+        self.chunks: list[bytes] = []
+        self.done = False
+        self.error: str | None = None
+        self._waiters: list[asyncio.Future] = []
+
+    # -- leader side -------------------------------------------------------
+
+    def start(
+        self, status_code: int, headers: dict[str, str], is_streaming: bool
+    ) -> None:
+        self.status_code = status_code
+        self.headers = headers
+        self.is_streaming = is_streaming
+        self._notify()
+
+    def add(self, chunk: bytes) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def close(self, ok: bool) -> None:
+        if not ok and self.error is None:
+            self.error = "Upstream response interrupted"
+        self.done = True
+        self._coalescer._end(self._key, self)
+        self._notify()
+
+    def fail(self, error: str) -> None:
+        self.error = error
+        self.close(False)
+
+    # -- follower side -----------------------------------------------------
+
+    async def response(self) -> None:
+        """Wait for the response headers; raise if the call failed first."""
+        while self.status_code is None:
+            if self.done:
+                raise FlightError(self.error)
+            await self._wait()
+
+    async def body(self) -> bytes:
+        """Wait for the whole response body."""
+        while not self.done:
+            await self._wait()
+        if self.error is not None:
+            raise FlightError(self.error)
+        return b"".join(self.chunks)
+
+    async def subscribe(self) -> AsyncIterator[bytes]:
+        """Yield the response chunks as the leader receives them."""
+        sent = 0
+        while True:
+            while sent < len(self.chunks):
+                yield self.chunks[sent]
+                sent += 1
+            if self.done:
+                if self.error is not None:
+                    raise FlightError(self.error)
+                return
+            await self._wait()
+
+    # -- internals ---------------------------------------------------------
+
+    async def _wait(self) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        await future
+
+    def _notify(self) -> None:
+        for future in self._waiters:
+            if not future.done():
+                future.set_result(None)
+        self._waiters.clear()
+
+
+class Coalescer:
+    """Single-flight registry of the upstream calls in progress, by request key."""
+
+    def __init__(self, config: CoalesceConfig) -> None:
+        self._config = config
+        self._flights: dict[str, Flight] = {}
+
+    def key(
+        self,
+        method: str,
+        path: str,
+        query: str,
+        body: bytes,
+        headers: Mapping[str, str],
+    ) -> str | None:
+        """Return the coalescing key of a request, or None when it is not eligible.
+
+        Only requests with the same credentials share an upstream call.
+        """
+        config = self._config
+        if not any(fnmatchcase(path, pattern) for pattern in config.paths):
+            return None
+        return request_key(
+            method, path, query, body, config.deterministic_only, headers
+        )
+
+    def join(self, key: str, session_id: str) -> tuple[Flight, bool]:
+        """Return the flight for ``key`` and whether the caller leads it."""
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.followers += 1
+            return flight, False
+        flight = self._flights[key] = Flight(self, key, session_id)
+        return flight, True
+
+    def _end(self, key: str, flight: Flight) -> None:
+        # Later identical requests start a new flight
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+
+def create_coalescer(config: CoalesceConfig) -> Coalescer | None:
+    return Coalescer(config) if config.enabled else None
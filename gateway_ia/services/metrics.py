@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from fnmatch import fnmatchcase
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from gateway_ia.config import MetricsConfig
+from gateway_ia.models import SessionRecord
+from gateway_ia.services.routing import BackendRouter
+from gateway_ia.store import SessionStore
+
+if TYPE_CHECKING:
+    from gateway_ia.services.pipeline import CapturePipeline
+
+_PREFIX = "gateway_ia_"
+
+
+class Histogram:
+    """Cumulative-on-render histogram, one series per label tuple."""
+
+    __slots__ = ("_bounds", "_series", "help", "labels", "name")
+
+    def __init__(
+        self, name: str, help: str, labels: tuple[str, ...], bounds: list[float]
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._bounds = sorted(bounds)
+        # labels -> [count per bucket..., count in +Inf, sum]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, labels: tuple[str, ...], value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0.0] * (len(self._bounds) + 2)
+        series[bisect_left(self._bounds, value)] += 1
+        series[-1] += value
+
+    def render(self, out: list[str]) -> None:
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} histogram")
+        for labels, series in self._series.items():
+            base = _labels(self.labels, labels)
+            sep = "," if base else ""
+            total = 0.0
+            # The series ends with the overflow count and the sum
+            for bound, count in zip(self._bounds, series, strict=False):
+                total += count
+                le = f'{base}{sep}le="{_number(bound)}"'
+                out.append(f"{self.name}_bucket{{{le}}} {_number(total)}")
+            total += series[-2]
+            out.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {_number(total)}')
+            out.append(f"{self.name}_sum{_braced(base)} {_number(series[-1])}")
+            out.append(f"{self.name}_count{_braced(base)} {_number(total)}")
+
+
+class Counter:
+    """Monotonic counter, one series per label tuple."""
+
+    __slots__ = ("_series", "help", "labels", "name")
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...]) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._series: dict[tuple[str, ...], float] = {}
+
+    def inc(self, labels: tuple[str, ...], value: float = 1) -> None:
+        self._series[labels] = self._series.get(labels, 0) + value
+
+    def render(self, out: list[str]) -> None:
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} counter")
+        for labels, value in self._series.items():
+            labels = _braced(_labels(self.labels, labels))
+            out.append(f"{self.name}{labels} {_number(value)}")
+
+
+class Metrics:
+    """Gateway metrics in the Prometheus text format.
+
+    Requests are recorded once, when their session ends, with a handful of
+    dict updates under an uncontended lock (sessions also end in the
+    threads running background tasks). Their path label is the first
+    configured pattern the path matches, or ``other``, their model label
+    likewise the first configured model pattern, and their source
+    label tells the backend from cache hits and coalesced followers, which
+    stay out of the latency histograms and token counters. Gauges (requests in flight, queue
+    depth, store size) are read from the backends and the store at scrape
+    time, so they cost nothing on the proxy path.
+    """
+
+    def __init__(self, config: MetricsConfig) -> None:
+        self._lock = Lock()
+        self._paths = config.paths
+        self._models = config.models or []
+        labels = ("path", "model")
+        self.requests = Counter(
+            _PREFIX + "requests_total",
+            "Proxied requests by path, response status, model and source.",
+            ("path", "status", "model", "source"),
+        )
+        self.duration = Histogram(
+            _PREFIX + "request_duration_seconds",
+            "Total request duration, up to the last response byte.",
+            labels,
+            config.buckets,
+        )
+        self.ttfb = Histogram(
+            _PREFIX + "ttfb_seconds",
+            "Time until the upstream response headers.",
+            labels,
+            config.buckets,
+        )
+        self.ttft = Histogram(
+            _PREFIX + "ttft_seconds",
+            "Time until the first streamed token.",
+            labels,
+            config.buckets,
+        )
+        self.tokens = Counter(
+            _PREFIX + "tokens_total",
+            "Tokens reported by the upstream usage, by model and type.",
+            ("model", "type"),
+        )
+        self.upstream_errors = Counter(
+            _PREFIX + "upstream_errors_total",
+            "Failed upstream calls by backend and error.",
+            ("backend", "error"),
+        )
+
+    def observe(self, session: SessionRecord) -> None:
+        """Record a finished session."""
+        model = _first_match(session.model or "", self._models)
+        status = str(session.status_code) if session.status_code else "error"
+        path = _first_match(session.path, self._paths)
+        labels = (path, model)
+        usage = session.usage or {}
+        if session.cache_hit:
+            source = "cache"
+        elif session.coalesced_with:
+            source = "coalesced"
+        else:
+            source = "backend"
+        with self._lock:
+            self.requests.inc((path, status, model, source))
+            if source != "backend":
+                # No upstream call of their own to time or bill
+                return
+            if session.duration_ms is not None:
+                self.duration.observe(labels, session.duration_ms / 1000)
+            if session.ttfb_ms is not None:
+                self.ttfb.observe(labels, session.ttfb_ms / 1000)
+            if session.ttft_ms is not None:
+                self.ttft.observe(labels, session.ttft_ms / 1000)
+            for kind in ("prompt", "completion"):
+                count = usage.get(f"{kind}_tokens")
+                if count:
+                    self.tokens.inc((model, kind), count)
+
+    def upstream_error(self, backend: str, error: str) -> None:
+        with self._lock:
+            self.upstream_errors.inc((backend, error))
+
+    def render(
+        self, backends: BackendRouter, store: SessionStore, pipeline: CapturePipeline
+    ) -> str:
+        out: list[str] = []
+        with self._lock:
+            for metric in (
+                self.requests,
+                self.duration,
+                self.ttfb,
+                self.ttft,
+                self.tokens,
+                self.upstream_errors,
+            ):
+                metric.render(out)
+        _gauge(
+            out,
+            "backend_in_flight",
+            "Requests in flight on a backend.",
+            {b.name: b.outstanding for b in backends.backends.values()},
+        )
+        _gauge(
+            out,
+            "backend_queued",
+            "Requests waiting for admission to a backend.",
+            {
+                b.name: b.admission.queued
+                for b in backends.backends.values()
+                if b.admission is not None
+            },
+        )
+        _gauge(
+            out,
+            "backend_up",
+            "Whether a backend is currently used (healthy and not ejected).",
+            {b.name: int(b.available) for b in backends.backends.values()},
+        )
+        _gauge(
+            out,
+            "capture_queue",
+            "Capture events waiting for the pipeline.",
+            {"": pipeline.queued},
+        )
+        name = f"{_PREFIX}capture_dropped_total"
+        out.append(f"# HELP {name} Sessions not recorded because the queue was full.")
+        out.append(f"# TYPE {name} counter")
+        out.append(f"{name} {pipeline.dropped}")
+        _gauge(out, "store_sessions", "Sessions in the store.", {"": store.count})
+        _gauge(
+            out,
+            "store_bytes",
+            "Body bytes held by the store, once compressed.",
+            {"": store.total_bytes},
+        )
+        out.append("")
+        return "\n".join(out)
+
+
+def create_metrics(config: MetricsConfig) -> Metrics | None:
+    return Metrics(config) if config.enabled else None
+
+
+def _first_match(value: str, patterns: list[str]) -> str:
+    """Return the first pattern matching ``value``, bounding a label's values."""
+    for pattern in patterns:
+        if fnmatchcase(value, pattern):
+            return pattern
+    return "other"
+
+
+def _gauge(out: list[str], name: str, help: str, values: dict[str, float]) -> None:
+    name = _PREFIX + name
+    out.append(f"# HELP {name} {help}")
+    out.append(f"# TYPE {name} gauge")
+    for backend, value in values.items():
+        labels = _labels(("backend",), (backend,)) if backend else ""
+        out.append(f"{name}{_braced(labels)} {_number(value)}")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    return ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values, strict=True))
+
+
+def _number(value: float) -> str:
+    # Exact integers for counts, shortest round-trip repr otherwise
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _braced(labels: str) -> str:
+    return f"{{{labels}}}" if labels else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import suppress
+from dataclasses import dataclass, field
+from itertools import pairwise
+
+from loguru import logger
+
+from gateway_ia.body import BodyBuffer
+from gateway_ia.config import CaptureConfig
+from gateway_ia.models import SessionRecord
+from gateway_ia.services.aggregation import SSEAggregator, parse_completion_body
+from gateway_ia.services.metrics import Metrics
+from gateway_ia.store import SessionStore
+
+
+@dataclass(slots=True)
+class StreamTimings:
+    """Arrival time (monotonic) and size of every chunk of a relayed stream.
+
+    Once the stream outgrows the capture limit, the captured body no longer
+    holds all of it: the stream is then parsed as it is relayed, keeping
+    only the aggregated state rather than the bytes past the limit.
+    """
+
+    start: float
+    times: list[float] = field(default_factory=list)
+    sizes: list[int] = field(default_factory=list)
+    aggregator: SSEAggregator | None = None
+    first_token: float | None = None
+
+    def overflow(self, captured: BodyBuffer, chunk: bytes) -> None:
+        """Start parsing as relayed, from ``chunk``, the first one cut."""
+        self.aggregator = SSEAggregator()
+        # Catch up on the chunks captured whole, dated by their arrival
+        data = captured.view()
+        offset = 0
+        for arrived, size in zip(self.times[:-1], self.sizes[:-1], strict=True):
+            self.parse(bytes(data[offset : offset + size]), arrived)
+            offset += size
+        self.parse(chunk, self.times[-1])
+
+    def parse(self, chunk: bytes, arrived: float) -> None:
+        self.aggregator.feed(chunk)
+        if self.first_token is None and self.aggregator.deltas:
+            self.first_token = arrived
+
+
+class CapturePipeline:
+    """Record sessions from a background task, off the proxy path.
+
+    The proxy only queues events: a new session, its response headers, its
+    end. A background task applies them to the store, and parses finished
+    sessions (completion body, SSE aggregation, timings, derived metadata)
+    in a worker thread before storing them.
+
+    ``queue_size`` bounds the events waiting to be applied. A new session
+    arriving while the queue is full is either not recorded (``drop``) or
+    waits for room (``block``). Events of sessions already admitted are
+    always queued, so none is left pending; response header updates are
+    skipped when the queue is full.
+    """
+
+    def __init__(
+        self, store: SessionStore, config: CaptureConfig, metrics: Metrics | None = None
+    ) -> None:
+        self.store = store
+        self.metrics = metrics
+        self._max = config.queue_size
+        self._block = config.backpressure == "block"
+        self._queue: asyncio.Queue[tuple[str, SessionRecord, object]] = asyncio.Queue()
+        self._room = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.dropped = 0
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Apply the queued events, then stop the background task."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def open(self, session: SessionRecord) -> bool:
+        """Queue a new session; False when it was dropped by backpressure."""
+        while self._queue.qsize() >= self._max:
+            if not self._block:
+                self.dropped += 1
+                return False
+            self._room.clear()
+            await self._room.wait()
+        self._queue.put_nowait(("open", session, None))
+        return True
+
+    def update(self, session: SessionRecord) -> None:
+        """Queue a progress update (status, response headers), if there is room."""
+        if self._queue.qsize() < self._max:
+            self._queue.put_nowait(("update", session, None))
+
+    def close(
+        self, session: SessionRecord, result: bytes | StreamTimings | None = None
+    ) -> None:
+        """Queue a finished session with what is left to parse.
+
+        ``result`` is the whole forwarded body of a regular response, or the
+        chunk timings of a stream whose body is in ``session.response_body``.
+        """
+        self._queue.put_nowait(("close", session, result))
+
+    def observe(self, session: SessionRecord) -> None:
+        """Count a finished session that is not recorded."""
+        if self.metrics is not None:
+            self.metrics.observe(session)
+
+    async def _run(self) -> None:
+        while True:
+            kind, session, result = await self._queue.get()
+            try:
+                if kind == "open":
+                    self.store.add(session)
+                elif kind == "update":
+                    self.store.touch(session)
+                else:
+                    await asyncio.to_thread(self._finish, session, result)
+            except Exception:
+                logger.exception("Failed to record session {}", session.id)
+            finally:
+                self._queue.task_done()
+                if self._queue.qsize() < self._max:
+                    self._room.set()
+
+    def _finish(
+        self, session: SessionRecord, result: bytes | StreamTimings | None
+    ) -> None:
+        if isinstance(result, StreamTimings):
+            aggregate_stream(session, result)
+        elif result:
+            aggregate_regular(session, result)
+        self.store.complete(session)
+        if self.metrics is not None:
+            self.metrics.observe(session)
+
+
+def aggregate_regular(session: SessionRecord, body: bytes) -> None:
+    """Parse a JSON completion.
+
+    The full forwarded body is parsed, so usage survives capture truncation.
+    """
+    (
+        session.response_text,
+        session.tool_calls,
+        session.usage,
+        session.finish_reason,
+        session.model,
+    ) = parse_completion_body(BodyBuffer([body]))
+    # The whole completion is generated before the response is sent
+    completion_tokens = (session.usage or {}).get("completion_tokens")
+    if completion_tokens and session.duration_ms and session.generated:
+        session.tokens_per_s = completion_tokens / (session.duration_ms / 1000)
+
+
+def aggregate_stream(session: SessionRecord, timings: StreamTimings) -> None:
+    """Aggregate a captured SSE stream and derive TTFT, decode rate and chunk gaps.
+
+    The captured body is fed back chunk by chunk, so the first token is
+    dated by the arrival of the chunk that carried it. Streams cut by the
+    capture limit were already parsed while relayed.
+    """
+    times = timings.times
+    if len(times) > 1:
+        gaps = sorted(b - a for a, b in pairwise(times))
+        n = len(gaps)
+        session.chunk_gaps_ms = {
+            "count": n,
+            "p50": gaps[n // 2] * 1000,
+            "p90": gaps[min(n - 1, n * 9 // 10)] * 1000,
+            "p99": gaps[min(n - 1, n * 99 // 100)] * 1000,
+            "max": gaps[-1] * 1000,
+        }
+    aggregator = timings.aggregator
+    first_token = timings.first_token
+    if aggregator is None:
+        body = session.response_body
+        if body is None:
+            return
+        aggregator = SSEAggregator()
+        data = body.view()
+        offset = 0
+        for arrived, size in zip(times, timings.sizes, strict=True):
+            aggregator.feed(bytes(data[offset : offset + size]))
+            offset += size
+            if first_token is None and aggregator.deltas:
+                first_token = arrived
+    aggregator.finish()
+    session.response_text = aggregator.text if aggregator.has_content else None
+    session.tool_calls = aggregator.tool_calls
+    session.usage = aggregator.usage
+    session.finish_reason = aggregator.finish_reason
+    session.model = aggregator.model
+
+    if first_token is None:
+        return
+    session.ttft_ms = (first_token - timings.start) * 1000
+    if not session.generated:
+        # Relayed from a cache entry or another session's upstream call
+        return
+    last = times[-1]
+    tokens = (session.usage or {}).get("completion_tokens") or aggregator.deltas
+    if tokens > 1 and last > first_token:
+        # Tokens after the first one, over the time it took to stream them
+        session.tokens_per_s = (tokens - 1) / (last - first_token)
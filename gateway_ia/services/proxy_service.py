@@ -1,14 +1,31 @@
 from __future__ import annotations
 
+import asyncio
 import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Mapping, Sequence
+from contextlib import suppress
 
 import httpx
 from loguru import logger
 from starlette.requests import Request
 from starlette.responses import Response, StreamingResponse
 
-from gateway_ia.models import Session, SessionStatus
-from gateway_ia.store import SessionStore
+from gateway_ia.models import (
+    REPLAY_OF_HEADER,
+    REPLAY_RUN_HEADER,
+    Headers,
+    SessionRecord,
+    SessionStatus,
+)
+from gateway_ia.services.admission import AdmissionRejected
+from gateway_ia.services.cache import CachedResponse, ResponseCache
+from gateway_ia.services.capture import CaptureDecision, CapturePolicy
+from gateway_ia.services.coalesce import Coalescer, Flight, FlightError
+from gateway_ia.services.pipeline import CapturePipeline, StreamTimings
+from gateway_ia.services.routing import Backend, BackendRouter
+
+# Upstream reads detached from the request that started them
+_background: set[asyncio.Task] = set()
 
 HOP_BY_HOP = frozenset(
     {
@@ -24,12 +41,12 @@ HOP_BY_HOP = frozenset(
 )
 
 
-def _filter_headers(headers: dict[str, str]) -> dict[str, str]:
+def _filter_headers(headers: Mapping[str, str]) -> dict[str, str]:
     return {k: v for k, v in headers.items() if k.lower() not in HOP_BY_HOP}
 
 
 def _prepare_upstream_headers(
-    incoming_headers: dict[str, str],
+    incoming_headers: Mapping[str, str],
     backend_host: str,
 ) -> dict[str, str]:
     headers = _filter_headers(incoming_headers)
@@ -39,122 +56,593 @@ def _prepare_upstream_headers(
 
 async def handle_proxy_request(
     request: Request,
-    client: httpx.AsyncClient,
-    store: SessionStore,
+    backends: BackendRouter,
+    pipeline: CapturePipeline,
+    policy: CapturePolicy,
+    cache: ResponseCache | None = None,
+    coalescer: Coalescer | None = None,
 ) -> Response:
     start = time.monotonic()
 
-    body = await request.body()
+    capture = policy.decide(request.url.path)
 
-    session = Session(
-        method=request.method,
-        path=request.url.path,
-        query_string=str(request.query_params),
-        request_headers=dict(request.headers),
-        request_body=body if body else None,
-    )
-    store.add(session)
+    session = SessionRecord(request.method, request.url.path, request.url.query)
+    if capture.record:
+        # Raw ASGI pairs, decoded only if someone looks at them
+        session.request_headers = Headers(request.scope["headers"])
+        session.replay_run = request.headers.get(REPLAY_RUN_HEADER)
+        if session.replay_run:
+            session.replay_of = request.headers.get(REPLAY_OF_HEADER)
+    if capture.record and not await pipeline.open(session):
+        capture = policy.skipped
+    cache_key = flight_key = None
+    # Routing on the model field, caching and coalescing need the whole body
+    # before connecting
+    if capture.stream_request_body and _has_body(request) and not backends.needs_model:
+        session.request_body = capture.new_body()
+        content = _tee_request_body(request, session)
+        body = None
+    else:
+        content = body = await request.body()
+        session.request_body = capture.new_body((body,)) if body else None
+        session.request_size = len(body)
+        method, path, query = request.method, request.url.path, request.url.query
+        if cache is not None:
+            cache_key = cache.key(method, path, query, body, request.headers)
+        if coalescer is not None:
+            flight_key = coalescer.key(method, path, query, body, request.headers)
+
+    if cache_key is not None:
+        cached = await cache.get(cache_key)
+        if cached is not None:
+            logger.debug("→ {} {} (cache hit)", request.method, request.url.path)
+            return _replay_cached(
+                cached, session, pipeline, capture, cache.replay_timing, start
+            )
+
+    sinks: list = []
+    if flight_key is not None:
+        flight, leader = coalescer.join(flight_key, session.id)
+        if not leader:
+            logger.debug("→ {} {} (coalesced)", request.method, request.url.path)
+            return await _follow_flight(flight, session, pipeline, capture, start)
+        sinks.append(flight)
+    if cache_key is not None:
+        sinks.append(cache.recorder(cache_key))
+
+    try:
+        return await _forward(
+            request,
+            content,
+            body,
+            session,
+            backends,
+            pipeline,
+            capture,
+            start,
+            sinks,
+        )
+    except BaseException:
+        # Never leave followers waiting on a request that died early
+        for sink in sinks:
+            sink.close(False)
+        raise
+
+
+async def _forward(
+    request: Request,
+    content: bytes | AsyncIterator[bytes],
+    body: bytes | None,
+    session: SessionRecord,
+    backends: BackendRouter,
+    pipeline: CapturePipeline,
+    capture: CaptureDecision,
+    start: float,
+    sinks: Sequence,
+) -> Response:
+    """Send the request to the selected backend and relay the response.
+
+    ``sinks`` (cache recorder, coalescing flight) are told about the response
+    headers, fed every response chunk and closed once the response ends.
+    """
+    backend = backends.select(request.url.path, body)
+    session.backend = backend.name
 
     target_url = request.url.path
     if request.url.query:
         target_url += f"?{request.url.query}"
 
-    backend_host = str(client.base_url.host)
-    if client.base_url.port:
-        backend_host += f":{client.base_url.port}"
-
-    upstream_headers = _prepare_upstream_headers(
-        dict(request.headers), backend_host
-    )
+    upstream_headers = _prepare_upstream_headers(request.headers, backend.host)
 
+    client = backend.client
+    trace = _ConnectionTrace()
     upstream_request = client.build_request(
         method=request.method,
         url=target_url,
         headers=upstream_headers,
-        content=body,
+        content=content,
+        extensions={"trace": trace},
     )
 
-    logger.debug("→ %s %s", request.method, target_url)
+    logger.debug("→ {} {} ({})", request.method, target_url, backend.name)
+
+    queued = time.monotonic()
+    try:
+        await backend.acquire(backends.priority(request.headers))
+    except AdmissionRejected as exc:
+        session.queue_ms = (time.monotonic() - queued) * 1000
+        session.status = SessionStatus.ERROR
+        session.status_code = exc.status_code
+        session.error_message = str(exc)
+        session.duration_ms = (time.monotonic() - start) * 1000
+        _finish(session, pipeline, capture)
+        content = str(exc).encode("utf-8")
+        headers = {"retry-after": str(exc.retry_after)}
+        # Followers get the same answer, Retry-After included (never cached)
+        for sink in sinks:
+            sink.start(exc.status_code, headers, False)
+            sink.add(content)
+            sink.close(True)
+        logger.warning("✗ {} {} : {}", request.method, target_url, exc)
+        return Response(content=content, status_code=exc.status_code, headers=headers)
+    session.queue_ms = (time.monotonic() - queued) * 1000
 
     try:
+        trace.start = time.monotonic()
         upstream_response = await client.send(upstream_request, stream=True)
     except httpx.HTTPError as exc:
+        backend.release()
+        trace.apply(session)
         session.status = SessionStatus.ERROR
         session.error_message = str(exc)
         session.duration_ms = (time.monotonic() - start) * 1000
-        logger.error("✗ %s %s : %s", request.method, target_url, exc)
+        # Our own pool being saturated says nothing about the backend health
+        if not isinstance(exc, httpx.PoolTimeout):
+            backends.record(backend, None, session.duration_ms)
+        if pipeline.metrics is not None:
+            pipeline.metrics.upstream_error(backend.name, type(exc).__name__)
+        _finish(session, pipeline, capture)
+        for sink in sinks:
+            sink.close(False)
+        logger.error("✗ {} {} : {}", request.method, target_url, exc)
         return Response(content=f"Proxy error: {exc}", status_code=502)
+    except BaseException:
+        # Cancelled while waiting for the backend
+        backend.release()
+        session.status = SessionStatus.ERROR
+        session.error_message = "Cancelled before the response"
+        session.duration_ms = (time.monotonic() - start) * 1000
+        _finish(session, pipeline, capture)
+        raise
 
     content_type = upstream_response.headers.get("content-type", "")
     is_sse = "text/event-stream" in content_type
 
+    trace.apply(session)
+    session.ttfb_ms = (time.monotonic() - start) * 1000
     session.status_code = upstream_response.status_code
-    session.response_headers = dict(upstream_response.headers)
+    backends.record(backend, upstream_response.status_code, session.ttfb_ms)
+    if capture.record:
+        session.response_headers = Headers(upstream_response.headers.raw)
+        pipeline.update(session)
+
+    headers = _filter_headers(upstream_response.headers)
+    for sink in sinks:
+        sink.start(upstream_response.status_code, headers, is_sse)
 
     if is_sse:
-        return _build_streaming_response(upstream_response, session, start)
+        return _build_streaming_response(
+            upstream_response,
+            headers,
+            session,
+            pipeline,
+            capture,
+            backend,
+            start,
+            sinks,
+        )
+
+    return await _build_regular_response(
+        upstream_response,
+        headers,
+        session,
+        pipeline,
+        capture,
+        backend,
+        start,
+        sinks,
+    )
 
-    return await _build_regular_response(upstream_response, session, start)
+
+class _ConnectionTrace:
+    """httpx trace hook timing the wait for a pooled connection and the connect.
+
+    The first trace event of a request fires once the pool has handed it a
+    connection: either the start of a new connection or the request headers
+    on a reused one.
+    """
+
+    __slots__ = ("acquired", "connect_ms", "connect_started", "start")
+
+    def __init__(self) -> None:
+        self.start = 0.0
+        self.acquired: float | None = None
+        self.connect_started: float | None = None
+        self.connect_ms: float | None = None
+
+    async def __call__(self, event: str, info: dict) -> None:
+        now = time.monotonic()
+        if self.acquired is None:
+            self.acquired = now
+        if event == "connection.connect_tcp.started":
+            self.connect_started = now
+        elif (
+            event
+            in (
+                "connection.connect_tcp.complete",
+                "connection.start_tls.complete",
+            )
+            and self.connect_started is not None
+        ):
+            self.connect_ms = (now - self.connect_started) * 1000
+
+    def apply(self, session: SessionRecord) -> None:
+        if self.acquired is not None:
+            session.pool_wait_ms = (self.acquired - self.start) * 1000
+        else:
+            # Never got a connection (pool timeout)
+            session.pool_wait_ms = (time.monotonic() - self.start) * 1000
+        session.connect_ms = self.connect_ms
+
+
+def _has_body(request: Request) -> bool:
+    return (
+        request.headers.get("content-length", "0") != "0"
+        or "transfer-encoding" in request.headers
+    )
+
+
+async def _tee_request_body(request: Request, session: SessionRecord):
+    """Forward the incoming body as it arrives, capturing it on the way.
+
+    The forwarded ``content-length`` header is kept, so httpx does not switch
+    the upstream request to chunked encoding.
+    """
+    captured = session.request_body
+    async for chunk in request.stream():
+        session.request_size += len(chunk)
+        if captured is not None:
+            captured.append(chunk)
+        yield chunk
 
 
 async def _build_regular_response(
     upstream_response: httpx.Response,
-    session: Session,
+    headers: dict[str, str],
+    session: SessionRecord,
+    pipeline: CapturePipeline,
+    capture: CaptureDecision,
+    backend: Backend,
     start: float,
+    sinks: Sequence = (),
 ) -> Response:
-    body = b"".join([chunk async for chunk in upstream_response.stream])
-    await upstream_response.aclose()
+    try:
+        chunks = [chunk async for chunk in upstream_response.stream]
+    finally:
+        await upstream_response.aclose()
+        backend.release()
 
-    session.response_body = body
+    body = b"".join(chunks)
+    for sink in sinks:
+        sink.add(body)
+        sink.close(True)
+    return _regular_response(
+        body,
+        upstream_response.status_code,
+        headers,
+        session,
+        pipeline,
+        capture,
+        start,
+    )
+
+
+def _regular_response(
+    body: bytes,
+    status_code: int,
+    headers: dict[str, str],
+    session: SessionRecord,
+    pipeline: CapturePipeline,
+    capture: CaptureDecision,
+    start: float,
+) -> Response:
+    session.response_body = capture.new_body((body,)) if body else None
+    session.response_size = len(body)
     session.is_streaming = False
     session.status = SessionStatus.COMPLETED
     session.duration_ms = (time.monotonic() - start) * 1000
-    logger.debug(
-        "← %s %s (%.0fms)",
-        upstream_response.status_code,
-        session.path,
-        session.duration_ms,
-    )
+    if session.ttfb_ms is None:
+        session.ttfb_ms = session.duration_ms
+    logger.debug("← {} {} ({:.0f}ms)", status_code, session.path, session.duration_ms)
 
+    # The completion is parsed by the capture pipeline
+    _finish(session, pipeline, capture, body if capture.bodies else None)
     return Response(
         content=body,
-        status_code=upstream_response.status_code,
-        headers=_filter_headers(dict(upstream_response.headers)),
+        status_code=status_code,
+        headers=headers,
     )
 
 
 def _build_streaming_response(
     upstream_response: httpx.Response,
-    session: Session,
+    headers: dict[str, str],
+    session: SessionRecord,
+    pipeline: CapturePipeline,
+    capture: CaptureDecision,
+    backend: Backend,
+    start: float,
+    sinks: Sequence = (),
+) -> StreamingResponse:
+    async def close() -> None:
+        await upstream_response.aclose()
+        backend.release()
+
+    return _streaming_response(
+        upstream_response.aiter_raw(),
+        upstream_response.status_code,
+        headers,
+        session,
+        pipeline,
+        capture,
+        start,
+        sinks,
+        close,
+    )
+
+
+def _streaming_response(
+    source: AsyncIterator[bytes],
+    status_code: int,
+    headers: dict[str, str],
+    session: SessionRecord,
+    pipeline: CapturePipeline,
+    capture: CaptureDecision,
     start: float,
+    sinks: Sequence = (),
+    close: Callable[[], Awaitable[None]] | None = None,
 ) -> StreamingResponse:
     session.is_streaming = True
-    accumulated = bytearray()
+    if session.ttfb_ms is None:
+        session.ttfb_ms = (time.monotonic() - start) * 1000
+    captured = capture.new_body()
+    # Chunk boundaries and arrival times, for the pipeline to derive timings
+    timings = StreamTimings(start)
 
-    async def stream_generator():
+    size = 0
+    settled = False
+
+    async def settle(finished: bool) -> None:
+        """End the session, the sinks and the upstream response, once."""
+        nonlocal settled
+        if settled:
+            return
+        settled = True
         try:
-            async for chunk in upstream_response.aiter_raw():
-                accumulated.extend(chunk)
-                yield chunk
-        except Exception as exc:
-            session.error_message = str(exc)
-            session.status = SessionStatus.ERROR
-        finally:
-            session.response_body = bytes(accumulated)
+            session.response_body = captured or None
+            session.response_size = size
             if session.status != SessionStatus.ERROR:
                 session.status = SessionStatus.COMPLETED
+            # A client disconnect also ends the stream early
+            for sink in sinks:
+                sink.close(finished)
             session.duration_ms = (time.monotonic() - start) * 1000
+            _finish(session, pipeline, capture, timings)
             logger.debug(
-                "← %s %s (%.0fms, streaming)",
-                upstream_response.status_code,
+                "← {} {} ({:.0f}ms, streaming)",
+                status_code,
                 session.path,
                 session.duration_ms,
             )
-            await upstream_response.aclose()
+        finally:
+            if close is not None:
+                await close()
+
+    async def stream_generator():
+        nonlocal size
+        finished = False
+        try:
+            async for chunk in source:
+                timings.times.append(time.monotonic())
+                timings.sizes.append(len(chunk))
+                size += len(chunk)
+                if timings.aggregator is not None:
+                    timings.parse(chunk, timings.times[-1])
+                elif captured is not None and captured.append(chunk) < len(chunk):
+                    # Past the capture limit: parsed from here on
+                    timings.overflow(captured, chunk)
+                for sink in sinks:
+                    sink.add(chunk)
+                yield chunk
+            finished = True
+        except Exception as exc:
+            session.error_message = str(exc)
+            session.status = SessionStatus.ERROR
+            if pipeline.metrics is not None and session.backend:
+                pipeline.metrics.upstream_error(session.backend, type(exc).__name__)
+        finally:
+            await settle(finished)
+
+    flight = next((sink for sink in sinks if isinstance(sink, Flight)), None)
+    if flight is None:
+        body = stream_generator()
+
+        async def on_close() -> None:
+            # Only does something when the body was never fully iterated
+            await settle(False)
+
+    else:
+        body, on_close = _detached(stream_generator(), flight, settle)
+    return _RelayResponse(
+        body,
+        on_close,
+        status_code=status_code,
+        headers=headers,
+        media_type=headers.get("content-type"),
+    )
+
+
+class _RelayResponse(StreamingResponse):
+    """Streaming response running ``on_close`` however it ends.
+
+    Starlette never iterates the body of a response whose client left
+    before it started, so the body's own ``finally`` cannot be relied on to
+    release the backend.
+    """
+
+    def __init__(
+        self,
+        content: AsyncIterator[bytes],
+        on_close: Callable[[], Awaitable[None]],
+        **kwargs,
+    ) -> None:
+        super().__init__(content, **kwargs)
+        self._on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self._on_close()
 
-    return StreamingResponse(
-        stream_generator(),
-        status_code=upstream_response.status_code,
-        headers=_filter_headers(dict(upstream_response.headers)),
-        media_type=upstream_response.headers.get("content-type"),
+
+def _detached(
+    relay: AsyncIterator[bytes],
+    flight: Flight,
+    settle: Callable[[bool], Awaitable[None]],
+) -> tuple[AsyncIterator[bytes], Callable[[], Awaitable[None]]]:
+    """Read ``relay`` from a task and answer the leader from its flight.
+
+    The upstream read no longer depends on the leader's client: when it
+    disconnects, the read goes on for the followers, and is only cancelled
+    if no request follows. Returns the leader's body and its close hook.
+    """
+
+    async def drain() -> None:
+        async for _ in relay:
+            pass
+
+    task = asyncio.create_task(drain())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in flight.subscribe():
+                yield chunk
+        except FlightError:
+            # The relay recorded the upstream error; the client just sees
+            # the stream end, as without coalescing
+            pass
+
+    async def on_close() -> None:
+        if task.done() or flight.followers:
+            return
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+        # Cancelled before its first step, the relay never settled
+        await settle(False)
+
+    return body(), on_close
+
+
+def _finish(
+    session: SessionRecord,
+    pipeline: CapturePipeline,
+    capture: CaptureDecision,
+    result: bytes | StreamTimings | None = None,
+) -> None:
+    """Hand a finished session to the capture pipeline, or just count it."""
+    if capture.record:
+        pipeline.close(session, result)
+    else:
+        pipeline.observe(session)
+
+
+def _replay_cached(
+    entry: CachedResponse,
+    session: SessionRecord,
+    pipeline: CapturePipeline,
+    capture: CaptureDecision,
+    pace: bool,
+    start: float,
+) -> Response:
+    """Answer a request from the response cache."""
+    session.cache_hit = True
+    session.status_code = entry.status_code
+    if capture.record:
+        session.response_headers = Headers(decoded=entry.headers)
+        pipeline.update(session)
+    if not entry.is_streaming:
+        body = b"".join(chunk for _, chunk in entry.chunks)
+        return _regular_response(
+            body, entry.status_code, entry.headers, session, pipeline, capture, start
+        )
+    return _streaming_response(
+        _replay_chunks(entry, pace),
+        entry.status_code,
+        entry.headers,
+        session,
+        pipeline,
+        capture,
+        start,
+    )
+
+
+async def _replay_chunks(entry: CachedResponse, pace: bool) -> AsyncIterator[bytes]:
+    """Yield the recorded chunks, optionally with their original spacing."""
+    first = time.monotonic()
+    for offset, chunk in entry.chunks:
+        if pace:
+            delay = first + offset - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        yield chunk
+
+
+async def _follow_flight(
+    flight: Flight,
+    session: SessionRecord,
+    pipeline: CapturePipeline,
+    capture: CaptureDecision,
+    start: float,
+) -> Response:
+    """Answer a request from the upstream call of an identical one in flight."""
+    session.coalesced_with = flight.leader_id
+    try:
+        await flight.response()
+        session.status_code = flight.status_code
+        if capture.record:
+            session.response_headers = Headers(decoded=flight.headers)
+            pipeline.update(session)
+        if flight.is_streaming:
+            return _streaming_response(
+                flight.subscribe(),
+                flight.status_code,
+                flight.headers,
+                session,
+                pipeline,
+                capture,
+                start,
+            )
+        body = await flight.body()
+    except FlightError as exc:
+        session.status = SessionStatus.ERROR
+        session.error_message = str(exc)
+        session.duration_ms = (time.monotonic() - start) * 1000
+        _finish(session, pipeline, capture)
+        return Response(content=f"Proxy error: {exc}", status_code=502)
+    return _regular_response(
+        body, flight.status_code, flight.headers, session, pipeline, capture, start
     )
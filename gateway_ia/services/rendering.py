@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, TypeVar
+
+from starlette.concurrency import run_in_threadpool
+
+from gateway_ia import jsonutil
+from gateway_ia.body import BodyBuffer
+from gateway_ia.config import UIConfig
+
+T = TypeVar("T")
+
+
+def decode_body(value: BodyBuffer | None, size: int | None = None) -> str:
+    """Decode a captured body, noting when it was truncated at capture."""
+    if value is None:
+        return ""
+    truncated = size is not None and size > len(value)
+    try:
+        text = value.text()
+    except UnicodeDecodeError as exc:
+        # A multi-byte character cut by the capture limit is not binary data
+        if not truncated or exc.start < len(value) - 3:
+            return f"[Binary data, {len(value)} bytes]"
+        text = value.getvalue()[: exc.start].decode("utf-8")
+    except AttributeError:
+        return f"[Binary data, {len(value)} bytes]"
+    if truncated:
+        text += f"\n[... truncated, {len(value)} of {size} bytes captured]"
+    return text
+
+
+def tojson_pretty(value: str) -> str:
+    try:
+        return jsonutil.dumps_pretty(jsonutil.loads(value))
+    except (ValueError, TypeError):
+        return value
+
+
+@dataclass(frozen=True, slots=True)
+class BodyJob:
+    """What rendering one body needs, as plain data a worker process can receive."""
+
+    part: str
+    data: bytes
+    size: int
+    is_streaming: bool = False
+    response_text: str | None = None
+    tool_calls: list[dict] | None = None
+    usage: dict | None = None
+
+    @classmethod
+    def from_session(cls, session, part: str) -> BodyJob:
+        body = getattr(session, f"{part}_body")
+        return cls(
+            part=part,
+            data=body.getvalue() if body is not None else b"",
+            size=getattr(session, f"{part}_size"),
+            is_streaming=session.is_streaming,
+            response_text=session.response_text,
+            tool_calls=session.tool_calls,
+            usage=session.usage,
+        )
+
+    def decoded(self) -> str:
+        return decode_body(BodyBuffer([self.data]), self.size)
+
+    def message_text(self) -> str:
+        """Aggregated assistant text of a response, falling back to the raw body."""
+        if self.response_text is not None:
+            return self.response_text
+        if self.tool_calls:
+            return ""
+        return self.decoded()
+
+
+def render_body(job: BodyJob) -> bytes:
+    """Pretty-print a body; a streamed response is rebuilt as one message."""
+    if job.part == "request" or not job.is_streaming:
+        return tojson_pretty(job.decoded()).encode("utf-8")
+    text = job.message_text()
+    msg: dict = {"role": "assistant"}
+    if text:
+        msg["content"] = text
+    if job.tool_calls:
+        msg["tool_calls"] = job.tool_calls
+    reconstructed: dict = {"message": msg}
+    if job.usage:
+        reconstructed["usage"] = job.usage
+    return jsonutil.dumps_pretty(reconstructed).encode("utf-8")
+
+
+def render_detail(request: BodyJob | None, response: BodyJob | None) -> dict[str, str]:
+    """Texts shown by the HTML session detail page."""
+    texts = {"request": "", "response": "", "response_raw": ""}
+    if request is not None:
+        texts["request"] = tojson_pretty(request.decoded())
+    if response is not None:
+        if response.is_streaming:
+            texts["response"] = response.message_text()
+            texts["response_raw"] = response.decoded()
+        else:
+            texts["response"] = tojson_pretty(response.decoded())
+    return texts
+
+
+class RenderPool:
+    """Bounded pool running the UI's CPU-heavy work away from the event loop.
+
+    Decoding, JSON parsing and pretty-printing multi-MB bodies would
+    otherwise delay every stream relayed by the same loop. ``thread``
+    workers share the GIL with the loop, which still gets its turn every
+    switch interval; ``process`` workers receive a copy of the bodies but
+    leave the loop's interpreter alone.
+    """
+
+    def __init__(self, kind: str = "thread", size: int = 2) -> None:
+        self._processes = kind == "process"
+        self._executor: Executor
+        if self._processes:
+            # Forking a process running an event loop and threads is unsafe
+            context = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(size, mp_context=context)
+        else:
+            self._executor = ThreadPoolExecutor(size, thread_name_prefix="ui-render")
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run ``fn(*args)`` in the pool; with processes, both must be picklable."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args))
+
+    async def job(self, session, part: str) -> BodyJob | None:
+        """Snapshot a session body for ``run``, or None when it was not captured."""
+        if not getattr(session, f"{part}_body"):
+            return None
+        # Reading back a spilled or compressed body is not free either
+        return await run_in_threadpool(BodyJob.from_session, session, part)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_render_pool(config: UIConfig) -> RenderPool:
+    return RenderPool(config.render_pool, config.render_workers)
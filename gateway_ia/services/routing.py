@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import time
+from collections.abc import Mapping
+from contextlib import suppress
+from fnmatch import fnmatchcase
+
+import httpx
+from loguru import logger
+
+from gateway_ia.config import (
+    AdmissionConfig,
+    AppConfig,
+    BackendConfig,
+    HealthCheckConfig,
+    RouteConfig,
+)
+from gateway_ia.services.admission import AdmissionQueue, request_priority
+
+# Weight of the latest sample in the EWMA latency
+_EWMA_ALPHA = 0.3
+# Upstream statuses counted as failures by the passive health check
+_FAILURE_STATUSES = frozenset({502, 503, 504})
+
+
+class Backend:
+    """One upstream server: its HTTP client, load and health state."""
+
+    def __init__(self, config: BackendConfig, admission: AdmissionConfig) -> None:
+        self.name = config.name
+        self.client = httpx.AsyncClient(
+            base_url=config.base_url,
+            timeout=httpx.Timeout(
+                config.timeout,
+                connect=_or(config.connect_timeout, config.timeout),
+                read=_or(config.read_timeout, config.timeout),
+                write=_or(config.write_timeout, config.timeout),
+                pool=_or(config.pool_timeout, config.timeout),
+            ),
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry,
+            ),
+            http2=config.http2,
+            verify=config.verify_ssl,
+        )
+        url = self.client.base_url
+        self.host = f"{url.host}:{url.port}" if url.port else str(url.host)
+        self.outstanding = 0
+        self.admission = None
+        if config.max_concurrency is not None:
+            self.admission = AdmissionQueue(
+                config.max_concurrency,
+                config.max_queue,
+                config.queue_timeout,
+                admission,
+            )
+        self.ewma_ms: float | None = None
+        # Active check result, and passive ejection deadline (monotonic)
+        self.healthy = True
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and time.monotonic() >= self.ejected_until
+
+    async def acquire(self, priority: int = 0) -> None:
+        """Wait for an admission slot; raises ``AdmissionRejected``."""
+        if self.admission is not None:
+            await self.admission.enter(priority)
+        self.outstanding += 1
+
+    def release(self) -> None:
+        self.outstanding -= 1
+        if self.admission is not None:
+            self.admission.leave()
+
+    def record(
+        self, status_code: int | None, latency_ms: float, health: HealthCheckConfig
+    ) -> None:
+        """Record the outcome of a request (passive health check).
+
+        ``status_code`` is None when the backend could not be reached.
+        """
+        if status_code is None or status_code in _FAILURE_STATUSES:
+            self.failures += 1
+            if self.failures >= health.max_failures:
+                self.failures = 0
+                self.ejected_until = time.monotonic() + health.ejection_s
+                logger.warning(
+                    "Ejecting backend {} for {}s", self.name, health.ejection_s
+                )
+            return
+        self.failures = 0
+        if self.ewma_ms is None:
+            self.ewma_ms = latency_ms
+        else:
+            self.ewma_ms += _EWMA_ALPHA * (latency_ms - self.ewma_ms)
+
+
+class BackendPool:
+    """Backends serving a route, load-balanced with the configured strategy.
+
+    Ejected backends are skipped; when every backend of the pool is ejected
+    the whole pool is used rather than failing the request.
+    """
+
+    def __init__(self, backends: list[Backend], strategy: str) -> None:
+        self.backends = backends
+        self._strategy = strategy
+        self._counter = itertools.count()
+
+    def pick(self) -> Backend:
+        candidates = [b for b in self.backends if b.available] or self.backends
+        if len(candidates) == 1:
+            return candidates[0]
+        # Rotating the candidates also breaks ties fairly for the other strategies
+        start = next(self._counter) % len(candidates)
+        candidates = candidates[start:] + candidates[:start]
+        if self._strategy == "least_outstanding":
+            return min(candidates, key=lambda b: b.outstanding)
+        if self._strategy == "ewma":
+            # Unmeasured backends go first; load scales the expected latency
+            return min(
+                candidates, key=lambda b: (b.ewma_ms or 0.0) * (b.outstanding + 1)
+            )
+        return candidates[0]
+
+
+class BackendRouter:
+    """Select the backend for a request from the routing rules."""
+
+    def __init__(self, config: AppConfig) -> None:
+        self._health = config.routing.health
+        self._admission = config.admission
+        self.backends = {b.name: Backend(b, config.admission) for b in config.backends}
+        strategy = config.routing.strategy
+        self._routes: list[tuple[RouteConfig, BackendPool]] = [
+            (route, BackendPool([self.backends[n] for n in route.backends], strategy))
+            for route in config.routing.routes
+        ]
+        self._default = BackendPool([next(iter(self.backends.values()))], strategy)
+        self._health_task: asyncio.Task | None = None
+
+    @property
+    def needs_model(self) -> bool:
+        """Whether routing looks at the request body."""
+        return any(route.model for route, _ in self._routes)
+
+    def select(self, path: str, body: bytes | None = None) -> Backend:
+        model = _body_model(body) if body and self.needs_model else None
+        for route, pool in self._routes:
+            if route.path_prefix and not path.startswith(route.path_prefix):
+                continue
+            if route.model and (model is None or not fnmatchcase(model, route.model)):
+                continue
+            return pool.pick()
+        return self._default.pick()
+
+    def priority(self, headers: Mapping[str, str]) -> int:
+        return request_priority(headers, self._admission)
+
+    def record(
+        self, backend: Backend, status_code: int | None, latency_ms: float
+    ) -> None:
+        backend.record(status_code, latency_ms, self._health)
+
+    async def start(self) -> None:
+        if self._health.path:
+            self._health_task = asyncio.create_task(self._check_loop())
+
+    async def stop(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._health_task
+            self._health_task = None
+        for backend in self.backends.values():
+            await backend.client.aclose()
+
+    async def _check_loop(self) -> None:
+        while True:
+            await asyncio.gather(
+                *(self._check(backend) for backend in self.backends.values())
+            )
+            await asyncio.sleep(self._health.interval)
+
+    async def _check(self, backend: Backend) -> None:
+        try:
+            response = await backend.client.get(
+                self._health.path, timeout=self._health.timeout
+            )
+            healthy = response.status_code < 500
+        except httpx.HTTPError:
+            healthy = False
+        if healthy != backend.healthy:
+            logger.info(
+                "Backend {} is {}", backend.name, "healthy" if healthy else "unhealthy"
+            )
+        backend.healthy = healthy
+
+
+def _or(value: float | None, default: float) -> float:
+    return default if value is None else value
+
+
+def _body_model(body: bytes) -> str | None:
+    try:
+        model = json.loads(body).get("model")
+    except (ValueError, AttributeError):
+        return None
+    return model if isinstance(model, str) else None
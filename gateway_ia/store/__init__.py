@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from gateway_ia.compression import create_codec
+from gateway_ia.config import StoreConfig
+from gateway_ia.store.base import SessionStore
+from gateway_ia.store.memory import MemorySessionStore
+from gateway_ia.store.segment import SegmentSessionStore
+from gateway_ia.store.sqlite import SQLiteSessionStore
+
+__all__ = [
+    "MemorySessionStore",
+    "SQLiteSessionStore",
+    "SegmentSessionStore",
+    "SessionStore",
+    "create_store",
+]
+
+
+def create_store(config: StoreConfig) -> SessionStore:
+    """Build the session store backend selected in the configuration."""
+    limits = {
+        "max_sessions": config.max_sessions,
+        "max_bytes": config.max_bytes,
+        "max_age_s": config.max_age_s,
+    }
+    if config.backend == "memory":
+        # The disk backends keep completed bodies out of memory already
+        return MemorySessionStore(codec=create_codec(config), **limits)
+    if config.backend == "segment":
+        return SegmentSessionStore(
+            config.path, segment_bytes=config.segment_bytes, **limits
+        )
+    if config.backend == "sqlite":
+        return SQLiteSessionStore(
+            config.path,
+            flush_interval=config.flush_interval,
+            shared=config.shared,
+            **limits,
+        )
+    raise ValueError(f"Unknown session store backend: {config.backend!r}")
@@ -0,0 +1,387 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict, deque
+from datetime import UTC, datetime, timedelta
+from itertools import islice
+from threading import Lock
+
+from gateway_ia.compression import BodyCodec
+from gateway_ia.models import (
+    SessionMetadata,
+    SessionQuery,
+    SessionRecord,
+    SessionSummary,
+)
+from gateway_ia.services.aggregation import derive_metadata
+
+
+class SessionStore:
+    """Thread-safe session store with bounded capacity.
+
+    The base class keeps a compact listing index of every stored session,
+    caches the derived metadata of completed sessions and maintains running
+    token totals and a per-tool index so the UI aggregates never have to
+    re-parse bodies. Sessions still in flight always live in memory; where
+    completed sessions go is up to the backend, through ``_persist``,
+    ``_load`` and ``_discard``.
+
+    Every mutation bumps a monotonically increasing change sequence so UI
+    clients can ask for what changed since the last sequence they saw.
+
+    Eviction removes the oldest sessions once any of ``max_sessions``,
+    ``max_bytes`` (stored body bytes) or ``max_age_s`` is exceeded.
+
+    With a ``codec``, the bodies of completed sessions are compressed before
+    being persisted.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int | None = 1000,
+        max_bytes: int | None = None,
+        max_age_s: float | None = None,
+        codec: BodyCodec | None = None,
+    ) -> None:
+        self._summaries: OrderedDict[str, SessionSummary] = OrderedDict()
+        self._live: dict[str, SessionRecord] = {}
+        self._max = max_sessions
+        self._max_bytes = max_bytes
+        self._max_age = timedelta(seconds=max_age_s) if max_age_s else None
+        self._total_bytes = 0
+        self._codec = codec
+        self._lock = Lock()
+        self._metadata: dict[str, SessionMetadata] = {}
+        self._prompt_tokens = 0
+        self._completion_tokens = 0
+        # tool name -> {session id -> calls}, in completion order
+        self._tool_index: dict[str, OrderedDict[str, list[dict]]] = {}
+        self._tool_counts: dict[str, int] = {}
+        # Change feed: session id -> seq of its last change, oldest change first
+        self._seq = 0
+        self._changes: OrderedDict[str, int] = OrderedDict()
+        self._evicted: deque[tuple[int, str]] = deque(maxlen=max_sessions or 10_000)
+        # Clients whose cursor is older than this must reload everything
+        self._reset_seq = 0
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    @property
+    def count(self) -> int:
+        return len(self._summaries)
+
+    def add(self, session: SessionRecord) -> None:
+        with self._lock:
+            summary = SessionSummary.from_session(session)
+            self._live[session.id] = session
+            self._summaries[session.id] = summary
+            self._total_bytes += summary.size
+            self._mark_changed(session.id)
+            self._enforce_limits()
+            self._notify()
+
+    def touch(self, session: SessionRecord) -> None:
+        """Record that a stored session changed (status, response headers...)."""
+        with self._lock:
+            if session.id in self._summaries:
+                self._update_summary(session)
+                self._mark_changed(session.id)
+                self._notify()
+
+    def complete(self, session: SessionRecord) -> None:
+        """Compute and cache the derived metadata of a finished session."""
+        metadata = derive_metadata(session)
+        if self._codec is not None:
+            for body in (session.request_body, session.response_body):
+                if body is not None:
+                    body.compress(self._codec)
+        with self._lock:
+            if session.id not in self._summaries:
+                return
+            self._update_summary(session)
+            self._forget_metadata(session.id)
+            self._remember_metadata(session, metadata)
+            self._live.pop(session.id, None)
+            self._persist(session)
+            self._mark_changed(session.id)
+            self._enforce_limits()
+            self._notify()
+
+    def get(self, session_id: str) -> SessionRecord | None:
+        with self._lock:
+            session = self._live.get(session_id)
+            if session is not None:
+                return session
+            if session_id not in self._summaries:
+                return None
+            return self._load(session_id)
+
+    def metadata(self, session_id: str) -> SessionMetadata | None:
+        """Return the cached derived metadata, or None while still pending."""
+        with self._lock:
+            return self._metadata.get(session_id)
+
+    def list_summaries(self) -> list[SessionSummary]:
+        """Return listing records newest-first, without touching bodies."""
+        with self._lock:
+            return list(reversed(self._summaries.values()))
+
+    def list_all(self) -> list[SessionRecord]:
+        """Return full sessions newest-first (loads every body)."""
+        with self._lock:
+            ids = list(reversed(self._summaries))
+        sessions = (self.get(session_id) for session_id in ids)
+        return [s for s in sessions if s is not None]
+
+    def query(
+        self, filters: SessionQuery, limit: int = 100, offset: int = 0
+    ) -> list[SessionSummary]:
+        """Return a newest-first page of the summaries matching ``filters``."""
+        with self._lock:
+            matches = (
+                s
+                for s in reversed(self._summaries.values())
+                if self._matches(s, filters)
+            )
+            return list(islice(matches, offset, offset + limit))
+
+    def select(self, filters: SessionQuery) -> list[str]:
+        """Return the ids of every session matching ``filters``, oldest first."""
+        with self._lock:
+            return [s.id for s in self._summaries.values() if self._matches(s, filters)]
+
+    def changes_since(
+        self, since: int
+    ) -> tuple[int, list[SessionSummary], list[str], bool]:
+        """Return (seq, changed summaries newest-first, evicted ids, reset).
+
+        When ``reset`` is true the cursor is too old to be served as a delta
+        and the returned summaries are the full list.
+        """
+        with self._lock:
+            if since < self._reset_seq or since > self._seq:
+                return self._seq, list(reversed(self._summaries.values())), [], True
+            changed: list[SessionSummary] = []
+            for session_id, seq in reversed(self._changes.items()):
+                if seq <= since:
+                    break
+                changed.append(self._summaries[session_id])
+            changed.sort(key=lambda s: s.created_at, reverse=True)
+            evicted = [sid for seq, sid in self._evicted if seq > since]
+            return self._seq, changed, evicted, False
+
+    async def wait_for_change(self, since: int, timeout: float) -> int:
+        """Wait until the change sequence moves past ``since`` or the timeout expires."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._seq != since:
+                return self._seq
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        return self._seq
+
+    def token_totals(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "prompt_tokens": self._prompt_tokens,
+                "completion_tokens": self._completion_tokens,
+                "total_tokens": self._prompt_tokens + self._completion_tokens,
+            }
+
+    def tool_calls_summary(self) -> list[tuple[str, list[dict]]]:
+        """Return (tool name, calls newest-first) pairs, most used tools first."""
+        with self._lock:
+            names = sorted(
+                self._tool_counts, key=self._tool_counts.__getitem__, reverse=True
+            )
+            return [
+                (
+                    name,
+                    [
+                        call
+                        for calls in reversed(self._tool_index[name].values())
+                        for call in calls
+                    ],
+                )
+                for name in names
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset_index()
+            self._clear_storage()
+            self._notify()
+
+    def flush(self) -> None:
+        """Write completed sessions still buffered by the backend, if any."""
+
+    async def start(self) -> None:
+        """Start background work (writers...). Called from the app lifespan."""
+
+    async def stop(self) -> None:
+        """Flush pending work and release resources. Called from the app lifespan."""
+        self.close()
+
+    def close(self) -> None:
+        """Release backend resources (files, connections)."""
+
+    # -- backend hooks -----------------------------------------------------
+
+    def _persist(self, session: SessionRecord) -> None:
+        """Store a completed session. Called with the lock held."""
+        raise NotImplementedError
+
+    def _load(self, session_id: str) -> SessionRecord | None:
+        """Load a completed session. Called with the lock held."""
+        raise NotImplementedError
+
+    def _discard(self, session_id: str) -> None:
+        """Drop an evicted session from storage. Called with the lock held."""
+        raise NotImplementedError
+
+    def _clear_storage(self) -> None:
+        """Drop every stored session. Called with the lock held."""
+        raise NotImplementedError
+
+    # -- internals ---------------------------------------------------------
+
+    def _restore(self, session: SessionRecord, size: int) -> None:
+        """Index a session recovered from storage. Called with the lock held."""
+        summary = SessionSummary.from_session(session)
+        summary.size = size
+        self._summaries[session.id] = summary
+        self._total_bytes += size
+        self._remember_metadata(session, derive_metadata(session))
+
+    def _reset_index(self) -> None:
+        """Forget every session (UI clients reload). Called with the lock held."""
+        self._summaries.clear()
+        self._live.clear()
+        self._total_bytes = 0
+        self._metadata.clear()
+        self._tool_index.clear()
+        self._tool_counts.clear()
+        self._prompt_tokens = 0
+        self._completion_tokens = 0
+        self._changes.clear()
+        self._evicted.clear()
+        self._invalidate_cursors()
+
+    def _invalidate_cursors(self) -> None:
+        """Make every earlier change cursor reload. Called with the lock held."""
+        self._seq += 1
+        self._reset_seq = self._seq
+
+    def _matches(self, summary: SessionSummary, filters: SessionQuery) -> bool:
+        if filters.path and not summary.path.startswith(filters.path):
+            return False
+        if filters.status is not None and summary.status != filters.status:
+            return False
+        if (
+            filters.status_code is not None
+            and summary.status_code != filters.status_code
+        ):
+            return False
+        if filters.created_after and summary.created_at < filters.created_after:
+            return False
+        if filters.created_before and summary.created_at >= filters.created_before:
+            return False
+        if filters.replay_run and summary.replay_run != filters.replay_run:
+            return False
+        if filters.model or filters.tool:
+            metadata = self._metadata.get(summary.id)
+            if metadata is None:
+                return False
+            if filters.model and metadata.model != filters.model:
+                return False
+            if filters.tool and filters.tool not in metadata.tool_call_names:
+                return False
+        return True
+
+    def _update_summary(self, session: SessionRecord) -> None:
+        summary = SessionSummary.from_session(session)
+        self._total_bytes += summary.size - self._summaries[session.id].size
+        self._summaries[session.id] = summary
+
+    def _enforce_limits(self) -> None:
+        cutoff = datetime.now(UTC) - self._max_age if self._max_age else None
+        while self._summaries:
+            oldest = next(iter(self._summaries.values()))
+            if not (
+                (self._max is not None and len(self._summaries) > self._max)
+                or (self._max_bytes is not None and self._total_bytes > self._max_bytes)
+                or (cutoff is not None and oldest.created_at < cutoff)
+            ):
+                break
+            self._evict(oldest)
+
+    def _evict(self, summary: SessionSummary, discard: bool = True) -> None:
+        """Drop a session from the index, and from storage with ``discard``."""
+        del self._summaries[summary.id]
+        self._total_bytes -= summary.size
+        if self._live.pop(summary.id, None) is None and discard:
+            self._discard(summary.id)
+        self._forget_metadata(summary.id)
+        self._changes.pop(summary.id, None)
+        if len(self._evicted) == self._evicted.maxlen:
+            self._reset_seq = self._evicted[0][0]
+        self._evicted.append((self._seq, summary.id))
+
+    def _mark_changed(self, session_id: str) -> None:
+        self._seq += 1
+        self._changes[session_id] = self._seq
+        self._changes.move_to_end(session_id)
+
+    def _notify(self) -> None:
+        for loop, future in self._waiters:
+            loop.call_soon_threadsafe(_wake, future)
+        self._waiters.clear()
+
+    def _remember_metadata(
+        self, session: SessionRecord, metadata: SessionMetadata
+    ) -> None:
+        self._metadata[session.id] = metadata
+        if metadata.usage and metadata.generated:
+            self._prompt_tokens += metadata.usage.get("prompt_tokens") or 0
+            self._completion_tokens += metadata.usage.get("completion_tokens") or 0
+        for call in metadata.tool_calls:
+            name = call["name"]
+            entry = {"created_at": session.created_at, "arguments": call["arguments"]}
+            self._tool_index.setdefault(name, OrderedDict()).setdefault(
+                session.id, []
+            ).append(entry)
+            self._tool_counts[name] = self._tool_counts.get(name, 0) + 1
+
+    def _forget_metadata(self, session_id: str) -> None:
+        metadata = self._metadata.pop(session_id, None)
+        if metadata is None:
+            return
+        if metadata.usage and metadata.generated:
+            self._prompt_tokens -= metadata.usage.get("prompt_tokens") or 0
+            self._completion_tokens -= metadata.usage.get("completion_tokens") or 0
+        for name in metadata.tool_call_names:
+            calls = self._tool_index[name].pop(session_id, [])
+            self._tool_counts[name] -= len(calls)
+            if not self._tool_index[name]:
+                del self._tool_index[name]
+                del self._tool_counts[name]
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from gateway_ia.compression import BodyCodec
+from gateway_ia.models import SessionRecord
+from gateway_ia.store.base import SessionStore
+
+
+class MemorySessionStore(SessionStore):
+    """In-memory session store with FIFO eviction."""
+
+    def __init__(
+        self,
+        max_sessions: int | None = 1000,
+        max_bytes: int | None = None,
+        max_age_s: float | None = None,
+        codec: BodyCodec | None = None,
+    ) -> None:
+        super().__init__(max_sessions, max_bytes, max_age_s, codec)
+        self._sessions: dict[str, SessionRecord] = {}
+
+    def _persist(self, session: SessionRecord) -> None:
+        self._sessions[session.id] = session
+
+    def _load(self, session_id: str) -> SessionRecord | None:
+        return self._sessions.get(session_id)
+
+    def _discard(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def _clear_storage(self) -> None:
+        self._sessions.clear()
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import json
+import mmap
+import struct
+from contextlib import suppress
+from pathlib import Path
+from typing import BinaryIO
+
+from loguru import logger
+
+from gateway_ia.models import SessionMetadata, SessionRecord
+from gateway_ia.services.aggregation import derive_metadata
+from gateway_ia.store.base import SessionStore
+
+# Record layout: header length, body length, JSON header, request body, response body
+_RECORD = struct.Struct("<II")
+_SUFFIX = ".seg"
+
+
+class SegmentSessionStore(SessionStore):
+    """Session store persisting completed sessions to append-only segment files.
+
+    Only the listing index, the compact metadata the session list shows and
+    the (segment, offset, length) location of each record stay in memory.
+    Bodies are served lazily as views of the memory-mapped segment files when
+    a detail view asks for them, and tool call arguments are read back from
+    the record headers when the tool summary asks for them. Segments are rotated once
+    they reach ``segment_bytes`` and deleted when all their records have been
+    evicted. The index is rebuilt from the segment headers on startup.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        segment_bytes: int = 64 * 1024 * 1024,
+        max_sessions: int | None = None,
+        max_bytes: int | None = None,
+        max_age_s: float | None = None,
+    ) -> None:
+        super().__init__(max_sessions, max_bytes, max_age_s)
+        self._dir = Path(path)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._segment_bytes = segment_bytes
+        self._locations: dict[str, tuple[int, int, int]] = {}
+        self._segment_records: dict[int, int] = {}
+        self._maps: dict[int, mmap.mmap] = {}
+        self._active = 0
+        self._active_file: BinaryIO | None = None
+        self._active_size = 0
+        with self._lock:
+            self._recover()
+            self._enforce_limits()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_files()
+
+    def tool_calls_summary(self) -> list[tuple[str, list[dict]]]:
+        with self._lock:
+            names = sorted(
+                self._tool_counts, key=self._tool_counts.__getitem__, reverse=True
+            )
+            arguments: dict[str, list[dict]] = {}
+            summary = []
+            for name in names:
+                calls = []
+                for session_id, entries in reversed(self._tool_index[name].items()):
+                    if session_id not in arguments:
+                        arguments[session_id] = self._tool_calls(session_id)
+                    recorded = [
+                        call["arguments"]
+                        for call in arguments[session_id]
+                        if call["name"] == name
+                    ]
+                    calls.extend(
+                        {**entry, "arguments": args}
+                        for entry, args in zip(entries, recorded, strict=False)
+                    )
+                summary.append((name, calls))
+            return summary
+
+    # -- backend hooks -----------------------------------------------------
+
+    def _persist(self, session: SessionRecord) -> None:
+        request_body = session.request_body
+        response_body = session.response_body
+        header = session.header()
+        header["request_len"] = None if request_body is None else len(request_body)
+        header["response_len"] = None if response_body is None else len(response_body)
+        header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        body_len = len(request_body or b"") + len(response_body or b"")
+
+        if self._active_file is None or self._active_size >= self._segment_bytes:
+            self._rotate()
+        f = self._active_file
+        offset = self._active_size
+        f.write(_RECORD.pack(len(header_bytes), body_len))
+        f.write(header_bytes)
+        for body in (request_body, response_body):
+            for chunk in body or ():
+                f.write(chunk)
+        f.flush()
+        length = _RECORD.size + len(header_bytes) + body_len
+        self._active_size += length
+        self._locations[session.id] = (self._active, offset, length)
+        self._segment_records[self._active] = (
+            self._segment_records.get(self._active, 0) + 1
+        )
+
+    def _load(self, session_id: str) -> SessionRecord | None:
+        record = self._read_header(session_id)
+        if record is None:
+            return None
+        header, buf, pos = record
+        request_len = header.pop("request_len")
+        response_len = header.pop("response_len")
+        # Views of the mapping: the bytes are only copied if they are read
+        view = memoryview(buf)
+        request_body = None
+        if request_len is not None:
+            request_body = view[pos : pos + request_len]
+            pos += request_len
+        response_body = None
+        if response_len is not None:
+            response_body = view[pos : pos + response_len]
+        return SessionRecord.from_header(header, request_body, response_body)
+
+    def _discard(self, session_id: str) -> None:
+        location = self._locations.pop(session_id, None)
+        if location is None:
+            return
+        segment = location[0]
+        self._segment_records[segment] -= 1
+        if self._segment_records[segment] == 0 and segment != self._active:
+            del self._segment_records[segment]
+            m = self._maps.pop(segment, None)
+            if m is not None:
+                _unmap(m)
+            self._segment_path(segment).unlink(missing_ok=True)
+
+    def _clear_storage(self) -> None:
+        self._close_files()
+        for path in self._dir.glob(f"*{_SUFFIX}"):
+            path.unlink(missing_ok=True)
+        self._locations.clear()
+        self._segment_records.clear()
+        self._active = 0
+        self._active_size = 0
+
+    # -- internals ---------------------------------------------------------
+
+    def _remember_metadata(
+        self, session: SessionRecord, metadata: SessionMetadata
+    ) -> None:
+        # Tool call arguments stay in the segment, see tool_calls_summary
+        calls = [
+            {"name": call["name"], "arguments": None} for call in metadata.tool_calls
+        ]
+        super()._remember_metadata(
+            session, metadata.model_copy(update={"tool_calls": calls})
+        )
+
+    def _read_header(self, session_id: str) -> tuple[dict, mmap.mmap, int] | None:
+        """Return the JSON header of a record, its mapping and where its bodies start."""
+        location = self._locations.get(session_id)
+        if location is None:
+            return None
+        segment, offset, length = location
+        buf = self._map(segment, offset + length)
+        header_len, _ = _RECORD.unpack_from(buf, offset)
+        pos = offset + _RECORD.size
+        header = json.loads(buf[pos : pos + header_len])
+        return header, buf, pos + header_len
+
+    def _tool_calls(self, session_id: str) -> list[dict]:
+        record = self._read_header(session_id)
+        if record is None:
+            return []
+        header = record[0]
+        del header["request_len"], header["response_len"]
+        return derive_metadata(SessionRecord.from_header(header)).tool_calls
+
+    def _segment_path(self, segment: int) -> Path:
+        return self._dir / f"{segment:08d}{_SUFFIX}"
+
+    def _rotate(self) -> None:
+        if self._active_file is not None:
+            self._active_file.close()
+            if not self._segment_records.get(self._active):
+                self._segment_records.pop(self._active, None)
+                self._segment_path(self._active).unlink(missing_ok=True)
+            self._active += 1
+        self._open_active()
+
+    def _open_active(self) -> None:
+        self._active_file = open(self._segment_path(self._active), "ab")  # noqa: SIM115
+        self._active_size = self._active_file.tell()
+
+    def _map(self, segment: int, needed: int) -> mmap.mmap:
+        m = self._maps.get(segment)
+        if m is None or len(m) < needed:
+            if m is not None:
+                _unmap(m)
+            with open(self._segment_path(segment), "rb") as f:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = m
+        return m
+
+    def _close_files(self) -> None:
+        for m in self._maps.values():
+            _unmap(m)
+        self._maps.clear()
+        if self._active_file is not None:
+            self._active_file.close()
+            self._active_file = None
+
+    def _recover(self) -> None:
+        """Rebuild the in-memory index from the segment files on disk."""
+        recovered: list[tuple[SessionRecord, int, tuple[int, int, int]]] = []
+        segments = sorted(
+            int(p.stem) for p in self._dir.glob(f"*{_SUFFIX}") if p.stem.isdigit()
+        )
+        for segment in segments:
+            path = self._segment_path(segment)
+            size = path.stat().st_size
+            offset = 0
+            with open(path, "rb") as f:
+                while True:
+                    prefix = f.read(_RECORD.size)
+                    if len(prefix) < _RECORD.size:
+                        break
+                    header_len, body_len = _RECORD.unpack(prefix)
+                    header_bytes = f.read(header_len)
+                    if len(header_bytes) < header_len:
+                        break
+                    length = _RECORD.size + header_len + body_len
+                    if offset + length > size:
+                        break
+                    f.seek(body_len, 1)
+                    try:
+                        header = json.loads(header_bytes)
+                        header.pop("request_len")
+                        header.pop("response_len")
+                        session = SessionRecord.from_header(header)
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning(
+                            "Skipping corrupt record in {} at {}", path.name, offset
+                        )
+                    else:
+                        recovered.append((session, body_len, (segment, offset, length)))
+                    offset += length
+            if offset < size:
+                # Torn write from a crash: drop the incomplete tail
+                logger.warning("Truncating {} to {} bytes", path.name, offset)
+                with open(path, "r+b") as f:
+                    f.truncate(offset)
+            self._segment_records.setdefault(segment, 0)
+        recovered.sort(key=lambda item: item[0].created)
+        for session, size, location in recovered:
+            self._restore(session, size)
+            self._locations[session.id] = location
+            self._segment_records[location[0]] += 1
+        if segments:
+            self._active = segments[-1]
+        for segment in segments[:-1]:
+            if not self._segment_records[segment]:
+                del self._segment_records[segment]
+                self._segment_path(segment).unlink(missing_ok=True)
+        self._open_active()
+        # Cursors handed out before a restart know nothing of these sessions
+        self._invalidate_cursors()
+        if recovered:
+            logger.info("Recovered {} sessions from {}", len(recovered), self._dir)
+
+
+def _unmap(m: mmap.mmap) -> None:
+    # Loaded bodies still pointing into it keep it mapped until released
+    with suppress(BufferError):
+        m.close()
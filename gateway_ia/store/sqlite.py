@@ -0,0 +1,426 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import sqlite3
+from collections import OrderedDict
+from contextlib import suppress
+from pathlib import Path
+from threading import Lock
+
+from loguru import logger
+
+from gateway_ia.models import (
+    SessionMetadata,
+    SessionQuery,
+    SessionRecord,
+    SessionSummary,
+)
+from gateway_ia.store.base import SessionStore
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    method TEXT NOT NULL,
+    path TEXT NOT NULL,
+    query_string TEXT NOT NULL,
+    status TEXT NOT NULL,
+    status_code INTEGER,
+    duration_ms REAL,
+    is_streaming INTEGER NOT NULL,
+    model TEXT,
+    size INTEGER NOT NULL,
+    header TEXT NOT NULL,
+    request_body BLOB,
+    response_body BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions (created_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_path ON sessions (path);
+CREATE INDEX IF NOT EXISTS idx_sessions_status ON sessions (status);
+CREATE INDEX IF NOT EXISTS idx_sessions_status_code ON sessions (status_code);
+CREATE INDEX IF NOT EXISTS idx_sessions_model ON sessions (model);
+CREATE TABLE IF NOT EXISTS session_tools (
+    name TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    PRIMARY KEY (name, session_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_session_tools_session ON session_tools (session_id);
+CREATE TABLE IF NOT EXISTS deletions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta VALUES ('generation', 0);
+"""
+
+# Shared databases: deletions kept for the other workers to catch up on
+_DELETIONS_KEPT = 100_000
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store persisting completed sessions to an indexed SQLite database.
+
+    Completed sessions are queued in memory and written in batches by a
+    background task that runs the inserts in a worker thread, so the proxy
+    path never waits on disk. Filtered and paginated listings are answered by
+    indexed queries, merged with the sessions not yet written. Reads use
+    their own connection and lock, never the store lock, and the UI runs
+    them in worker threads.
+
+    With ``shared`` set, several processes (gateway workers) use the same
+    database: after each batch, sessions written by the other processes
+    since the last one are added to the index, and the sessions they
+    deleted (logged in the ``deletions`` table) are dropped from it, so
+    every worker serves the merged history. Sessions still in flight on
+    another worker show up once they complete. Clearing bumps a generation
+    counter, which makes the other processes drop their index too.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        flush_interval: float = 0.5,
+        max_sessions: int | None = None,
+        max_bytes: int | None = None,
+        max_age_s: float | None = None,
+        shared: bool = False,
+    ) -> None:
+        super().__init__(max_sessions, max_bytes, max_age_s)
+        directory = Path(path)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._db_path = directory / "sessions.db"
+        self._flush_interval = flush_interval
+        self._shared = shared
+        # Last row, deletion and clear generation seen by this process
+        self._synced_rowid = 0
+        self._synced_deletion = 0
+        self._generation = 0
+        self._reader = self._connect()
+        self._read_lock = Lock()
+        self._writer = self._connect()
+        self._writer.executescript(_SCHEMA)
+        # Completed sessions waiting for the writer, and the batch being written
+        self._pending: dict[str, tuple[SessionRecord, SessionMetadata]] = {}
+        self._writing: dict[str, SessionRecord] = {}
+        self._deletes: set[str] = set()
+        self._clear_pending = False
+        self._flush_lock = Lock()
+        self._writer_task: asyncio.Task | None = None
+        with self._lock:
+            self._recover()
+            self._enforce_limits()
+
+    async def start(self) -> None:
+        self._writer_task = asyncio.create_task(self._write_loop())
+
+    async def stop(self) -> None:
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._writer_task
+            self._writer_task = None
+        await asyncio.to_thread(self._flush)
+        self.close()
+
+    def flush(self) -> None:
+        self._flush()
+
+    def close(self) -> None:
+        self._flush()
+        self._reader.close()
+        self._writer.close()
+
+    def query(
+        self, filters: SessionQuery, limit: int = 100, offset: int = 0
+    ) -> list[SessionSummary]:
+        if filters.replay_run:
+            # Not a column: matched on the in-memory index instead
+            return super().query(filters, limit, offset)
+        where: list[str] = []
+        params: list = []
+        if filters.path:
+            where.append("path >= ? AND path < ?")
+            params += [filters.path, filters.path + "\U0010ffff"]
+        if filters.status is not None:
+            where.append("status = ?")
+            params.append(filters.status.value)
+        if filters.status_code is not None:
+            where.append("status_code = ?")
+            params.append(filters.status_code)
+        if filters.model:
+            where.append("model = ?")
+            params.append(filters.model)
+        if filters.tool:
+            where.append("id IN (SELECT session_id FROM session_tools WHERE name = ?)")
+            params.append(filters.tool)
+        if filters.created_after:
+            where.append("created_at >= ?")
+            params.append(filters.created_after.timestamp())
+        if filters.created_before:
+            where.append("created_at < ?")
+            params.append(filters.created_before.timestamp())
+        sql = "SELECT id FROM sessions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(offset + limit)
+
+        with self._read_lock:
+            rows = self._reader.execute(sql, params).fetchall()
+        with self._lock:
+            # Rows evicted but not yet deleted are skipped; sessions not yet
+            # written (or still in flight) are matched in memory.
+            found = [
+                self._summaries[row[0]] for row in rows if row[0] in self._summaries
+            ]
+            seen = {s.id for s in found}
+            unwritten = [
+                self._summaries[sid]
+                for sid in (*self._live, *self._pending, *self._writing)
+                if sid in self._summaries and sid not in seen
+            ]
+            found += [s for s in unwritten if self._matches(s, filters)]
+        found.sort(key=lambda s: s.created_at, reverse=True)
+        return found[offset : offset + limit]
+
+    def get(self, session_id: str) -> SessionRecord | None:
+        with self._lock:
+            session = self._live.get(session_id) or self._unwritten(session_id)
+            if session is not None or session_id not in self._summaries:
+                return session
+        return self._load(session_id)
+
+    # -- backend hooks -----------------------------------------------------
+
+    def _persist(self, session: SessionRecord) -> None:
+        self._pending[session.id] = (session, self._metadata[session.id])
+        self._deletes.discard(session.id)
+
+    def _load(self, session_id: str) -> SessionRecord | None:
+        # Called by ``get`` without the store lock
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT header, request_body, response_body FROM sessions WHERE id = ?",
+                (session_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return SessionRecord.from_header(json.loads(row[0]), row[1], row[2])
+
+    def _discard(self, session_id: str) -> None:
+        if self._pending.pop(session_id, None) is None:
+            self._deletes.add(session_id)
+
+    def _clear_storage(self) -> None:
+        self._pending.clear()
+        self._deletes.clear()
+        self._clear_pending = True
+
+    # -- internals ---------------------------------------------------------
+
+    def _unwritten(self, session_id: str) -> SessionRecord | None:
+        """A completed session not written yet. Called with the lock held."""
+        pending = self._pending.get(session_id)
+        if pending is not None:
+            return pending[0]
+        return self._writing.get(session_id)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Other workers may hold the write lock while committing a batch
+        conn = sqlite3.connect(self._db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _recover(self) -> None:
+        """Rebuild the in-memory index from the database."""
+        count = 0
+        self._generation = self._read_generation(self._reader)
+        (self._synced_deletion,) = self._reader.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM deletions"
+        ).fetchone()
+        for rowid, header, size in self._reader.execute(
+            "SELECT rowid, header, size FROM sessions ORDER BY created_at"
+        ):
+            self._restore(SessionRecord.from_header(json.loads(header)), size)
+            self._synced_rowid = max(self._synced_rowid, rowid)
+            count += 1
+        # Cursors handed out before a restart know nothing of these sessions
+        self._invalidate_cursors()
+        if count:
+            logger.info("Recovered {} sessions from {}", count, self._db_path)
+
+    async def _write_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await asyncio.to_thread(self._flush)
+            except (sqlite3.Error, OSError):
+                logger.exception("Failed to write sessions to {}", self._db_path)
+
+    def _flush(self) -> None:
+        """Write the queued sessions and deletions in a single transaction."""
+        with self._flush_lock:
+            self._flush_batch()
+            if self._shared:
+                self._sync()
+
+    def _flush_batch(self) -> None:
+        with self._lock:
+            if not (self._pending or self._deletes or self._clear_pending):
+                return
+            batch = list(self._pending.values())
+            deletes = list(self._deletes)
+            clear = self._clear_pending
+            self._pending.clear()
+            self._deletes.clear()
+            self._clear_pending = False
+            self._writing = {session.id: session for session, _ in batch}
+        try:
+            with self._writer:
+                if clear:
+                    self._writer.execute("DELETE FROM session_tools")
+                    self._writer.execute("DELETE FROM sessions")
+                    self._writer.execute("DELETE FROM deletions")
+                    self._writer.execute(
+                        "UPDATE meta SET value = value + 1 WHERE key = 'generation'"
+                    )
+                    self._generation = self._read_generation(self._writer)
+                    self._synced_rowid = 0
+                self._writer.executemany(
+                    "INSERT OR REPLACE INTO sessions VALUES "
+                    "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [_session_row(session, metadata) for session, metadata in batch],
+                )
+                self._writer.executemany(
+                    "INSERT OR IGNORE INTO session_tools VALUES (?, ?)",
+                    [
+                        (name, session.id)
+                        for session, metadata in batch
+                        for name in metadata.tool_call_names
+                    ],
+                )
+                if deletes:
+                    self._writer.executemany(
+                        "DELETE FROM session_tools WHERE session_id = ?",
+                        [(sid,) for sid in deletes],
+                    )
+                    self._writer.executemany(
+                        "DELETE FROM sessions WHERE id = ?",
+                        [(sid,) for sid in deletes],
+                    )
+                    if self._shared:
+                        self._log_deletions(deletes)
+        finally:
+            with self._lock:
+                self._writing = {}
+
+    def _log_deletions(self, deletes: list[str]) -> None:
+        """Let the other workers drop the deleted sessions from their index."""
+        self._writer.executemany(
+            "INSERT INTO deletions (session_id) VALUES (?)", [(sid,) for sid in deletes]
+        )
+        self._writer.execute(
+            "DELETE FROM deletions WHERE seq <= (SELECT MAX(seq) FROM deletions) - ?",
+            (_DELETIONS_KEPT,),
+        )
+
+    def _sync(self) -> None:
+        """Apply the sessions other processes wrote or deleted since the last sync."""
+        generation = self._read_generation(self._writer)
+        if generation != self._generation:
+            logger.info("Session store cleared by another worker")
+            with self._lock:
+                self._reset_index()
+                self._pending.clear()
+                self._deletes.clear()
+                self._notify()
+            self._generation = generation
+            self._synced_rowid = 0
+        self._sync_deletions()
+        rows = self._writer.execute(
+            "SELECT rowid, header, size FROM sessions WHERE rowid > ? ORDER BY rowid",
+            (self._synced_rowid,),
+        ).fetchall()
+        if not rows:
+            return
+        self._synced_rowid = rows[-1][0]
+        found = [
+            (SessionRecord.from_header(json.loads(header)), size)
+            for _, header, size in rows
+        ]
+        found.sort(key=lambda item: item[0].created)
+        with self._lock:
+            # Our own sessions come back too, and deletions may still be queued
+            found = [
+                (session, size)
+                for session, size in found
+                if session.id not in self._summaries and session.id not in self._deletes
+            ]
+            if not found:
+                return
+            newest = next(reversed(self._summaries.values()), None)
+            for session, size in found:
+                self._restore(session, size)
+                self._mark_changed(session.id)
+            # The index is kept oldest first, eviction relies on it
+            if newest is not None and found[0][0].created_at < newest.created_at:
+                self._summaries = OrderedDict(
+                    sorted(self._summaries.items(), key=lambda item: item[1].created_at)
+                )
+            self._enforce_limits()
+            self._notify()
+        logger.debug("Indexed {} sessions from other workers", len(found))
+
+    def _sync_deletions(self) -> None:
+        deleted = self._writer.execute(
+            "SELECT seq, session_id FROM deletions WHERE seq > ? ORDER BY seq",
+            (self._synced_deletion,),
+        ).fetchall()
+        if not deleted:
+            return
+        self._synced_deletion = deleted[-1][0]
+        with self._lock:
+            # Our own deletions come back too, already gone from the index
+            gone = [
+                self._summaries[sid]
+                for _, sid in deleted
+                if sid in self._summaries and sid not in self._pending
+            ]
+            if gone:
+                # A change of its own, so UI clients receive the evictions
+                self._seq += 1
+                for summary in gone:
+                    self._evict(summary, discard=False)
+                self._notify()
+        if gone:
+            logger.debug("Dropped {} sessions deleted by other workers", len(gone))
+
+    @staticmethod
+    def _read_generation(conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+
+
+def _session_row(session: SessionRecord, metadata: SessionMetadata) -> tuple:
+    header = session.header()
+    return (
+        session.id,
+        session.created_at.timestamp(),
+        session.method,
+        session.path,
+        session.query_string,
+        session.status.value,
+        session.status_code,
+        session.duration_ms,
+        int(session.is_streaming),
+        metadata.model,
+        len(session.request_body or b"") + len(session.response_body or b""),
+        json.dumps(header, ensure_ascii=False),
+        session.request_body.getvalue() if session.request_body is not None else None,
+        session.response_body.getvalue() if session.response_body is not None else None,
+    )